@@ -0,0 +1,163 @@
+"""
+Benchmark the full render pipeline locally, without Modal, on a corpus of representative scenes.
+
+Each scene in benchmarks/scenes/ is rendered through run_render_pipeline with uploads going to the
+stub storage server and voiceovers to the stub TTS server, both started in-process. Needs manim,
+manim-voiceover and ffmpeg installed locally (the render image's dependencies).
+
+Usage:
+    python modal_functions/benchmarks/bench_render_pipeline.py [--scenes text_only axes_chart] [--repeats 3]
+        [--output results.json] [--baseline previous.json --tolerance 0.2]
+
+Prints one JSON object per scene with the median seconds of each phase (preflight, tex, tts, cairo,
+ffmpeg, upload, render_state, other) and the peak Manim memory. Renders don't store incremental
+render state unless --keep-render-state is given; the render cache is a temporary directory either way. --output writes the full report; --baseline
+compares median wall times against an earlier report and exits with status 1 on a regression.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from manim_render import run_render_pipeline  # noqa: E402
+from benchmarks import stub_storage_server, stub_tts_server  # noqa: E402
+
+SCENES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scenes")
+PHASES = ("preflight", "tex", "tts", "cairo", "ffmpeg", "upload", "render_state")
+
+def available_scenes() -> list[str]:
+    return sorted(name[:-3] for name in os.listdir(SCENES_DIR) if name.endswith(".py"))
+
+def phase_seconds(result: dict, wall_seconds: float) -> dict:
+    """Split one render's wall time into phases from its timing profile; the remainder is "other"."""
+    totals = result["timing_profile"]["totals"]
+    # The preflight compiles the scene's TeX (and any narration the prefetch missed) before the render
+    # does, so that work is counted in tex and tts rather than in preflight
+    preflight_latex, preflight_tts = totals.get("preflight_latex", 0.0), totals.get("preflight_tts", 0.0)
+    phases = {
+        "preflight": max(0.0, totals.get("preflight", 0.0) - preflight_latex - preflight_tts),
+        "tex": totals.get("latex", 0.0) + preflight_latex,
+        # Prefetched clips, plus any the preflight or the scene still had to synthesize itself
+        "tts": totals.get("tts_prefetch", 0.0) + preflight_tts + totals.get("tts", 0.0),
+        "cairo": totals.get("cairo", 0.0),
+        "ffmpeg": totals.get("encoding", 0.0) + totals.get("faststart", 0.0) + totals.get("renditions", 0.0)
+            + totals.get("previews", 0.0),
+        "upload": totals.get("upload", 0.0),
+        # Storing TeX, voiceovers and partial movies for incremental re-renders (keep_render_state)
+        "render_state": totals.get("render_state", 0.0),
+    }
+    phases["other"] = max(0.0, wall_seconds - sum(phases.values()))
+    phases["wall"] = wall_seconds
+    return phases
+
+def bench_scene(name: str, args, storage_url: str) -> dict:
+    with open(os.path.join(SCENES_DIR, f"{name}.py"), encoding="utf-8") as f:
+        code = f.read()
+    request_body = {
+        "code": code,
+        "scene_name": "GeneratedScene",
+        "resolution": args.resolution,
+        "render_profile": args.profile,
+        "upload_url": f"{storage_url}/bench/{name}.mp4",
+        "keep_render_state": args.keep_render_state,
+    }
+
+    runs = []
+    for repeat in range(args.repeats):
+        start = time.perf_counter()
+        # The pipeline logs every step; keep the benchmark output readable
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            result = run_render_pipeline(request_body, job_id=f"bench-{name}-{repeat}-{os.getpid()}")
+        wall_seconds = time.perf_counter() - start
+        if not result["success"]:
+            return {"scene": name, "success": False, "error": result["error"][-1000:]}
+        runs.append({
+            "seconds": phase_seconds(result, wall_seconds),
+            "peak_rss_mb": max((usage["peak_rss_mb"] for usage in result["resources"]), default=None),
+            "frames": sum(animation["frames"] for animation in result["timing_profile"]["animations"]),
+            "bytes": result["upload"]["bytes"],
+        })
+
+    return {
+        "scene": name,
+        "success": True,
+        "repeats": args.repeats,
+        "seconds": {
+            phase: round(statistics.median(run["seconds"][phase] for run in runs), 3)
+            for phase in PHASES + ("other", "wall")
+        },
+        "peak_rss_mb": max((run["peak_rss_mb"] for run in runs if run["peak_rss_mb"] is not None), default=None),
+        "frames": runs[-1]["frames"],
+        "bytes": runs[-1]["bytes"],
+    }
+
+def find_regressions(results: list[dict], baseline: dict, tolerance: float) -> list[dict]:
+    """Scenes whose median wall time grew by more than tolerance (a fraction) over the baseline report."""
+    previous = {entry["scene"]: entry for entry in baseline["scenes"] if entry.get("success")}
+    regressions = []
+    for entry in results:
+        before = previous.get(entry["scene"])
+        if not entry["success"] or before is None:
+            continue
+        ratio = entry["seconds"]["wall"] / before["seconds"]["wall"]
+        if ratio > 1 + tolerance:
+            regressions.append({"scene": entry["scene"], "before": before["seconds"]["wall"], "after": entry["seconds"]["wall"], "ratio": round(ratio, 2)})
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenes", nargs="+", default=available_scenes(), choices=available_scenes())
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--resolution", default="720p")
+    parser.add_argument("--profile", default="final")
+    parser.add_argument("--tts-latency", type=float, default=0.3, help="seconds the stub TTS waits per clip")
+    parser.add_argument("--keep-render-state", action="store_true", help="store each render's state for incremental re-renders")
+    parser.add_argument("--output", help="write the full JSON report here")
+    parser.add_argument("--baseline", help="earlier --output report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed wall time growth over the baseline")
+    args = parser.parse_args()
+
+    storage_root = tempfile.mkdtemp(prefix="bench-storage-")
+    # Never the /cache Volume mount: stored render state and shared assets stay local to the benchmark
+    os.environ["RENDER_CACHE_DIR"] = tempfile.mkdtemp(prefix="bench-render-cache-")
+    storage = stub_storage_server.serve(0, storage_root)
+    tts = stub_tts_server.serve(0, args.tts_latency)
+    # Both the prefetch (in-process) and the scene's own speech service (in Manim) use the stub
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{tts.server_address[1]}/v1"
+    os.environ["OPENAI_API_KEY"] = "stub"
+
+    results = []
+    for name in args.scenes:
+        entry = bench_scene(name, args, f"http://127.0.0.1:{storage.server_address[1]}")
+        results.append(entry)
+        print(json.dumps(entry), flush=True)
+
+    report = {
+        "created_at": time.time(),
+        "environment": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "settings": {
+            "resolution": args.resolution, "profile": args.profile, "repeats": args.repeats,
+            "tts_latency": args.tts_latency, "keep_render_state": args.keep_render_state,
+        },
+        "scenes": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        print(json.dumps({"regressions": regressions}))
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
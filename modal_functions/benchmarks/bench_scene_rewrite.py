@@ -0,0 +1,101 @@
+"""
+Benchmark the fallback scene rewrite pipeline on large generated scenes.
+
+Usage:
+    python modal_functions/benchmarks/bench_scene_rewrite.py --sections 50 200 1000
+
+Prints one JSON object per scene size with the median time of each stage.
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from manim_render import (  # noqa: E402
+    parse_scene,
+    rewrite_scene,
+    validate_chart_completeness,
+    validate_text_latex_usage,
+)
+
+SCENE_HEADER = '''from manim import *
+from manim_voiceover import VoiceoverScene
+from manim_voiceover.services.openai import OpenAIService
+
+class GeneratedScene(VoiceoverScene):
+    def construct(self):
+        self.set_speech_service(OpenAIService(voice="fable", model="tts-1-hd"))
+        title = Text("Quarterly results title", font_size=48)
+'''
+
+# One section of the kind of code the explainer prompts generate: narration, an equation, a chart and camera moves
+SCENE_SECTION = '''
+        with self.voiceover(text="Section {i}: here is how the numbers change over time.") as tracker:
+            equation_{i} = MathTex("\\frac{{a_{i}}}{{b}} = {{{{c}}}}")
+            ax_{i} = Axes(x_range=[0, 10], y_range=[0, 100], x_length=6, y_length=4)
+            graph_{i} = ax_{i}.get_graph(lambda x: x ** 2, color=BLUE)
+            labels_{i} = VGroup(Text("Revenue"), MathTex("x^2"))
+            self.play(Write(equation_{i}), run_time=tracker.duration)
+            self.play(Create(ax_{i}), Create(graph_{i}))
+        self.camera.frame.animate.scale(0.8)
+        for j in range(120):
+            dot = Circle(radius=0.1)
+        self.wait(0.2)
+        self.play(FadeOut(equation_{i}), FadeOut(ax_{i}), run_time=8)
+'''
+
+def generate_scene(sections: int) -> str:
+    return SCENE_HEADER + ''.join(SCENE_SECTION.format(i=i) for i in range(sections))
+
+def time_stage(fn, repeats: int) -> float:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+def bench(sections: int, repeats: int) -> dict:
+    code = generate_scene(sections)
+    tree = parse_scene(code)
+
+    def rewrite():
+        rewritten, _ = rewrite_scene(tree)
+        compile(ast.unparse(rewritten), "fallback_scene.py", "exec")
+
+    # Rules log every change; keep the benchmark output readable
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        results = {
+            "parse": time_stage(lambda: parse_scene(code), repeats),
+            "validate": time_stage(lambda: (validate_chart_completeness(code, tree), validate_text_latex_usage(code, tree)), repeats),
+            "rewrite_and_compile": time_stage(rewrite, repeats),
+        }
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    return {
+        "sections": sections,
+        "lines": code.count("\n") + 1,
+        "characters": len(code),
+        "seconds": {stage: round(seconds, 5) for stage, seconds in results.items()},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    for sections in args.sections:
+        print(json.dumps(bench(sections, args.repeats)))
+
+if __name__ == "__main__":
+    main()
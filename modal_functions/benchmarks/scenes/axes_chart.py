@@ -0,0 +1,31 @@
+from manim import *
+
+class GeneratedScene(Scene):
+    def construct(self):
+        title = Text("Revenue Growth 2019-2024", font_size=40).to_edge(UP)
+        ax = Axes(
+            x_range=[0, 6, 1],
+            y_range=[0, 120, 20],
+            x_length=9,
+            y_length=5,
+            axis_config={"include_numbers": True},
+        ).shift(DOWN * 0.5)
+        x_label = ax.get_x_axis_label(Text("Year", font_size=24))
+        y_label = ax.get_y_axis_label(Text("Revenue ($M)", font_size=24).rotate(PI / 2), edge=LEFT, direction=LEFT)
+
+        self.play(Write(title))
+        self.play(Create(ax), Write(x_label), Write(y_label), run_time=2)
+
+        values = [12, 25, 41, 58, 83, 110]
+        bars = VGroup(*[
+            Rectangle(width=0.6, height=ax.y_axis.unit_size * value, fill_color=BLUE, fill_opacity=0.8, stroke_width=0)
+            .move_to(ax.c2p(index + 0.5, 0), aligned_edge=DOWN)
+            for index, value in enumerate(values)
+        ])
+        self.play(LaggedStart(*[GrowFromEdge(bar, DOWN) for bar in bars], lag_ratio=0.2), run_time=2.5)
+
+        trend = ax.plot(lambda x: 12 * 1.55 ** x, x_range=[0.5, 5.5], color=YELLOW)
+        self.play(Create(trend), run_time=2)
+        label = MathTex(r"y = 12 \cdot 1.55^x", font_size=36, color=YELLOW).next_to(trend, UP)
+        self.play(Write(label))
+        self.wait(1.5)
@@ -0,0 +1,34 @@
+from manim import *
+
+SECTIONS = [
+    ("Supply", r"Q_s = c + d P"),
+    ("Demand", r"Q_d = a - b P"),
+    ("Equilibrium", r"a - b P = c + d P"),
+    ("Price", r"P^* = \frac{a - c}{b + d}"),
+    ("Quantity", r"Q^* = \frac{a d + b c}{b + d}"),
+    ("Elasticity", r"\varepsilon = \frac{\partial Q}{\partial P} \cdot \frac{P}{Q}"),
+    ("Surplus", r"CS = \int_0^{Q^*} D(q)\,dq - P^* Q^*"),
+    ("Tax", r"P_b - P_s = t"),
+    ("Deadweight loss", r"DWL = \tfrac{1}{2} t \Delta Q"),
+    ("Summary", r"\text{markets clear at } (Q^*, P^*)"),
+]
+
+class GeneratedScene(Scene):
+    def construct(self):
+        intro = Text("Ten Ideas in Market Equilibrium", font_size=48)
+        self.play(Write(intro))
+        self.wait(1)
+        self.play(FadeOut(intro))
+
+        for index, (heading, formula) in enumerate(SECTIONS):
+            header = Text(f"{index + 1}. {heading}", font_size=40).to_edge(UP)
+            equation = MathTex(formula, font_size=44)
+            ax = Axes(x_range=[0, 10, 2], y_range=[0, 10, 2], x_length=5, y_length=3).next_to(equation, DOWN)
+            curve = ax.plot(lambda x, k=index: 9 - 0.7 * x + 0.05 * k * x, color=BLUE)
+            dots = VGroup(*[Dot(ax.c2p(x, 9 - 0.7 * x), radius=0.05) for x in range(1, 10)])
+
+            self.play(FadeIn(header, shift=DOWN * 0.2), Write(equation))
+            self.play(Create(ax), Create(curve), run_time=1.5)
+            self.play(LaggedStart(*[GrowFromCenter(dot) for dot in dots], lag_ratio=0.1))
+            self.wait(0.5)
+            self.play(FadeOut(VGroup(header, equation, ax, curve, dots)))
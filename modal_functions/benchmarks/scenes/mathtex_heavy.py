@@ -0,0 +1,28 @@
+from manim import *
+
+class GeneratedScene(Scene):
+    def construct(self):
+        title = Text("Deriving the Quadratic Formula", font_size=44).to_edge(UP)
+        self.play(Write(title))
+
+        steps = [
+            r"a x^2 + b x + c = 0",
+            r"x^2 + \frac{b}{a} x = -\frac{c}{a}",
+            r"x^2 + \frac{b}{a} x + \frac{b^2}{4a^2} = \frac{b^2}{4a^2} - \frac{c}{a}",
+            r"\left(x + \frac{b}{2a}\right)^2 = \frac{b^2 - 4ac}{4a^2}",
+            r"x + \frac{b}{2a} = \pm \frac{\sqrt{b^2 - 4ac}}{2a}",
+            r"x = \frac{-b \pm \sqrt{b^2 - 4ac}}{2a}",
+        ]
+        current = MathTex(steps[0], font_size=48)
+        self.play(Write(current))
+        for step in steps[1:]:
+            following = MathTex(step, font_size=48)
+            self.play(TransformMatchingTex(current, following), run_time=1.5)
+            current = following
+            self.wait(0.5)
+
+        box = SurroundingRectangle(current, color=YELLOW, buff=0.2)
+        discriminant = MathTex(r"\Delta = b^2 - 4ac", font_size=40).next_to(box, DOWN, buff=0.6)
+        self.play(Create(box))
+        self.play(Write(discriminant))
+        self.wait(1)
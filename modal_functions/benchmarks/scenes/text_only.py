@@ -0,0 +1,20 @@
+from manim import *
+
+class GeneratedScene(Scene):
+    def construct(self):
+        title = Text("Why Compound Interest Wins", font_size=56)
+        subtitle = Text("Small gains, repeated, add up", font_size=32).next_to(title, DOWN)
+        self.play(Write(title), run_time=1.5)
+        self.play(FadeIn(subtitle, shift=UP * 0.3))
+        self.wait(1)
+
+        points = VGroup(
+            Text("1. Start early", font_size=36),
+            Text("2. Reinvest every return", font_size=36),
+            Text("3. Let time do the work", font_size=36),
+        ).arrange(DOWN, aligned_edge=LEFT, buff=0.5)
+        self.play(FadeOut(title), FadeOut(subtitle))
+        for point in points:
+            self.play(Write(point), run_time=1)
+        self.wait(1)
+        self.play(FadeOut(points))
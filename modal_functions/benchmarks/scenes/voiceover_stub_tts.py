@@ -0,0 +1,25 @@
+from manim import *
+from manim_voiceover import VoiceoverScene
+from manim_voiceover.services.openai import OpenAIService
+
+class GeneratedScene(VoiceoverScene):
+    def construct(self):
+        self.set_speech_service(OpenAIService(voice="fable", model="tts-1-hd"))
+
+        with self.voiceover(text="Photosynthesis turns light into chemical energy.") as tracker:
+            title = Text("Photosynthesis", font_size=56)
+            self.play(Write(title), run_time=tracker.duration)
+
+        with self.voiceover(text="Plants take in carbon dioxide and water.") as tracker:
+            inputs = MathTex(r"6CO_2 + 6H_2O", font_size=48)
+            self.play(title.animate.to_edge(UP), FadeIn(inputs), run_time=tracker.duration)
+
+        with self.voiceover(text="Using sunlight, they produce glucose and release oxygen.") as tracker:
+            arrow = MathTex(r"\xrightarrow{\text{light}}", font_size=48)
+            outputs = MathTex(r"C_6H_{12}O_6 + 6O_2", font_size=48)
+            equation = VGroup(inputs.copy(), arrow, outputs).arrange(RIGHT)
+            self.play(Transform(inputs, equation[0]), FadeIn(arrow), Write(outputs), run_time=tracker.duration)
+
+        with self.voiceover(text="That glucose fuels almost every living thing on Earth.") as tracker:
+            self.play(Circumscribe(outputs), run_time=tracker.duration)
+        self.wait(1)
@@ -0,0 +1,193 @@
+"""
+Local stand-in for Supabase Storage, for exercising render uploads without the cloud.
+
+Supports:
+- PUT <any path>: signed-URL style single upload
+- TUS 1.0.0 at /resumable: creation, checksum (sha1) and concatenation extensions
+- GET <path>: download what was stored
+
+Usage:
+    python modal_functions/benchmarks/stub_storage_server.py --port 9000 --root /tmp/stub-storage [--fail-rate 0.1]
+
+--fail-rate makes that fraction of uploads fail with a 503 after storing half the chunk,
+to exercise retries and resumption.
+"""
+import argparse
+import base64
+import hashlib
+import os
+import random
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TUS_PATH = "/resumable"
+TUS_VERSION = "1.0.0"
+
+class StubStorage:
+    """Objects and in-progress TUS uploads held on local disk."""
+
+    def __init__(self, root: str, fail_rate: float = 0.0):
+        self.root = root
+        self.fail_rate = fail_rate
+        self.lock = threading.Lock()
+        self.uploads = {}  # upload id -> {"length", "offset", "metadata", "partial"}
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(root, "uploads"), exist_ok=True)
+
+    def object_path(self, name: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, "objects", name.lstrip("/")))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def upload_path(self, upload_id: str) -> str:
+        return os.path.join(self.root, "uploads", upload_id)
+
+    def should_fail(self) -> bool:
+        return random.random() < self.fail_rate
+
+def make_handler(storage: StubStorage):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def reply(self, status: int, headers: dict = None, body: bytes = b""):
+            self.send_response(status)
+            self.send_header("Tus-Resumable", TUS_VERSION)
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def read_body(self) -> bytes:
+            return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        def upload_id(self):
+            if self.path.startswith(TUS_PATH + "/"):
+                return self.path[len(TUS_PATH) + 1:]
+            return None
+
+        def do_OPTIONS(self):
+            self.reply(204, {
+                "Tus-Version": TUS_VERSION,
+                "Tus-Extension": "creation,checksum,concatenation",
+                "Tus-Checksum-Algorithm": "sha1,md5",
+            })
+
+        def do_GET(self):
+            path = storage.object_path(self.path.split("?")[0])
+            if not os.path.exists(path):
+                return self.reply(404)
+            with open(path, "rb") as f:
+                self.reply(200, {"Content-Type": "application/octet-stream"}, f.read())
+
+        def do_PUT(self):
+            body = self.read_body()
+            if storage.should_fail():
+                return self.reply(503)
+            with open(storage.object_path(self.path.split("?")[0]), "wb") as f:
+                f.write(body)
+            self.reply(200, {"Content-Type": "application/json"}, b'{"Key": "%s"}' % self.path.encode())
+
+        def do_POST(self):
+            if self.path.rstrip("/") != TUS_PATH:
+                return self.reply(404)
+            self.read_body()
+            metadata = {}
+            for pair in filter(None, self.headers.get("Upload-Metadata", "").split(",")):
+                key, _, value = pair.strip().partition(" ")
+                metadata[key] = base64.b64decode(value).decode() if value else ""
+
+            concat = self.headers.get("Upload-Concat", "")
+            upload_id = uuid.uuid4().hex
+            if concat.startswith("final;"):
+                # Stitch finished partial uploads together in the given order
+                part_ids = [url.rstrip("/").rsplit("/", 1)[-1] for url in concat[len("final;"):].split()]
+                with open(storage.upload_path(upload_id), "wb") as out:
+                    for part_id in part_ids:
+                        part = storage.uploads.get(part_id)
+                        if part is None or part["offset"] != part["length"]:
+                            return self.reply(400)
+                        with open(storage.upload_path(part_id), "rb") as f:
+                            out.write(f.read())
+                length = os.path.getsize(storage.upload_path(upload_id))
+                with storage.lock:
+                    storage.uploads[upload_id] = {"length": length, "offset": length, "metadata": metadata, "partial": False}
+                self.finish_upload(upload_id)
+            else:
+                open(storage.upload_path(upload_id), "wb").close()
+                with storage.lock:
+                    storage.uploads[upload_id] = {
+                        "length": int(self.headers["Upload-Length"]),
+                        "offset": 0,
+                        "metadata": metadata,
+                        "partial": concat == "partial",
+                    }
+            self.reply(201, {"Location": f"{TUS_PATH}/{upload_id}"})
+
+        def do_HEAD(self):
+            upload = storage.uploads.get(self.upload_id())
+            if upload is None:
+                return self.reply(404)
+            self.reply(200, {"Upload-Offset": str(upload["offset"]), "Upload-Length": str(upload["length"]), "Cache-Control": "no-store"})
+
+        def do_PATCH(self):
+            upload_id = self.upload_id()
+            upload = storage.uploads.get(upload_id)
+            body = self.read_body()
+            if upload is None:
+                return self.reply(404)
+            if int(self.headers.get("Upload-Offset", -1)) != upload["offset"]:
+                return self.reply(409)
+
+            checksum = self.headers.get("Upload-Checksum")
+            if checksum:
+                algorithm, _, expected = checksum.partition(" ")
+                if base64.b64encode(hashlib.new(algorithm, body).digest()).decode() != expected:
+                    return self.reply(460)
+
+            if storage.should_fail():
+                # Keep part of the chunk, like a connection dropped mid-transfer
+                body = body[:len(body) // 2]
+                self.append(upload_id, upload, body)
+                return self.reply(503)
+
+            self.append(upload_id, upload, body)
+            if upload["offset"] == upload["length"] and not upload["partial"]:
+                self.finish_upload(upload_id)
+            self.reply(204, {"Upload-Offset": str(upload["offset"])})
+
+        def append(self, upload_id: str, upload: dict, body: bytes):
+            with open(storage.upload_path(upload_id), "ab") as f:
+                f.write(body)
+            upload["offset"] += len(body)
+
+        def finish_upload(self, upload_id: str):
+            metadata = storage.uploads[upload_id]["metadata"]
+            name = os.path.join(metadata.get("bucketName", "default"), metadata.get("objectName", upload_id))
+            os.replace(storage.upload_path(upload_id), storage.object_path(name))
+
+    return Handler
+
+def serve(port: int, root: str, fail_rate: float = 0.0) -> ThreadingHTTPServer:
+    """Start the stand-in server on a background thread and return it."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(StubStorage(root, fail_rate)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--root", default="/tmp/stub-storage")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(StubStorage(args.root, args.fail_rate)))
+    print(f"Stub storage listening on http://127.0.0.1:{args.port} (TUS endpoint {TUS_PATH}, files in {args.root})")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Local stand-in for the OpenAI speech endpoint, for rendering voiceover scenes without the API.
+
+Supports:
+- POST /v1/audio/speech: returns silent MP3 audio lasting as long as the text would take to read
+
+Point the OpenAI client at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1 (any OPENAI_API_KEY works).
+
+Usage:
+    python modal_functions/benchmarks/stub_tts_server.py --port 9100 [--latency 0.4]
+
+--latency adds that many seconds to every request, to stand in for the real API's response time.
+"""
+import argparse
+import json
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SPEECH_PATH = "/v1/audio/speech"
+# Narration pace used to size the audio, roughly the speed of OpenAI's voices
+WORDS_PER_SECOND = 2.5
+MIN_SECONDS = 0.5
+
+class StubSpeech:
+    """Silent clips encoded once per duration (to the nearest tenth of a second)."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.clips = {}
+
+    def clip(self, text: str) -> bytes:
+        seconds = round(max(MIN_SECONDS, len(text.split()) / WORDS_PER_SECOND), 1)
+        with self.lock:
+            if seconds not in self.clips:
+                self.clips[seconds] = subprocess.run(
+                    ["ffmpeg", "-v", "error", "-f", "lavfi", "-i", "anullsrc=r=24000:cl=mono", "-t", str(seconds),
+                     "-c:a", "libmp3lame", "-b:a", "32k", "-f", "mp3", "pipe:1"],
+                    capture_output=True, check=True
+                ).stdout
+            return self.clips[seconds]
+
+def make_handler(speech: StubSpeech):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def reply(self, status: int, content_type: str, body: bytes):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self.path.rstrip("/") != SPEECH_PATH:
+                return self.reply(404, "application/json", b'{"error": {"message": "not found"}}')
+            try:
+                text = json.loads(body)["input"]
+            except (ValueError, KeyError):
+                return self.reply(400, "application/json", b'{"error": {"message": "input is required"}}')
+            time.sleep(speech.latency)
+            self.reply(200, "audio/mpeg", speech.clip(text))
+
+    return Handler
+
+def serve(port: int = 0, latency: float = 0.0) -> ThreadingHTTPServer:
+    """Start the stand-in server on a background thread and return it (port 0 picks a free port)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(StubSpeech(latency)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(StubSpeech(args.latency)))
+    print(f"Stub TTS listening on http://127.0.0.1:{args.port}{SPEECH_PATH}")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
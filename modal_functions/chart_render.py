@@ -5,6 +5,7 @@ import pandas as pd
 import numpy as np
 import base64
 import os
+import re
 import json
 from io import BytesIO
 
@@ -19,6 +20,9 @@ image = modal.Image.debian_slim().pip_install(
     "fastapi[standard]"
 )
 
+# Where uploaded data files are saved; generated code reads them from this path
+DATA_DIR = '/mnt/data'
+
 @app.function(image=image)
 @modal.fastapi_endpoint(method="POST")
 def generate_chart(request_body: dict) -> dict:
@@ -26,25 +30,35 @@ def generate_chart(request_body: dict) -> dict:
     Execute validated Python chart code and return base64-encoded PNG.
     Code is already validated by Code Interpreter.
     """
+    return run_chart_pipeline(request_body)
+
+def run_chart_pipeline(request_body: dict, data_dir: str = DATA_DIR) -> dict:
+    """Run chart code and encode the figure; shared by the Modal function and local backends.
+
+    The code reads its data file from DATA_DIR; with another data_dir, those paths are rewritten to it.
+    """
     # Extract code from request body
     code = request_body.get("code", "")
     
     if not code:
         return {"error": "No code provided in request body"}
     
+    if data_dir != DATA_DIR:
+        code = re.sub(re.escape(DATA_DIR) + r"(?=[/'\"])", lambda match: data_dir, code)
+    
     # Handle data file if provided
     data_file_info = request_body.get("dataFile")
     if data_file_info:
         try:
-            # Create /mnt/data directory
-            os.makedirs('/mnt/data', exist_ok=True)
+            # Create the data directory
+            os.makedirs(data_dir, exist_ok=True)
             
             # Decode base64 file data
             file_buffer = base64.b64decode(data_file_info["buffer"])
             filename = data_file_info["filename"]
-            file_path = f'/mnt/data/{filename}'
+            file_path = os.path.join(data_dir, filename)
             
-            # Save file to /mnt/data/
+            # Save file to the data directory
             with open(file_path, 'wb') as f:
                 f.write(file_buffer)
             
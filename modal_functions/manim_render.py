@@ -3,6 +3,22 @@ import subprocess
 import requests
 import os
 import re
+import ast
+import json
+import base64
+import random
+import hashlib
+import pickle
+import time
+import uuid
+import shutil
+import signal
+import sys
+import threading
+from pathlib import Path
+from collections import deque
+from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pydantic import BaseModel
 from fastapi import Request
 
@@ -22,248 +38,2463 @@ def sanitize_unicode(text):
         print("⚠️ Sanitized problematic Unicode characters")
         return sanitized
 
-def fix_syntax_errors(code):
-    """Fix common syntax errors in generated Python code"""
-    # First sanitize Unicode
-    code = sanitize_unicode(code)
-    
-    lines = code.split('\n')
-    fixed_lines = []
-    paren_count = 0
-    bracket_count = 0
-    brace_count = 0
-    
-    for i, line in enumerate(lines):
-        # Sanitize each line
-        line = sanitize_unicode(line)
-        
-        # Count parentheses, brackets, and braces
-        paren_count += line.count('(') - line.count(')')
-        bracket_count += line.count('[') - line.count(']')
-        brace_count += line.count('{') - line.count('}')
-        
-        # Skip lines that are just closing parentheses without content
-        if line.strip() == ')' and paren_count < 0:
-            print(f"⚠️ Removing orphaned closing parenthesis at line {i+1}")
-            continue
-            
-        # Skip lines that are just closing brackets without content
-        if line.strip() == ']' and bracket_count < 0:
-            print(f"⚠️ Removing orphaned closing bracket at line {i+1}")
-            continue
-            
-        # Skip lines that are just closing braces without content
-        if line.strip() == '}' and brace_count < 0:
-            print(f"⚠️ Removing orphaned closing brace at line {i+1}")
-            continue
-        
-        # Skip orphaned string literals (lines that are just strings without proper context)
-        if (line.strip().startswith('"') and line.strip().endswith('"') and 
-            '=' not in line and 'self.' not in line and 'print(' not in line and
-            'Text(' not in line and 'Tex(' not in line and 'MathTex(' not in line):
-            print(f"⚠️ Removing orphaned string literal at line {i+1}: {line.strip()[:50]}...")
-            continue
-            
-        fixed_lines.append(line)
-    
-    # Add missing closing parentheses if needed
-    while paren_count > 0:
-        fixed_lines.append(')')
-        paren_count -= 1
-        print("⚠️ Added missing closing parenthesis")
-    
-    while bracket_count > 0:
-        fixed_lines.append(']')
-        bracket_count -= 1
-        print("⚠️ Added missing closing bracket")
-        
-    while brace_count > 0:
-        fixed_lines.append('}')
-        brace_count -= 1
-        print("⚠️ Added missing closing brace")
-    
-    return '\n'.join(fixed_lines)
-
-def fix_indentation(code):
-    """Fix indentation issues in Python code while preserving structure"""
-    lines = code.split('\n')
-    fixed_lines = []
-    in_class = False
-    in_method = False
-    first_non_empty_line = True
-    
-    for i, line in enumerate(lines):
-        line_stripped = line.strip()
-        
-        # Skip empty lines - preserve them
-        if not line_stripped:
-            fixed_lines.append('')
-            continue
-        
-        # CRITICAL: First non-empty line should NEVER have indentation
-        if first_non_empty_line:
-            if line_stripped.startswith('import ') or line_stripped.startswith('from '):
-                fixed_lines.append(line_stripped)  # NO indentation for imports
-                in_class = False
-                in_method = False
-                first_non_empty_line = False
-            elif line_stripped.startswith('class '):
-                fixed_lines.append(line_stripped)  # NO indentation for class
-                in_class = True
-                in_method = False
-                first_non_empty_line = False
-            elif line_stripped.startswith('def '):
-                fixed_lines.append(line_stripped)  # NO indentation for top-level def
-                in_method = False
-                first_non_empty_line = False
-            else:
-                # Any other first line should also have no indentation
-                fixed_lines.append(line_stripped)
-                first_non_empty_line = False
-            continue
-        
-        # Top-level imports and class definitions - NO indentation
-        if line_stripped.startswith('import ') or line_stripped.startswith('from '):
-            fixed_lines.append(line_stripped)
-            in_class = False
-            in_method = False
-        elif line_stripped.startswith('class '):
-            fixed_lines.append(line_stripped)
-            in_class = True
-            in_method = False
-        elif line_stripped.startswith('def '):
-            if in_class:
-                # Method inside class - indent 4 spaces
-                fixed_lines.append('    ' + line_stripped)
-                in_method = True
-            else:
-                # Top-level function - no indent
-                fixed_lines.append(line_stripped)
-                in_method = False
-        elif in_method and line_stripped.startswith('self.'):
-            # Code inside method - indent 8 spaces
-            fixed_lines.append('        ' + line_stripped)
-        elif in_method:
-            # Other code inside method - indent 8 spaces
-            fixed_lines.append('        ' + line_stripped)
-        else:
-            # Preserve original indentation if not in a known context
-            fixed_lines.append(line)
-    
-    return '\n'.join(fixed_lines)
+def parse_scene(code: str):
+    """Parse scene code once so validators, prefetch and fallback rewrites can share the tree.
 
-def aggressive_syntax_cleanup(code):
-    """Aggressively clean up syntax errors by removing problematic lines and fixing indentation"""
-    # First sanitize Unicode
-    code = sanitize_unicode(code)
-    
-    lines = code.split('\n')
-    cleaned_lines = []
-    expected_indent = 0
-    
-    for i, line in enumerate(lines):
-        # Sanitize each line
-        line = sanitize_unicode(line)
-        line_stripped = line.strip()
-        
-        # Skip lines that are just string literals without context
-        if (line_stripped.startswith('"') and line_stripped.endswith('"') and
-            '=' not in line and 'self.' not in line and 'print(' not in line and
-            'Text(' not in line and 'Tex(' not in line and 'MathTex(' not in line):
-            print(f"⚠️ Aggressively removing string literal at line {i+1}")
-            continue
-            
-        # Skip lines that are just closing delimiters
-        if line_stripped in [')', ']', '}']:
-            print(f"⚠️ Aggressively removing closing delimiter at line {i+1}")
-            continue
-            
-        # Skip lines that look like orphaned text
-        if (line_stripped and not line_stripped.startswith('#') and 
-            not line_stripped.startswith('import') and
-            not line_stripped.startswith('from') and
-            not line_stripped.startswith('class') and
-            not line_stripped.startswith('def') and
-            not line_stripped.startswith('self.') and
-            not line_stripped.startswith('    ') and
-            '=' not in line and
-            line_stripped.count('"') == 2 and line_stripped.startswith('"') and line_stripped.endswith('"')):
-            print(f"⚠️ Aggressively removing orphaned text at line {i+1}")
-            continue
-        
-        # Fix indentation issues
-        if line_stripped:
-            # Calculate proper indentation based on context
-            if line_stripped.startswith('class ') or line_stripped.startswith('def '):
-                expected_indent = 0
-            elif line_stripped.startswith('self.'):
-                expected_indent = 8  # Inside class method
-            else:
-                expected_indent = 8  # Default for method content
-            
-            # Fix the indentation
-            fixed_line = ' ' * expected_indent + line_stripped
-            cleaned_lines.append(fixed_line)
-        else:
-            cleaned_lines.append(line)
-    
-    return '\n'.join(cleaned_lines)
+    Returns None if the code does not parse.
+    """
+    try:
+        return ast.parse(code)
+    except SyntaxError as e:
+        print(f"⚠️ Scene code does not parse: {e}")
+        return None
+
+def call_name(node: ast.Call):
+    """Name a call invokes: 'Text' for Text(...), 'play' for self.play(...)."""
+    if isinstance(node.func, ast.Name):
+        return node.func.id
+    if isinstance(node.func, ast.Attribute):
+        return node.func.attr
+    return None
+
+def is_self_call(node, method: str) -> bool:
+    """Whether node is a call to self.<method>(...)."""
+    return (
+        isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+        and node.func.attr == method
+        and isinstance(node.func.value, ast.Name) and node.func.value.id == 'self'
+    )
+
+def bound_names(target) -> set:
+    """Names an assignment or loop target binds: {'a', 'b'} for a, (b, *_)."""
+    return {child.id for child in ast.walk(target) if isinstance(child, ast.Name)}
+
+def argument_names(args: ast.arguments) -> set:
+    """Parameter names of a function or lambda."""
+    params = args.posonlyargs + args.args + args.kwonlyargs + [args.vararg, args.kwarg]
+    return {param.arg for param in params if param is not None}
+
+def is_number(node) -> bool:
+    return isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool)
+
+def statement_at(source: str, node: ast.AST) -> ast.stmt:
+    """Parse a single statement and give it node's source location."""
+    statement = ast.parse(source).body[0]
+    for child in ast.walk(statement):
+        ast.copy_location(child, node)
+    return statement
+
+def source_segment_reader(code: str):
+    """Return a function giving a node's source text, like ast.get_source_segment without rescanning the code each call."""
+    source = code.encode('utf-8')
+    line_starts = [0]
+    for line in source.splitlines(keepends=True):
+        line_starts.append(line_starts[-1] + len(line))
+
+    def source_segment(node) -> str:
+        # AST column offsets count UTF-8 bytes
+        start = line_starts[node.lineno - 1] + node.col_offset
+        end = line_starts[node.end_lineno - 1] + node.end_col_offset
+        return source[start:end].decode('utf-8', errors='replace')
+
+    return source_segment
+
+def find_scene_class(tree: ast.Module, preferred: str = None):
+    """Return preferred if the module defines it, otherwise the first class deriving from a *Scene base."""
+    class_names = [node.name for node in tree.body if isinstance(node, ast.ClassDef)]
+    if preferred in class_names:
+        return preferred
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            for base in node.bases:
+                base_name = base.id if isinstance(base, ast.Name) else getattr(base, 'attr', '')
+                if base_name.endswith('Scene'):
+                    return node.name
+    return None
+
+class SceneRewriteRule(ast.NodeTransformer):
+    """A fallback rewrite rule: an AST transformer that records every change it makes."""
+
+    name = "rule"
+
+    def __init__(self):
+        self.changes = []
+
+    def record(self, node, message: str):
+        line = getattr(node, 'lineno', '?')
+        self.changes.append(f"line {line}: {message}")
+        print(f"⚠️ [{self.name}] {message} at line {line}")
+
+class StripVoiceoverRule(SceneRewriteRule):
+    """Remove manim_voiceover: imports, speech service setup and voiceover blocks (keeping their animations).
+
+    Bookmark waits become one-second waits and tracker values become 1, since a plain Scene has neither.
+    A tracker is only replaced inside its own voiceover block, and not where a lambda, comprehension,
+    nested function or assignment rebinds its name.
+    """
+
+    name = "strip-voiceover"
+
+    def __init__(self):
+        super().__init__()
+        self.trackers = set()
+
+    def visit_ImportFrom(self, node):
+        if node.module and node.module.startswith('manim_voiceover'):
+            self.record(node, "Removed voiceover import")
+            return None
+        return node
+
+    def visit_Import(self, node):
+        names = [alias for alias in node.names if not alias.name.startswith('manim_voiceover')]
+        if len(names) != len(node.names):
+            self.record(node, "Removed voiceover import")
+            if not names:
+                return None
+            node.names = names
+        return node
+
+    def visit_ClassDef(self, node):
+        for base in node.bases:
+            if isinstance(base, ast.Name) and base.id == 'VoiceoverScene':
+                base.id = 'Scene'
+                self.record(node, "Replaced VoiceoverScene with Scene")
+        self.generic_visit(node)
+        return node
+
+    def visit_Expr(self, node):
+        if isinstance(node.value, ast.Call) and (
+            is_self_call(node.value, 'set_speech_service') or call_name(node.value) == 'OpenAIService'
+        ):
+            self.record(node, "Removed speech service setup")
+            return None
+        if is_self_call(node.value, 'wait_until_bookmark'):
+            self.record(node, "Replaced wait_until_bookmark() with self.wait(1)")
+            return statement_at("self.wait(1)", node)
+        self.generic_visit(node)
+        return node
+
+    def visit_Assign(self, node):
+        if isinstance(node.value, ast.Call) and call_name(node.value) == 'OpenAIService':
+            self.record(node, "Removed speech service setup")
+            return None
+        self.generic_visit(node)
+        # t = ... rebinds the name for the rest of the block
+        for target in node.targets:
+            self.trackers -= bound_names(target)
+        return node
+
+    def visit_AnnAssign(self, node):
+        self.generic_visit(node)
+        self.trackers -= bound_names(node.target)
+        return node
+
+    def visit_NamedExpr(self, node):
+        self.generic_visit(node)
+        self.trackers -= bound_names(node.target)
+        return node
+
+    def visit_For(self, node):
+        node.iter = self.visit(node.iter)
+        self.trackers -= bound_names(node.target)
+        for field in ('body', 'orelse'):
+            setattr(node, field, self.visit_statements(getattr(node, field)))
+        return node
+
+    def visit_Lambda(self, node):
+        return self.visit_shadowed(node, argument_names(node.args))
+
+    def visit_FunctionDef(self, node):
+        return self.visit_shadowed(node, argument_names(node.args))
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_comprehension_node(self, node):
+        names = set()
+        for generator in node.generators:
+            names |= bound_names(generator.target)
+        return self.visit_shadowed(node, names)
+
+    visit_ListComp = visit_SetComp = visit_DictComp = visit_GeneratorExp = visit_comprehension_node
+
+    def visit_shadowed(self, node, names):
+        """Visit node with names not treated as trackers (they are its own parameters or loop variables)."""
+        outer = self.trackers
+        self.trackers = outer - names
+        self.generic_visit(node)
+        self.trackers = outer
+        return node
+
+    def visit_statements(self, statements):
+        visited = []
+        for statement in statements:
+            result = self.visit(statement)
+            if isinstance(result, list):
+                visited.extend(result)
+            elif result is not None:
+                visited.append(result)
+        return visited
+
+    def visit_With(self, node):
+        voiceover_items = [item for item in node.items if is_self_call(item.context_expr, 'voiceover')]
+        if not voiceover_items:
+            self.generic_visit(node)
+            return node
+        trackers = {item.optional_vars.id for item in voiceover_items if isinstance(item.optional_vars, ast.Name)}
+        node.items = [self.visit(item) for item in node.items if item not in voiceover_items]
+        # The trackers only exist inside this block
+        outer = self.trackers
+        self.trackers = outer | trackers
+        node.body = self.visit_statements(node.body) or [ast.copy_location(ast.Pass(), node)]
+        self.trackers = outer
+        if node.items:
+            # with self.voiceover(...) as tracker, open(...) as f: keeps the other context managers
+            self.record(node, "Removed voiceover from with statement")
+            return node
+        self.record(node, "Unwrapped voiceover block")
+        return node.body
+
+    def visit_Call(self, node):
+        # tracker.get_remaining_duration() and friends
+        if isinstance(node.func, ast.Attribute) and isinstance(node.func.value, ast.Name) and node.func.value.id in self.trackers:
+            self.record(node, f"Replaced {node.func.value.id}.{node.func.attr}() with 1")
+            return ast.copy_location(ast.Constant(1), node)
+        self.generic_visit(node)
+        return node
+
+    def visit_Attribute(self, node):
+        # run_time=tracker.duration
+        if isinstance(node.value, ast.Name) and node.value.id in self.trackers:
+            self.record(node, f"Replaced {node.value.id}.{node.attr} with 1")
+            return ast.copy_location(ast.Constant(1), node)
+        self.generic_visit(node)
+        return node
+
+    def visit_Name(self, node):
+        # A tracker passed around as a value
+        if node.id in self.trackers and isinstance(node.ctx, ast.Load):
+            self.record(node, f"Replaced {node.id} with 1")
+            return ast.copy_location(ast.Constant(1), node)
+        return node
+
+class ConfigStyleRule(SceneRewriteRule):
+    """Manim 0.18.1 has no config style attribute: replace config["style"] and config.style with "dark"."""
+
+    name = "config-style"
+
+    def visit_Subscript(self, node):
+        if (isinstance(node.value, ast.Name) and node.value.id == 'config'
+                and isinstance(node.slice, ast.Constant) and node.slice.value == 'style'
+                and isinstance(node.ctx, ast.Load)):
+            self.record(node, 'Replaced config["style"] with "dark"')
+            return ast.copy_location(ast.Constant("dark"), node)
+        self.generic_visit(node)
+        return node
+
+    def visit_Attribute(self, node):
+        if (isinstance(node.value, ast.Name) and node.value.id == 'config'
+                and node.attr == 'style' and isinstance(node.ctx, ast.Load)):
+            self.record(node, 'Replaced config.style with "dark"')
+            return ast.copy_location(ast.Constant("dark"), node)
+        self.generic_visit(node)
+        return node
+
+# Chart classes generated code expects but Manim doesn't provide, with their replacements
+UNSUPPORTED_CHART_CLASSES = {
+    'PieChart': 'Circle',
+    'BarChart': 'Rectangle',
+    'LineChart': 'Line',
+    'Histogram': 'Rectangle',
+    'ScatterPlot': 'Dot',
+    'AreaChart': 'Polygon',
+    'BubbleChart': 'Circle',
+    'RadarChart': 'Polygon',
+    'Heatmap': 'Rectangle',
+    'Treemap': 'Rectangle',
+}
+
+class UnsupportedChartClassRule(SceneRewriteRule):
+    """Replace undefined chart classes with basic Manim shapes."""
+
+    name = "chart-classes"
+
+    def visit_Name(self, node):
+        if node.id in UNSUPPORTED_CHART_CLASSES and isinstance(node.ctx, ast.Load):
+            replacement = UNSUPPORTED_CHART_CLASSES[node.id]
+            self.record(node, f"Replaced undefined class {node.id} with {replacement}")
+            node.id = replacement
+        return node
+
+# Escape sequences Python applies to LaTeX commands in non-raw strings ("\frac" -> form feed + "rac")
+MANGLED_LATEX_ESCAPES = {
+    '\a': '\\a',
+    '\b': '\\b',
+    '\f': '\\f',
+    '\n': '\\n',
+    '\r': '\\r',
+    '\t': '\\t',
+    '\v': '\\v',
+}
+MANGLED_LATEX_PATTERN = re.compile('([' + ''.join(MANGLED_LATEX_ESCAPES) + '])(?=[A-Za-z])')
+
+class LatexStringRule(SceneRewriteRule):
+    """Restore LaTeX commands mangled by non-raw strings and break up {{ }} groups in MathTex."""
+
+    name = "latex-strings"
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        name = call_name(node)
+        if name not in ('MathTex', 'Tex'):
+            return node
+        for arg in node.args:
+            if not (isinstance(arg, ast.Constant) and isinstance(arg.value, str)):
+                continue
+            value = MANGLED_LATEX_PATTERN.sub(lambda m: MANGLED_LATEX_ESCAPES[m.group(1)], arg.value)
+            if value != arg.value:
+                self.record(node, f"Restored LaTeX escapes in {name}()")
+            if name == 'MathTex' and '{{' in value:
+                value = value.replace('{{', '{ {').replace('}}', '} }')
+                self.record(node, "Split {{ }} groups in MathTex()")
+            arg.value = value
+        return node
+
+class GraphApiRule(SceneRewriteRule):
+    """Fix graph API calls Manim 0.18.1 rejects."""
+
+    name = "graph-api"
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        keywords = {keyword.arg: keyword for keyword in node.keywords}
+
+        if call_name(node) == 'get_graph' and 'color' in keywords and isinstance(node.func, ast.Attribute):
+            node.func.attr = 'plot'
+            self.record(node, "Replaced get_graph() with plot()")
+
+        add_vertex_dots = keywords.get('add_vertex_dots')
+        if call_name(node) == 'plot_line_graph' and add_vertex_dots is not None:
+            if isinstance(add_vertex_dots.value, ast.Constant) and add_vertex_dots.value.value is True:
+                add_vertex_dots.value = ast.copy_location(ast.Constant(False), add_vertex_dots.value)
+                self.record(node, "Disabled plot_line_graph vertex dots")
+
+        vertex_dot_style = keywords.get('vertex_dot_style')
+        if vertex_dot_style is not None and isinstance(vertex_dot_style.value, ast.Dict):
+            style = vertex_dot_style.value
+            kept = [
+                (key, value) for key, value in zip(style.keys, style.values)
+                if not (isinstance(key, ast.Constant) and key.value == 'radius')
+            ]
+            if len(kept) != len(style.keys):
+                style.keys = [key for key, _ in kept]
+                style.values = [value for _, value in kept]
+                self.record(node, "Removed radius from vertex_dot_style")
+
+        return node
+
+class CameraFrameRule(SceneRewriteRule):
+    """Manim 0.18.1 Scenes have no camera.frame: turn frame animations into waits and drop other references."""
+
+    name = "camera-frame"
+
+    @staticmethod
+    def references_camera_frame(node) -> bool:
+        return any(
+            isinstance(child, ast.Attribute) and child.attr == 'frame'
+            and isinstance(child.value, ast.Attribute) and child.value.attr == 'camera'
+            and isinstance(child.value.value, ast.Name) and child.value.value.id == 'self'
+            for child in ast.walk(node)
+        )
+
+    def rewrite_statement(self, node):
+        if not self.references_camera_frame(node):
+            return node
+        if any(isinstance(child, ast.Attribute) and child.attr == 'animate' for child in ast.walk(node)):
+            self.record(node, "Replaced camera.frame animation with wait")
+            return statement_at("self.wait(0.5)", node)
+        self.record(node, "Removed camera.frame reference")
+        return None
+
+    visit_Expr = rewrite_statement
+    visit_Assign = rewrite_statement
+    visit_AugAssign = rewrite_statement
+
+class MixedGroupRule(SceneRewriteRule):
+    """Use Group for VGroups holding text or numbers, and flatten VGroup(VGroup(...))."""
+
+    name = "mixed-groups"
+
+    def visit_Call(self, node):
+        if call_name(node) != 'VGroup' or not isinstance(node.func, ast.Name):
+            self.generic_visit(node)
+            return node
+
+        inner = node.args[0] if len(node.args) == 1 and not node.keywords else None
+        if isinstance(inner, ast.Call) and isinstance(inner.func, ast.Name) and inner.func.id == 'VGroup':
+            self.record(node, "Simplified nested VGroup")
+            node = inner
+        self.generic_visit(node)
+
+        if any(
+            isinstance(child, ast.Call) and call_name(child) in ('Text', 'MathTex', 'DecimalNumber')
+            for arg in node.args for child in ast.walk(arg)
+        ):
+            node.func.id = 'Group'
+            self.record(node, "Replaced VGroup with Group for mixed objects")
+        return node
+
+# Pacing bounds enforced on fallback scenes
+MIN_WAIT_SECONDS = 1.0
+PACING_WAIT_SECONDS = 2.0
+DEFAULT_RUN_TIME = 1.5
+MAX_RUN_TIME = 5.0
+
+class PacingRule(SceneRewriteRule):
+    """Enforce readable pacing: minimum waits, a wait between back-to-back plays, default and capped run times."""
+
+    name = "pacing"
+
+    def generic_visit(self, node):
+        node = super().generic_visit(node)
+        for field in ('body', 'orelse', 'finalbody'):
+            statements = getattr(node, field, None)
+            if isinstance(statements, list) and statements and isinstance(statements[0], ast.stmt):
+                setattr(node, field, self.space_plays(statements))
+        return node
+
+    def space_plays(self, statements):
+        spaced = []
+        for statement, following in zip(statements, statements[1:] + [None]):
+            spaced.append(statement)
+            if (following is not None
+                    and isinstance(statement, ast.Expr) and is_self_call(statement.value, 'play')
+                    and isinstance(following, ast.Expr) and is_self_call(following.value, 'play')):
+                self.record(statement, "Added wait between plays")
+                spaced.append(statement_at(f"self.wait({PACING_WAIT_SECONDS})", statement))
+        return spaced
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+
+        if is_self_call(node, 'wait') and node.args and is_number(node.args[0]) and node.args[0].value < MIN_WAIT_SECONDS:
+            self.record(node, f"Raised wait {node.args[0].value}s to {PACING_WAIT_SECONDS}s")
+            node.args[0].value = PACING_WAIT_SECONDS
+
+        run_time = next((keyword for keyword in node.keywords if keyword.arg == 'run_time'), None)
+        if is_self_call(node, 'play') and run_time is None and not any(keyword.arg is None for keyword in node.keywords):
+            node.keywords.append(ast.keyword(arg='run_time', value=ast.Constant(DEFAULT_RUN_TIME)))
+            self.record(node, "Added default run_time")
+        elif run_time is not None and is_number(run_time.value) and run_time.value.value > MAX_RUN_TIME:
+            self.record(node, f"Limited run_time from {run_time.value.value}s to {MAX_RUN_TIME}s")
+            run_time.value.value = MAX_RUN_TIME
+
+        return node
+
+# Rules applied, in order, to build the voiceover-free fallback scene
+FALLBACK_REWRITE_RULES = [
+    StripVoiceoverRule,
+    ConfigStyleRule,
+    UnsupportedChartClassRule,
+    LatexStringRule,
+    GraphApiRule,
+    CameraFrameRule,
+    MixedGroupRule,
+    PacingRule,
+]
+
+def fill_empty_bodies(tree: ast.AST):
+    """Put a pass statement into blocks left empty by removed statements."""
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Module) and getattr(node, 'body', None) == []:
+            node.body = [ast.Pass()]
+        if isinstance(node, ast.Try) and not node.handlers and node.finalbody == []:
+            node.finalbody = [ast.Pass()]
+
+def rewrite_scene(tree: ast.Module, rules=FALLBACK_REWRITE_RULES):
+    """Apply rewrite rules to a copy of a parsed scene.
+
+    Returns (rewritten_tree, changes). The rewritten tree always unparses to valid Python.
+    """
+    # A pickle round trip copies the tree several times faster than copy.deepcopy
+    tree = pickle.loads(pickle.dumps(tree))
+    changes = []
+    for rule_class in rules:
+        rule = rule_class()
+        tree = rule.visit(tree)
+        changes.extend(f"{rule.name}: {change}" for change in rule.changes)
+    fill_empty_bodies(tree)
+    ast.fix_missing_locations(tree)
+    return tree, changes
 
 # Create Modal app
 app = modal.App("manim-explainer")
 
+# Render profiles: frame rate, output height cap, wait-frame cap and Cairo renderer settings
+RENDER_PROFILES = {
+    'draft': {
+        'fps': 15,
+        'max_height': 480,  # Previews never render above 480p
+        'max_wait': 0.25,   # Skip most static wait frames
+        'renderer': 'cairo',
+    },
+    'final': {
+        'fps': 30,
+        'max_height': None,
+        'max_wait': None,
+        'renderer': 'cairo',
+    },
+    'smooth': {
+        'fps': 60,
+        'max_height': None,
+        'max_wait': None,
+        'renderer': 'cairo',
+    },
+}
+DEFAULT_RENDER_PROFILE = 'final'
+
+# Appended to the scene file for profiles with a wait cap; appending keeps error line numbers intact
+WAIT_CAP_PATCH = """
+
+# Render profile wait cap (appended by the renderer)
+from manim import Scene as _ProfileScene
+_profile_original_wait = _ProfileScene.wait
+def _profile_capped_wait(self, duration=1.0, *args, **kwargs):
+    return _profile_original_wait(self, min(duration, {max_wait}), *args, **kwargs)
+_ProfileScene.wait = _profile_capped_wait
+"""
+
+def get_render_profile(name: str) -> dict:
+    """Look up a render profile, falling back to the final profile for unknown names."""
+    if name not in RENDER_PROFILES:
+        print(f"⚠️ Unknown render profile '{name}', using '{DEFAULT_RENDER_PROFILE}'")
+        name = DEFAULT_RENDER_PROFILE
+    return {'name': name, **RENDER_PROFILES[name]}
+
+def compute_render_dimensions(resolution: str, aspect_ratio: str, max_height: int = None) -> tuple[int, int]:
+    """Calculate pixel width and height from resolution and aspect ratio (both even, as H.264 requires)."""
+    height = int(resolution.replace('p', ''))
+    if max_height:
+        height = min(height, max_height)
+    if aspect_ratio == '9:16':
+        width = height * 9 / 16
+    elif aspect_ratio == '1:1':
+        width = height
+    else:
+        # Default to 16:9
+        width = height * 16 / 9
+    return int(round(width / 2)) * 2, height - height % 2
+
+# Retries after a render runs out of memory, in order: each caps the output height and maybe the frame rate
+MEMORY_DEGRADE_STEPS = [
+    {'max_height': 720},
+    {'max_height': 480, 'fps': 15},
+    {'max_height': 360, 'fps': 15},
+]
+
+def degrade_render_settings(profile: dict, resolution: str, aspect_ratio: str, step: dict) -> tuple[dict, int, int]:
+    """Apply a MEMORY_DEGRADE_STEPS entry to a render profile; returns (profile, width, height)."""
+    max_height = min(height for height in (profile['max_height'], step.get('max_height')) if height)
+    degraded = {**profile, 'max_height': max_height, 'fps': min(profile['fps'], step.get('fps', profile['fps']))}
+    return (degraded, *compute_render_dimensions(resolution, aspect_ratio, max_height))
+
+def apply_render_profile_to_code(code: str, profile: dict) -> str:
+    """Append the profile's wait cap to scene code if it has one."""
+    if profile.get('max_wait') is None:
+        return code
+    return code + WAIT_CAP_PATCH.format(max_wait=profile['max_wait'])
+
+# Every job renders in its own directory so concurrent inputs never share files
+RENDER_WORKSPACE_ROOT = "/tmp/manim-jobs"
+RENDER_OUTPUT_DIR = "output"
+# Workspaces kept on request ("keep_workspace") are removed once they are this old: twice the
+# longest container timeout, so a job still running is never swept
+RENDER_WORKSPACE_TTL_SECONDS = 2 * 3600
+
+# Per-job Manim config: media (TeX, voiceovers) and outputs stay inside the workspace,
+# and outputs land at output/<scene file stem>.<mp4|png> rather than a quality-named directory.
+# Cached partial movies (output/partial_movie_files/<scene>/) are never pruned, so every
+# animation of a long scene survives for incremental renders
+WORKSPACE_MANIM_CFG = """[CLI]
+media_dir = media
+video_dir = output
+images_dir = output
+max_files_cached = 100000
+"""
+
+def prune_render_workspaces(max_age_seconds: float = RENDER_WORKSPACE_TTL_SECONDS) -> int:
+    """Delete job workspaces last modified more than max_age_seconds ago; returns how many were removed."""
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    for name in os.listdir(RENDER_WORKSPACE_ROOT) if os.path.isdir(RENDER_WORKSPACE_ROOT) else []:
+        path = os.path.join(RENDER_WORKSPACE_ROOT, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        except OSError:
+            continue
+    return removed
+
+def create_render_workspace(job_id: str) -> str:
+    """Create the working directory for one render job, first clearing out expired kept workspaces."""
+    prune_render_workspaces()
+    workspace = os.path.join(RENDER_WORKSPACE_ROOT, job_id)
+    os.makedirs(workspace, exist_ok=True)
+    with open(os.path.join(workspace, "manim.cfg"), "w", encoding='utf-8') as f:
+        f.write(WORKSPACE_MANIM_CFG)
+    return workspace
+
+# Shared Volume for render assets reused across containers (mounted on the render containers)
+RENDER_CACHE_MOUNT = "/cache"
+
+def render_cache_dir() -> str:
+    """Root of the render cache: the Volume mount on Modal, or RENDER_CACHE_DIR (a plain directory) on a local backend."""
+    return os.environ.get("RENDER_CACHE_DIR", RENDER_CACHE_MOUNT)
+
+BATCH_ASSETS_DIR = "batches"
+# Workspace media subdirectories that don't depend on resolution: compiled TeX and synthesized voiceovers
+SHARED_ASSET_DIRS = ("Tex", "voiceovers")
+
+def copy_shared_assets(source_media_dir: str, target_media_dir: str) -> int:
+    """Copy resolution-independent media (TeX, voiceovers) between media dirs; returns the number of files."""
+    copied = 0
+    for name in SHARED_ASSET_DIRS:
+        source = os.path.join(source_media_dir, name)
+        if os.path.isdir(source):
+            shutil.copytree(source, os.path.join(target_media_dir, name), dirs_exist_ok=True)
+            copied += sum(len(files) for _, _, files in os.walk(source))
+    return copied
+
+# Each video render's reusable state, kept for incremental re-renders of an edited scene:
+# its TeX, voiceovers and partial movies (named by play call hash) at renders/<render id>/
+RENDER_STATES_DIR = "renders"
+RENDER_STATE_FILE = "state.json"
+PARTIAL_MOVIES_DIR = "partial_movie_files"
+RENDER_STATE_TTL_HOURS = 72
+
+def render_state_dir(render_id: str, cache_root: str = None) -> str:
+    return os.path.join(cache_root or render_cache_dir(), RENDER_STATES_DIR, render_id)
+
+def save_render_state(workspace: str, render_id: str, state: dict) -> dict:
+    """Store a finished render's TeX, voiceovers and cached partial movies under its render id."""
+    start = time.time()
+    state_dir = render_state_dir(render_id)
+    shutil.rmtree(state_dir, ignore_errors=True)
+    files = copy_shared_assets(os.path.join(workspace, "media"), os.path.join(state_dir, "media"))
+    partial_movies = os.path.join(workspace, RENDER_OUTPUT_DIR, PARTIAL_MOVIES_DIR)
+    # Progressive audio slices and Manim's concat lists are rebuilt by every render
+    shutil.copytree(partial_movies, os.path.join(state_dir, PARTIAL_MOVIES_DIR), ignore=shutil.ignore_patterns("*.wav", "*.txt"))
+    files += sum(len(names) for _, _, names in os.walk(os.path.join(state_dir, PARTIAL_MOVIES_DIR)))
+    with open(os.path.join(state_dir, RENDER_STATE_FILE), "w", encoding='utf-8') as f:
+        json.dump({**state, "render_id": render_id, "saved_at": time.time()}, f)
+    return {"render_id": render_id, "files": files, "seconds": round(time.time() - start, 2)}
+
+def restore_render_state(workspace: str, render_id: str):
+    """Seed a workspace with a previous render's stored state; returns that state, or None if there is none.
+
+    Manim then hashes each play call of the new scene and reuses the partial movie of every animation
+    whose hash is unchanged; only changed animations (and everything after a change to the scene's
+    state) are rendered, and the final movie is concatenated from the partial movies without re-encoding.
+    """
+    state_dir = render_state_dir(render_id)
+    try:
+        with open(os.path.join(state_dir, RENDER_STATE_FILE), encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    files = copy_shared_assets(os.path.join(state_dir, "media"), os.path.join(workspace, "media"))
+    partial_movies = os.path.join(state_dir, PARTIAL_MOVIES_DIR)
+    if os.path.isdir(partial_movies):
+        shutil.copytree(partial_movies, os.path.join(workspace, RENDER_OUTPUT_DIR, PARTIAL_MOVIES_DIR), dirs_exist_ok=True)
+        files += sum(len(names) for _, _, names in os.walk(partial_movies))
+    return {**state, "files": files}
+
+def prune_render_states(cache_root: str, max_age_hours: float = RENDER_STATE_TTL_HOURS) -> int:
+    """Delete stored render states older than max_age_hours; returns how many were removed."""
+    root = os.path.join(cache_root, RENDER_STATES_DIR)
+    cutoff = time.time() - max_age_hours * 3600
+    removed = 0
+    for render_id in os.listdir(root) if os.path.isdir(root) else []:
+        state_dir = os.path.join(root, render_id)
+        try:
+            with open(os.path.join(state_dir, RENDER_STATE_FILE), encoding='utf-8') as f:
+                saved_at = json.load(f)["saved_at"]
+        except (OSError, ValueError, KeyError):
+            # Partially written (or unreadable) states are dated by their directory
+            saved_at = os.path.getmtime(state_dir)
+        if saved_at < cutoff:
+            shutil.rmtree(state_dir, ignore_errors=True)
+            removed += 1
+    return removed
+
+# Full Manim output of every run in a job (preflights, render, fallback), appended in order
+RENDER_LOG_FILE = "render.log"
+
+def workspace_output_path(workspace: str, output_name: str, extension: str) -> str:
+    """Deterministic path of a render output inside a job workspace."""
+    return os.path.join(workspace, RENDER_OUTPUT_DIR, f"{output_name}.{extension}")
+
+def build_manim_command(scene_file: str, scene_name: str, profile: dict, width: int, height: int, style: str, still: bool = False, caching: bool = False) -> list[str]:
+    """Build the Manim CLI command for a render profile, run from the job workspace.
+
+    still renders only the last frame to output/<stem>.png: no frames are generated and nothing is encoded.
+    caching names partial movies by the hash of their play call and reuses any already in the
+    workspace instead of rendering the animation again (see restore_render_state).
+    """
+    manim_cmd = [
+        "manim",
+        *([] if caching else ["--disable_caching"]),
+        "--config_file=manim.cfg",
+        scene_file,
+        scene_name,
+        f"--output_file={Path(scene_file).stem}",
+        f"--renderer={profile['renderer']}",
+        *(["--save_last_frame", "--format=png"] if still else ["--format=mp4", f"--frame_rate={profile['fps']}"]),
+        f"--resolution={width},{height}"  # Manim expects "W,H"
+    ]
+
+    # Add style-based background color if specified
+    if style in ['dark', 'cinematic']:
+        manim_cmd.extend(["--background_color", "BLACK"])
+    elif style == 'clean':
+        manim_cmd.extend(["--background_color", "WHITE"])
+
+    return manim_cmd
+
 # Request model
 class RenderRequest(BaseModel):
     code: str
     scene_name: str
     upload_url: str = None
+    # Resumable (TUS) upload: {"endpoint", "headers", "metadata", "chunk_size", "parallel_parts"}
+    upload_resumable: dict = None
     openai_api_key: str = None
     resolution: str = "720p"
     aspect_ratio: str = "16:9"
     duration: int = 8
     style: str = "auto"
+    render_profile: str = DEFAULT_RENDER_PROFILE
+    # Force a container tier ("small", "medium", "large") instead of routing by estimated cost
+    tier: str = None
+    # Ladder names from RENDITION_LADDER or {"name", "height", "video_kbps", "audio_kbps"} entries
+    renditions: list = None
+    hls: bool = False
+    faststart: bool = True
+    # Signed URLs for extra outputs, keyed by artifact name (e.g. "renditions/720p.mp4")
+    artifact_upload_urls: dict = None
+    # Publish each finished animation as an HLS segment (live/index.m3u8) while the render runs
+    progressive: bool = False
+    # Signed URL for the full Manim log; responses only carry the last LOG_TAIL_LINES lines
+    log_upload_url: str = None
+    # Set false to render even if an identical render (same code, settings and upload targets) is in
+    # flight or already finished
+    use_cache: bool = True
+    # Set false to skip the low-resolution preflight render that picks the original or fallback scene
+    preflight: bool = True
+    # Keep the job workspace (and the output at output_path) on the container for
+    # RENDER_WORKSPACE_TTL_SECONDS, e.g. when there is no upload target; removed after the response otherwise
+    keep_workspace: bool = False
+    # Scheduling: "preview" or "final" (default: preview for the draft profile), and the tenant for fair sharing
+    lane: str = None
+    tenant_id: str = None
+    # Hedged mode: also render the fallback scene in parallel when the code shows risk signals (voiceover, camera.frame, ...)
+    hedge: bool = False
+    # Render only the last frame as an image; by default scenes without play/wait/voiceover calls are stills
+    still: bool = None
+    # Still image format: "png" or "webp"
+    image_format: str = "png"
+    # Cut a poster, thumbnails and a sprite sheet with a WebVTT index (previews/...) from video output;
+    # only done when they have somewhere to go (upload_resumable or previews/... artifact_upload_urls)
+    previews: bool = True
+    # Job id of an earlier render of this scene: only the animations the edit changed are rendered again
+    previous_render_id: str = None
+    # Store this render's TeX, voiceovers and partial movies (for RENDER_STATE_TTL_HOURS) so a later
+    # edit can pass its job id as previous_render_id; turns on Manim's play call hashing for this render
+    keep_render_state: bool = False
+
+class RenderBatchRequest(BaseModel):
+    code: str
+    scene_name: str
+    # Each target: {"resolution", "aspect_ratio", "style", "upload_url", "upload_resumable", ...}
+    targets: list
+    openai_api_key: str = None
+    duration: int = 8
+    render_profile: str = DEFAULT_RENDER_PROFILE
 
-def validate_chart_completeness(code: str) -> list[str]:
+def validate_chart_completeness(code: str, tree: ast.Module = None) -> list[str]:
     """Validate that charts have required elements."""
     warnings = []
+    tree = tree or parse_scene(code)
+    if tree is None:
+        return warnings
     
-    if 'Axes(' in code or 'ax.plot' in code:
-        # This is a chart
-        if 'get_x_axis_label' not in code and 'x_label' not in code.lower():
+    calls = {call_name(node) for node in ast.walk(tree) if isinstance(node, ast.Call)}
+    if 'Axes' in calls or 'plot' in calls:
+        # This is a chart: gather identifiers, keyword names and strings to look for labels and a title
+        words = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name):
+                words.add(node.id.lower())
+            elif isinstance(node, ast.Attribute):
+                words.add(node.attr.lower())
+            elif isinstance(node, ast.keyword) and node.arg:
+                words.add(node.arg.lower())
+            elif isinstance(node, ast.Constant) and isinstance(node.value, str):
+                words.add(node.value.lower())
+        
+        if 'get_x_axis_label' not in calls and not any('x_label' in word for word in words):
             warnings.append("Chart missing x-axis label")
-        if 'get_y_axis_label' not in code and 'y_label' not in code.lower():
+        if 'get_y_axis_label' not in calls and not any('y_label' in word for word in words):
             warnings.append("Chart missing y-axis label")
-        if 'Text(' not in code or 'title' not in code.lower():
+        if 'Text' not in calls or not any('title' in word for word in words):
             warnings.append("Chart may be missing title")
     
     return warnings
 
-def validate_text_latex_usage(code: str) -> list[str]:
+# Patterns that suggest an equation was put in Text() instead of MathTex()
+TEXT_MATH_PATTERNS = ['x^2', 'y^2', 'z^2', '^2', '^3', '\\frac', '\\sqrt', '=', '\\pm', '\\times']
+STRING_PREFIX_PATTERN = re.compile(r'^[rRbBuUfF]*')
+
+def validate_text_latex_usage(code: str, tree: ast.Module = None) -> list[str]:
     """Validate proper Text/LaTeX usage."""
     warnings = []
+    tree = tree or parse_scene(code)
+    if tree is None:
+        return warnings
+    
+    calls = [node for node in ast.walk(tree) if isinstance(node, ast.Call)]
+    source_segment = source_segment_reader(code)
     
     # Check for mathematical symbols in Text()
-    import re
-    text_matches = re.findall(r'Text\([^)]*\)', code)
-    math_patterns = ['x^2', 'y^2', 'z^2', '^2', '^3', r'\frac', r'\sqrt', '=', r'\pm', r'\times']
-    for text_match in text_matches:
-        if any(pattern in text_match for pattern in math_patterns):
-            warnings.append(f"Mathematical symbols in Text() - should use MathTex(): {text_match[:50]}...")
-            break
+    for node in calls:
+        if call_name(node) == 'Text' and node.args and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str):
+            if any(pattern in node.args[0].value for pattern in TEXT_MATH_PATTERNS):
+                warnings.append(f"Mathematical symbols in Text() - should use MathTex(): {source_segment(node)[:50]}...")
+                break
     
     # Check for LaTeX without raw strings
-    latex_matches = re.findall(r'(MathTex|Tex)\([^)]*\)', code)
-    for latex_match in latex_matches:
-        if '\\' in latex_match and 'r"' not in latex_match and "r'" not in latex_match:
-            warnings.append(f"LaTeX without raw string - may cause issues: {latex_match[:50]}...")
-            break
+    def is_unraw_latex(arg):
+        segment = source_segment(arg)
+        return isinstance(arg, ast.Constant) and '\\' in segment and 'r' not in STRING_PREFIX_PATTERN.match(segment).group().lower()
+    
+    latex_calls = [node for node in calls if call_name(node) in ('MathTex', 'Tex')]
+    unraw_latex = next((node for node in latex_calls if any(is_unraw_latex(arg) for arg in node.args)), None)
+    if unraw_latex is not None:
+        warnings.append(f"LaTeX without raw string - may cause issues: {source_segment(unraw_latex)[:50]}...")
     
     # Check for proper MathTex isolation for coloring
-    if 'MathTex(' in code and 'set_color_by_tex' in code and '{{' not in code:
+    mathtex_strings = [
+        arg.value for node in latex_calls if call_name(node) == 'MathTex'
+        for arg in node.args if isinstance(arg, ast.Constant) and isinstance(arg.value, str)
+    ]
+    if mathtex_strings and 'set_color_by_tex' in {call_name(node) for node in calls} and not any('{{' in value for value in mathtex_strings):
         warnings.append("MathTex with coloring should use {{ }} for part isolation")
     
     return warnings
 
+# Fallback rules whose rewrites flag a scene as likely to need the fallback
+HEDGE_RISK_RULES = [StripVoiceoverRule, UnsupportedChartClassRule, CameraFrameRule]
+
+def hedge_risk_signals(code: str, tree: ast.Module = None) -> list[str]:
+    """Static signs that a scene may fail in a way the fallback scene survives.
+
+    These are the risky fallback rules that would rewrite the scene (voiceover, unsupported chart
+    classes, camera.frame) plus the validator warnings. Code that does not parse has none:
+    the fallback can't fix it either.
+    """
+    tree = tree if tree is not None else parse_scene(code)
+    if tree is None:
+        return []
+    _, changes = rewrite_scene(tree, HEDGE_RISK_RULES)
+    rules = dict.fromkeys(change.split(":", 1)[0] for change in changes)
+    return list(rules) + validate_chart_completeness(code, tree) + validate_text_latex_usage(code, tree)
+
+# Maximum number of narration clips synthesized at the same time
+VOICEOVER_PREFETCH_WORKERS = 6
+
+# Speech service kwargs that change the voiceover cache key
+VOICEOVER_CACHE_KEY_KWARGS = ("voice", "model", "speed")
+
+def collect_voiceover_texts(code: str, tree: ast.Module = None):
+    """Statically collect the OpenAI speech service kwargs and all voiceover texts from scene code.
+
+    Returns (service_kwargs, texts). service_kwargs is None when the scene does not use
+    OpenAIService or configures it with values that cannot be resolved statically.
+    """
+    tree = tree or parse_scene(code)
+    if tree is None:
+        return None, []
+
+    service_kwargs = None
+    texts = []
+
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call) or not isinstance(node.func, ast.Attribute):
+            continue
+
+        # self.set_speech_service(OpenAIService(...))
+        if node.func.attr == 'set_speech_service' and node.args:
+            service_call = node.args[0]
+            if not isinstance(service_call, ast.Call):
+                continue
+            service_func = service_call.func
+            service_name = service_func.id if isinstance(service_func, ast.Name) else getattr(service_func, 'attr', None)
+            if service_name != 'OpenAIService':
+                continue
+            kwargs = {}
+            for keyword in service_call.keywords:
+                if keyword.arg is None:
+                    return None, []
+                try:
+                    kwargs[keyword.arg] = ast.literal_eval(keyword.value)
+                except ValueError:
+                    # Non-literal values (e.g. api_key=os.environ[...]) are fine unless they change the cache key
+                    if keyword.arg in VOICEOVER_CACHE_KEY_KWARGS:
+                        return None, []
+            service_kwargs = kwargs
+
+        # with self.voiceover(text="...") as tracker:
+        elif node.func.attr == 'voiceover':
+            text_node = next((k.value for k in node.keywords if k.arg == 'text'), None)
+            if text_node is None and node.args:
+                text_node = node.args[0]
+            if isinstance(text_node, ast.Constant) and isinstance(text_node.value, str):
+                if text_node.value not in texts:
+                    texts.append(text_node.value)
+
+    return service_kwargs, texts
+
+def prefetch_voiceovers(code: str, cache_dir: Path, tree: ast.Module = None) -> dict:
+    """Synthesize all voiceover clips concurrently into the manim_voiceover cache before rendering.
+
+    The scene's own speech service then finds every clip in the cache and never waits on TTS.
+    Failures are non-fatal: any clip missing from the cache is synthesized by the scene as before.
+    """
+    summary = {"clips": 0, "failed": 0, "seconds": 0.0}
+    service_kwargs, texts = collect_voiceover_texts(code, tree)
+    if service_kwargs is None or not texts:
+        return summary
+
+    start = time.time()
+    try:
+        from manim_voiceover.services.openai import OpenAIService
+        from manim_voiceover.helper import append_to_json_file
+        from manim_voiceover.defaults import DEFAULT_VOICEOVER_CACHE_JSON_FILENAME
+
+        cache_dir = Path(cache_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        service = OpenAIService(cache_dir=cache_dir, **service_kwargs)
+
+        # Match the text normalization SpeechService applies before hashing the input
+        normalized_texts = [" ".join(text.split()) for text in texts]
+
+        print(f"🎙️ Prefetching {len(normalized_texts)} voiceover clips ({VOICEOVER_PREFETCH_WORKERS} workers)...")
+        # One failed clip (e.g. a 429) must not discard the clips that did synthesize
+        results, failures = [], []
+        with ThreadPoolExecutor(max_workers=min(VOICEOVER_PREFETCH_WORKERS, len(normalized_texts))) as pool:
+            futures = {pool.submit(service.generate_from_text, text, cache_dir=cache_dir): text for text in normalized_texts}
+            for future in as_completed(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    failures.append(str(e))
+                    print(f"⚠️ Voiceover clip failed, scene will synthesize it: {futures[future][:60]!r}: {str(e)}")
+
+        # The cache index is a single JSON file, so it is only written from this thread
+        json_path = cache_dir / DEFAULT_VOICEOVER_CACHE_JSON_FILENAME
+        cached = 0
+        for result in results:
+            if result.get("original_audio"):
+                append_to_json_file(json_path, result)
+                cached += 1
+
+        summary["clips"] = cached
+        summary["failed"] = len(failures)
+        print(f"✅ Prefetched {cached} voiceover clips in {time.time() - start:.1f}s ({len(failures)} failed)")
+    except Exception as e:
+        print(f"⚠️ Voiceover prefetch failed, scene will synthesize on demand: {str(e)}")
+
+    summary["seconds"] = round(time.time() - start, 2)
+    return summary
+
+# tqdm progress line Manim prints per animation, e.g. "Animation 3: Write(Text('Hi')):  45%|...| 27/60 [00:01<...]"
+PROGRESS_LINE_PATTERN = re.compile(r'^\s*(?:Animation|Waiting) (\d+)\b')
+PROGRESS_FRAMES_PATTERN = re.compile(r'(\d+)/(\d+) \[')
+PLAYED_ANIMATIONS_PATTERN = re.compile(r'Played (\d+) animations')
+# Printed by the profiler bootstrap when segment markers are on: index, start, duration, partial movie, audio slice
+SEGMENT_MARKER_PATTERN = re.compile(r'^MANIM_SEGMENT\t(\d+)\t([\d.]+)\t([\d.]+)\t([^\t]+)\t([^\t]+)$')
+
+def estimate_animation_count(code: str, tree: ast.Module = None):
+    """Statically count self.play/self.wait calls as an estimate of the scene's animation total."""
+    tree = tree or parse_scene(code)
+    if tree is None:
+        return None
+    return sum(1 for node in ast.walk(tree) if is_self_call(node, 'play') or is_self_call(node, 'wait'))
+
+# Calls that make a scene play out over time; a scene with none of them is a single still frame
+TIMED_SCENE_CALLS = {'play', 'wait', 'pause', 'wait_until', 'voiceover', 'add_sound'}
+
+def is_still_scene(tree: ast.Module) -> bool:
+    """Whether parsed scene code never animates, waits or plays sound, so its last frame is the whole output."""
+    if tree is None:
+        return False
+    return not any(
+        isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr in TIMED_SCENE_CALLS
+        for node in ast.walk(tree)
+    )
+
+# Still image formats; Manim writes PNG and other formats are converted from it
+STILL_IMAGE_FORMATS = ("png", "webp")
+STILL_WEBP_QUALITY = 90
+
+def convert_still_image(png_path: str, image_format: str) -> str:
+    """Convert a rendered PNG frame to image_format (lossy WebP at STILL_WEBP_QUALITY); returns the new path."""
+    if image_format == "png":
+        return png_path
+    from PIL import Image
+    output_path = f"{os.path.splitext(png_path)[0]}.{image_format}"
+    with Image.open(png_path) as frame:
+        frame.save(output_path, format=image_format.upper(), quality=STILL_WEBP_QUALITY, method=4)
+    return output_path
+
+class ManimProgressParser:
+    """Incrementally parse Manim's progress bars into animation and frame counts."""
+
+    @staticmethod
+    def is_progress_bar(line: str) -> bool:
+        """Whether a line is one of tqdm's per-frame progress bar redraws."""
+        return bool(PROGRESS_LINE_PATTERN.match(line) and PROGRESS_FRAMES_PATTERN.search(line))
+
+    @staticmethod
+    def is_completed_bar(line: str) -> bool:
+        frames = PROGRESS_FRAMES_PATTERN.findall(line)
+        return bool(frames) and frames[-1][0] == frames[-1][1]
+
+    def __init__(self, total_animations=None):
+        self.lock = threading.Lock()
+        self.animation = None
+        self.total_animations = total_animations
+        self.animation_frames = 0
+        self.animation_total_frames = 0
+        self.completed_frames = 0
+
+    def feed(self, line: str) -> bool:
+        """Consume one output line; returns True if progress changed."""
+        with self.lock:
+            played = PLAYED_ANIMATIONS_PATTERN.search(line)
+            if played:
+                self.total_animations = int(played.group(1))
+                return True
+
+            match = PROGRESS_LINE_PATTERN.match(line)
+            frames = PROGRESS_FRAMES_PATTERN.findall(line)
+            if not match or not frames:
+                return False
+
+            animation = int(match.group(1))
+            done, total = (int(n) for n in frames[-1])
+            if animation != self.animation:
+                # A new animation started: bank the frames of the previous one
+                self.completed_frames += self.animation_frames
+                self.animation = animation
+            self.animation_frames = done
+            self.animation_total_frames = total
+            if self.total_animations is not None and animation >= self.total_animations:
+                # Loops make the static estimate a lower bound
+                self.total_animations = animation + 1
+            return True
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "animation": self.animation,
+                "total_animations": self.total_animations,
+                "animation_frames": f"{self.animation_frames}/{self.animation_total_frames}",
+                "frames_rendered": self.completed_frames + self.animation_frames,
+            }
+
+# Lines of stdout/stderr kept in memory and returned in responses; the full output goes to the job log
+LOG_TAIL_LINES = 200
+
+# Seconds between checks of a run's cancel event
+CANCEL_POLL_SECONDS = 1.0
+
+class RenderCancelled(Exception):
+    """Raised when a Manim run is stopped through its cancel event (e.g. a hedged render lost the race)."""
+
+class HedgedFallback(Exception):
+    """Skips the original scene in a pipeline run that renders only the fallback."""
+
+class RenderCapacityExceeded(Exception):
+    """Raised when a render outgrows its tier: Manim hit the render timeout, or ran out of memory at every degrade step."""
+
+    def __init__(self, message: str, reason: str):
+        super().__init__(message)
+        self.reason = reason  # "timeout" or "memory"
+
+# Resource governor: seconds between samples of a Manim process tree
+GOVERNOR_SAMPLE_SECONDS = 0.5
+# A render is stopped early once its memory growth would cross the limit within this many seconds...
+GOVERNOR_PROJECTION_SECONDS = 5.0
+# ...but only above this share of the limit, so allocation bursts at scene setup don't trip it
+GOVERNOR_PROJECTION_FLOOR = 0.8
+# Share of a container's (or a local worker's) memory its renders may use together
+GOVERNOR_MEMORY_SHARE = 0.9
+# Units of /proc/<pid>/stat memory (pages) and CPU time (clock ticks)
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def process_tree_usage(root_pid: int) -> tuple[int, float]:
+    """Resident bytes and CPU seconds of a process and its live descendants, read from /proc."""
+    stats = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # Fields after the parenthesized command name; the name itself may contain spaces
+                fields = f.read().rsplit(")", 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        stats[int(entry)] = fields
+    tree, frontier = set(), [root_pid]
+    children = {}
+    for pid, fields in stats.items():
+        children.setdefault(int(fields[1]), []).append(pid)
+    while frontier:
+        pid = frontier.pop()
+        if pid in stats and pid not in tree:
+            tree.add(pid)
+            frontier.extend(children.get(pid, []))
+    rss_bytes = sum(int(stats[pid][21]) for pid in tree) * PAGE_SIZE
+    # utime + stime of each process, plus cutime + cstime for its children already reaped
+    cpu_seconds = sum(sum(int(value) for value in stats[pid][11:15]) for pid in tree) / CLOCK_TICKS
+    return rss_bytes, cpu_seconds
+
+# Memory cgroup files (usage, limit, stats) for cgroup v2, then v1
+CGROUP_MEMORY_FILES = (
+    ("/sys/fs/cgroup/memory.current", "/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory.stat", "inactive_file"),
+    ("/sys/fs/cgroup/memory/memory.usage_in_bytes", "/sys/fs/cgroup/memory/memory.limit_in_bytes",
+     "/sys/fs/cgroup/memory/memory.stat", "total_inactive_file"),
+)
+
+def cgroup_memory():
+    """(working set, limit) in bytes of this container's memory cgroup, or None if unreadable or unlimited.
+
+    The working set leaves out inactive page cache (e.g. partial movies just written), which the kernel
+    reclaims before it kills anything.
+    """
+    for usage_path, limit_path, stat_path, inactive_key in CGROUP_MEMORY_FILES:
+        try:
+            with open(usage_path) as f:
+                usage = int(f.read())
+            with open(limit_path) as f:
+                limit = f.read().strip()
+            with open(stat_path) as f:
+                stats = dict(line.split() for line in f if line.strip())
+        except (OSError, ValueError):
+            continue
+        # v1 reports no limit as a huge number
+        if limit == "max" or int(limit) >= 1 << 60:
+            return None
+        return max(0, usage - int(stats.get(inactive_key, 0))), int(limit)
+    return None
+
+# Governors of the renders running in this process, for container-wide memory decisions
+running_governors = set()
+running_governors_lock = threading.Lock()
+
+class ResourceGovernor:
+    """Track a Manim run's peak memory and CPU, killing it when memory exceeds or is projected to exceed a limit.
+
+    memory_limit_mb caps this run alone (a local worker's share of the machine). container_memory_mb
+    is instead the budget of a container whose concurrent renders share its memory: the container's
+    cgroup working set and limit decide when it is under pressure (the renders' combined RSS against
+    this budget if the cgroup can't be read), and only the largest running render is stopped then.
+    A render alone in its container can use all of it.
+    exceeded is None, "limit" or "projected" once the run ends.
+    """
+
+    def __init__(self, memory_limit_mb: int = None, container_memory_mb: int = None):
+        self.memory_limit_mb = memory_limit_mb
+        self.container_memory_mb = container_memory_mb
+        self.rss_bytes = 0
+        self.peak_rss_bytes = 0
+        self.cpu_seconds = 0.0
+        self.exceeded = None
+        self.started_at = None
+        self.finished_at = None
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def watch(self, process: subprocess.Popen):
+        self.started_at = time.time()
+        with running_governors_lock:
+            running_governors.add(self)
+        self.thread = threading.Thread(target=self.sample, args=(process,), daemon=True)
+        self.thread.start()
+
+    def memory_in_use(self):
+        """(used, limit) in bytes that this run's memory is judged by, or None without a limit."""
+        if self.container_memory_mb:
+            cgroup = cgroup_memory()
+            if cgroup:
+                return cgroup[0], int(cgroup[1] * GOVERNOR_MEMORY_SHARE)
+            with running_governors_lock:
+                used = sum(governor.rss_bytes for governor in running_governors)
+            return used, self.container_memory_mb * 1048576
+        if self.memory_limit_mb:
+            return self.rss_bytes, self.memory_limit_mb * 1048576
+        return None
+
+    def is_largest_render(self) -> bool:
+        with running_governors_lock:
+            return all(governor.rss_bytes <= self.rss_bytes for governor in running_governors)
+
+    def sample(self, process: subprocess.Popen):
+        previous = None
+        while not self.stopped.wait(GOVERNOR_SAMPLE_SECONDS) and process.poll() is None:
+            self.rss_bytes, cpu_seconds = process_tree_usage(process.pid)
+            now = time.time()
+            self.peak_rss_bytes = max(self.peak_rss_bytes, self.rss_bytes)
+            self.cpu_seconds = max(self.cpu_seconds, cpu_seconds)
+            memory = self.memory_in_use()
+            if memory:
+                used, limit_bytes = memory
+                if used > limit_bytes:
+                    self.exceeded = "limit"
+                elif previous and used > limit_bytes * GOVERNOR_PROJECTION_FLOOR:
+                    growth_per_second = (used - previous[1]) / (now - previous[0])
+                    if used + growth_per_second * GOVERNOR_PROJECTION_SECONDS > limit_bytes:
+                        self.exceeded = "projected"
+                # Under container pressure the largest render gives way; the others keep going
+                if self.exceeded and self.container_memory_mb and not self.is_largest_render():
+                    self.exceeded = None
+                if self.exceeded:
+                    verdict = "over" if self.exceeded == "limit" else "projected to cross"
+                    scope = "Container" if self.container_memory_mb else "Manim"
+                    print(f"🧯 {scope} at {used / 1048576:.0f} MB, {verdict} the {limit_bytes / 1048576:.0f} MB limit; "
+                          f"stopping this render ({self.rss_bytes / 1048576:.0f} MB)")
+                    process.kill()
+                    return
+                previous = (now, used)
+
+    def stop(self):
+        self.finished_at = time.time()
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+        with running_governors_lock:
+            running_governors.discard(self)
+
+    def summary(self) -> dict:
+        wall_seconds = (self.finished_at or time.time()) - (self.started_at or time.time())
+        return {
+            "peak_rss_mb": round(self.peak_rss_bytes / 1048576, 1),
+            "cpu_seconds": round(self.cpu_seconds, 2),
+            "avg_cpu_cores": round(self.cpu_seconds / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+            "wall_seconds": round(wall_seconds, 2),
+            "memory_limit_mb": self.memory_limit_mb,
+            "container_memory_mb": self.container_memory_mb,
+            "memory_exceeded": self.exceeded,
+        }
+
+# How a render ran out of memory, by ResourceGovernor.exceeded (None: killed by the kernel or MemoryError)
+MEMORY_FAILURE_REASONS = {
+    "limit": "memory limit exceeded",
+    "projected": "memory limit about to be exceeded",
+    None: "out of memory",
+}
+
+def ran_out_of_memory(result: subprocess.CompletedProcess, governor: ResourceGovernor = None) -> bool:
+    """Whether a failed Manim run was stopped by its governor or died of memory exhaustion."""
+    if governor and governor.exceeded:
+        return True
+    # The kernel's OOM killer sends SIGKILL; allocation failures inside Python raise MemoryError
+    return result.returncode == -signal.SIGKILL or "MemoryError" in result.stderr
+
+def run_manim(manim_cmd: list[str], on_progress=None, total_animations=None, timeout=1200, cwd=None, on_segment=None, log_path=None, cancel_event=None, governor: ResourceGovernor = None):
+    """Run Manim and report progress parsed from its output while it renders.
+
+    Output is streamed line by line: progress bars are parsed as they arrive, the last LOG_TAIL_LINES
+    other lines of each stream are kept, and everything is appended to log_path if given.
+    on_segment, if given, turns on the profiler's segment markers and is called with
+    (index, start, duration, partial_movie_path, audio_path or None) as each partial movie lands.
+    Setting cancel_event (a threading.Event) kills Manim and raises RenderCancelled.
+    governor, if given, samples the run's memory and CPU and enforces its memory limit.
+    Returns a subprocess.CompletedProcess like subprocess.run(capture_output=True, text=True),
+    with the stdout and stderr tails.
+    """
+    parser = ManimProgressParser(total_animations)
+    env = None
+    if on_segment:
+        env = {**os.environ, "MANIM_SEGMENT_MARKERS": "1"}
+    log_file = open(log_path, "a", encoding='utf-8') if log_path else None
+    log_lock = threading.Lock()
+    if log_file:
+        log_file.write(f"$ {' '.join(manim_cmd)}\n")
+    try:
+        process = subprocess.Popen(
+            manim_cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            cwd=cwd,
+            env=env,
+        )
+    except Exception:
+        if log_file:
+            log_file.close()
+        raise
+    stdout_tail, stderr_tail = deque(maxlen=LOG_TAIL_LINES), deque(maxlen=LOG_TAIL_LINES)
+
+    def pump(stream, tail):
+        # Text mode splits tqdm's carriage-return updates into separate lines
+        for line in stream:
+            marker = SEGMENT_MARKER_PATTERN.match(line.rstrip("\n"))
+            if marker:
+                if on_segment:
+                    index, start, duration, movie_path, audio_path = marker.groups()
+                    on_segment(
+                        int(index), float(start), float(duration),
+                        os.path.join(cwd or "", movie_path),
+                        None if audio_path == "-" else os.path.join(cwd or "", audio_path),
+                    )
+                continue
+            if parser.feed(line) and on_progress:
+                on_progress(parser.snapshot())
+            progress_bar = ManimProgressParser.is_progress_bar(line)
+            if not progress_bar:
+                tail.append(line)
+            # Of each animation's progress bar redraws, only the completed bar goes to the log
+            if log_file and (not progress_bar or ManimProgressParser.is_completed_bar(line)):
+                with log_lock:
+                    log_file.write(line if line.endswith("\n") else line + "\n")
+
+    pumps = [
+        threading.Thread(target=pump, args=(process.stdout, stdout_tail), daemon=True),
+        threading.Thread(target=pump, args=(process.stderr, stderr_tail), daemon=True),
+    ]
+    for pump_thread in pumps:
+        pump_thread.start()
+    if governor:
+        governor.watch(process)
+
+    deadline = time.time() + timeout
+    try:
+        while True:
+            try:
+                process.wait(timeout=CANCEL_POLL_SECONDS if cancel_event else timeout)
+                break
+            except subprocess.TimeoutExpired:
+                if cancel_event is None or time.time() >= deadline:
+                    raise
+                if cancel_event.is_set():
+                    raise RenderCancelled("Render cancelled")
+    except BaseException:
+        # Timeouts and cancelled inputs (e.g. a preempted render) must not leave Manim running
+        process.kill()
+        process.wait()
+        raise
+    finally:
+        if governor:
+            governor.stop()
+        for pump_thread in pumps:
+            pump_thread.join()
+        if log_file:
+            log_file.write(f"[exit code {process.returncode}]\n\n")
+            log_file.close()
+
+    return subprocess.CompletedProcess(manim_cmd, process.returncode, ''.join(stdout_tail), ''.join(stderr_tail))
+
+# Preflight renders only the final frame at this size, skipping every animation
+PREFLIGHT_RESOLUTION = "160,90"
+PREFLIGHT_TIMEOUT = 180
+
+def build_preflight_command(scene_file: str, scene_name: str) -> list[str]:
+    """Build a Manim command that runs construct() with animations skipped and a throwaway last frame."""
+    return [
+        "manim",
+        "--disable_caching",
+        "--config_file=manim.cfg",  # Shares the workspace TeX and voiceover caches with the real render
+        scene_file,
+        scene_name,
+        f"--output_file={Path(scene_file).stem}_preflight",
+        "--save_last_frame",  # Skips all animations; only the final state is drawn
+        "--format=png",
+        f"--resolution={PREFLIGHT_RESOLUTION}",
+    ]
+
+def run_preflight(workspace: str, scene_file: str, scene_name: str, log_path: str = None) -> dict:
+    """Dry-run a scene so name, API and LaTeX errors surface in seconds instead of deep into a render.
+
+    It runs under the timing profiler: the preflight compiles the scene's TeX (and synthesizes narration
+    the prefetch missed) for the real render, and "latex" and "tts" report how much of it that was.
+    """
+    profile_path = f"{Path(scene_file).stem}_preflight_profile.json"
+    preflight_cmd = profile_manim_command(build_preflight_command(scene_file, scene_name), workspace, profile_path)
+    print(f"🛫 Preflight: {' '.join(preflight_cmd)}")
+    start = time.time()
+
+    def summary(**fields) -> dict:
+        totals = load_timing_profile(os.path.join(workspace, profile_path))["totals"]
+        return {
+            **fields,
+            "seconds": round(time.time() - start, 2),
+            "latex": totals.get("latex", 0.0),
+            "tts": totals.get("tts", 0.0),
+        }
+
+    try:
+        result = run_manim(preflight_cmd, timeout=PREFLIGHT_TIMEOUT, cwd=workspace, log_path=log_path)
+    except subprocess.TimeoutExpired:
+        # A slow construct() is not an error; let the real render decide
+        print(f"⚠️ Preflight timed out after {PREFLIGHT_TIMEOUT}s, continuing without it")
+        return summary(success=True, timed_out=True)
+
+    if result.returncode != 0:
+        failed = summary(success=False, error=f"Manim preflight failed: {result.stderr}")
+        print(f"❌ Preflight failed in {failed['seconds']}s")
+        return failed
+
+    passed = summary(success=True)
+    print(f"✅ Preflight passed in {passed['seconds']}s")
+    return passed
+
+def classify_render_error(error_msg: str) -> tuple[bool, str]:
+    """Decide whether a render error is worth retrying with the voiceover-free fallback scene."""
+    error_lower = error_msg.lower()
+    
+    # Check if this is a voiceover-specific error
+    voiceover_errors = [
+        "voiceover", "speech", "tts", "openai", "audio", 
+        "manim_voiceover", "set_speech_service", "voiceover("
+    ]
+    
+    if any(keyword in error_lower for keyword in voiceover_errors):
+        return True, "voiceover service error"
+    elif "syntax" in error_lower or "indentation" in error_lower:
+        return False, "syntax error - let AI fix the code"
+    elif "import" in error_lower or "module" in error_lower:
+        return False, "import error - let AI fix the code"
+    elif "name" in error_lower and "not defined" in error_lower:
+        return False, "undefined name error - let AI fix the code"
+    # For other errors, try fallback as a last resort
+    return True, "unknown error - attempting fallback"
+
+# Written next to the scene and run instead of the manim executable: it installs timing
+# hooks into Manim, runs the normal CLI and dumps a per-animation timing profile as JSON.
+PROFILER_SCRIPT = "manim_profiler.py"
+PROFILER_BOOTSTRAP = r"""
+import json
+import os
+import sys
+import time
+
+profile_path = sys.argv[1]
+sys.argv = ["manim"] + sys.argv[2:]
+
+from manim.__main__ import main
+from manim.renderer.cairo_renderer import CairoRenderer
+from manim.scene.scene import Scene
+from manim.scene.scene_file_writer import SceneFileWriter
+from manim.utils import tex_file_writing
+
+CATEGORIES = ("latex", "tts", "cairo", "ffmpeg")
+animations = []
+totals = {"scene_construction": 0.0, "encoding": 0.0, "finish": 0.0, **{c: 0.0 for c in CATEGORIES}}
+# Time accumulated since the previous animation finished, attributed to the next one
+pending = {"segment_start": None, "frames": 0, "cached": False, **{c: 0.0 for c in CATEGORIES}}
+
+def timed(owner, name, category):
+    original = getattr(owner, name, None)
+    if original is None:
+        return
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            pending[category] += elapsed
+            totals[category] += elapsed
+    setattr(owner, name, wrapper)
+
+timed(tex_file_writing, "compile_tex", "latex")
+timed(tex_file_writing, "convert_to_svg", "latex")
+timed(CairoRenderer, "update_frame", "cairo")
+for name in ("write_frame", "open_partial_movie_stream", "close_partial_movie_stream", "open_movie_pipe", "close_movie_pipe"):
+    timed(SceneFileWriter, name, "ffmpeg")
+try:
+    from manim_voiceover.services.base import SpeechService
+    timed(SpeechService, "_wrap_generate_from_text", "tts")
+except ImportError:
+    pass
+
+# Progressive delivery: announce each finished partial movie (and its slice of the scene audio) on stderr
+segment_markers = os.environ.get("MANIM_SEGMENT_MARKERS") == "1"
+segment_clock = {"start": 0.0}
+original_close_partial_movie_stream = SceneFileWriter.close_partial_movie_stream
+def close_partial_movie_stream(self, *args, **kwargs):
+    result = original_close_partial_movie_stream(self, *args, **kwargs)
+    path = getattr(self, "partial_movie_file_path", None)
+    if segment_markers and path:
+        from manim import config
+        duration = pending["frames"] / config["frame_rate"]
+        start = segment_clock["start"]
+        segment_clock["start"] += duration
+        audio_path = "-"
+        if getattr(self, "includes_sound", False) and duration > 0:
+            audio_path = os.path.splitext(str(path))[0] + ".wav"
+            self.audio_segment[int(start * 1000):int((start + duration) * 1000)].export(audio_path, format="wav")
+        print(f"MANIM_SEGMENT\t{self.renderer.num_plays}\t{start:.4f}\t{duration:.4f}\t{path}\t{audio_path}", file=sys.stderr, flush=True)
+    return result
+SceneFileWriter.close_partial_movie_stream = close_partial_movie_stream
+
+# With caching on, an animation whose play call hash has a partial movie already is not rendered
+original_is_already_cached = SceneFileWriter.is_already_cached
+def is_already_cached(self, hash_invocation):
+    pending["cached"] = original_is_already_cached(self, hash_invocation)
+    return pending["cached"]
+SceneFileWriter.is_already_cached = is_already_cached
+
+original_add_frame = CairoRenderer.add_frame
+def add_frame(self, frame, num_frames=1):
+    pending["frames"] += num_frames
+    return original_add_frame(self, frame, num_frames)
+CairoRenderer.add_frame = add_frame
+
+original_play = CairoRenderer.play
+def play(self, scene, *args, **kwargs):
+    index = self.num_plays
+    start = time.perf_counter()
+    try:
+        return original_play(self, scene, *args, **kwargs)
+    finally:
+        end = time.perf_counter()
+        animations.append({
+            "index": index,
+            "wall_time": round(end - (pending["segment_start"] or start), 4),
+            "play_time": round(end - start, 4),
+            "frames": pending["frames"],
+            "cached": pending["cached"],
+            **{c: round(pending[c], 4) for c in CATEGORIES},
+        })
+        pending.update(segment_start=end, frames=0, cached=False, **{c: 0.0 for c in CATEGORIES})
+CairoRenderer.play = play
+
+original_render = Scene.render
+def render(self, *args, **kwargs):
+    start = time.perf_counter()
+    pending["segment_start"] = start
+    try:
+        return original_render(self, *args, **kwargs)
+    finally:
+        totals["scene_construction"] += time.perf_counter() - start
+Scene.render = render
+
+original_finish = SceneFileWriter.finish
+def finish(self, *args, **kwargs):
+    start = time.perf_counter()
+    try:
+        return original_finish(self, *args, **kwargs)
+    finally:
+        totals["finish"] += time.perf_counter() - start
+SceneFileWriter.finish = finish
+
+try:
+    main()
+finally:
+    totals["scene_construction"] -= totals["finish"]
+    totals["encoding"] = totals["ffmpeg"] + totals.pop("finish")
+    with open(profile_path, "w") as f:
+        json.dump({"animations": animations, "totals": {k: round(v, 4) for k, v in totals.items()}}, f)
+"""
+
+def profile_manim_command(manim_cmd: list[str], workspace: str, profile_path: str) -> list[str]:
+    """Wrap a Manim CLI command so it runs under the timing profiler from the job workspace."""
+    with open(os.path.join(workspace, PROFILER_SCRIPT), "w", encoding='utf-8') as f:
+        f.write(PROFILER_BOOTSTRAP)
+    # The interpreter running this module, whose environment has manim installed (e.g. a local backend's venv)
+    return [sys.executable, PROFILER_SCRIPT, profile_path] + manim_cmd[1:]
+
+def load_timing_profile(profile_path: str) -> dict:
+    """Read the profile written by the profiler, or an empty profile if the render died before writing it."""
+    try:
+        with open(profile_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"animations": [], "totals": {}}
+
+# Upload tuning. Supabase's resumable (TUS) endpoint requires 6 MB chunks.
+UPLOAD_CHUNK_SIZE = 6 * 1024 * 1024
+UPLOAD_PARALLEL_PARTS = 4
+UPLOAD_RETRIES = 5
+UPLOAD_BACKOFF_SECONDS = 0.5
+UPLOAD_TIMEOUT = 120
+TUS_VERSION = "1.0.0"
+
+# HTTP statuses worth retrying; any other 4xx means the request itself is wrong
+RETRYABLE_STATUS_CODES = {408, 409, 423, 429, 460, 500, 502, 503, 504}
+
+def with_retries(operation, description: str, attempts: int = UPLOAD_RETRIES, base_delay: float = UPLOAD_BACKOFF_SECONDS):
+    """Call operation(), retrying transient failures with exponential backoff and jitter."""
+    for attempt in range(1, attempts + 1):
+        try:
+            return operation()
+        except (requests.RequestException, OSError) as e:
+            response = getattr(e, 'response', None)
+            if response is not None and response.status_code not in RETRYABLE_STATUS_CODES:
+                raise
+            if attempt == attempts:
+                raise
+            delay = base_delay * 2 ** (attempt - 1) * (1 + random.random())
+            print(f"⚠️ {description} failed (attempt {attempt}/{attempts}): {str(e)}; retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+def create_upload_session(pool_size: int = UPLOAD_PARALLEL_PARTS) -> requests.Session:
+    """HTTP session with a connection pool large enough for parallel part uploads."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def read_range(path: str, start: int, length: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(length)
+
+def put_file(session: requests.Session, upload_url: str, path: str, content_type: str):
+    """Upload a file with a single PUT to a signed URL, retrying the whole request on transient failures."""
+    file_size = os.path.getsize(path)
+
+    def attempt():
+        with open(path, "rb") as f:
+            response = session.put(
+                upload_url,
+                data=f,
+                headers={'Content-Type': content_type, 'Content-Length': str(file_size)},
+                timeout=UPLOAD_TIMEOUT,
+            )
+        response.raise_for_status()
+        return response
+
+    with_retries(attempt, "Upload")
+
+def tus_headers(headers: dict = None, **extra) -> dict:
+    return {"Tus-Resumable": TUS_VERSION, **(headers or {}), **extra}
+
+def tus_encode_metadata(metadata: dict) -> str:
+    return ",".join(f"{key} {base64.b64encode(str(value).encode()).decode()}" for key, value in metadata.items())
+
+def tus_capabilities(session: requests.Session, endpoint: str, headers: dict) -> tuple[set, set]:
+    """Ask a TUS server for its extensions and checksum algorithms (empty if it doesn't answer OPTIONS)."""
+    try:
+        response = session.options(endpoint, headers=tus_headers(headers), timeout=UPLOAD_TIMEOUT)
+        response.raise_for_status()
+    except requests.RequestException:
+        return set(), set()
+    split = lambda value: {item.strip() for item in value.split(",") if item.strip()}
+    return split(response.headers.get("Tus-Extension", "")), split(response.headers.get("Tus-Checksum-Algorithm", ""))
+
+def tus_create(session: requests.Session, endpoint: str, headers: dict, length: int = None, metadata: dict = None, concat: str = None) -> str:
+    """Create a TUS upload and return its absolute URL."""
+    extra = {}
+    if length is not None:
+        extra["Upload-Length"] = str(length)
+    if metadata:
+        extra["Upload-Metadata"] = tus_encode_metadata(metadata)
+    if concat:
+        extra["Upload-Concat"] = concat
+
+    def attempt():
+        response = session.post(endpoint, headers=tus_headers(headers, **extra), timeout=UPLOAD_TIMEOUT)
+        response.raise_for_status()
+        return urljoin(endpoint, response.headers["Location"])
+
+    return with_retries(attempt, "Creating resumable upload")
+
+def tus_upload_range(session: requests.Session, upload: str, headers: dict, path: str, start: int, length: int, chunk_size: int, checksum: bool):
+    """PATCH bytes [start, start + length) of a file to a TUS upload, resuming from the server's offset after failures."""
+    offset = 0
+    failures = 0
+    while offset < length:
+        chunk = read_range(path, start + offset, min(chunk_size, length - offset))
+        extra = {"Content-Type": "application/offset+octet-stream", "Upload-Offset": str(offset)}
+        if checksum:
+            extra["Upload-Checksum"] = "sha1 " + base64.b64encode(hashlib.sha1(chunk).digest()).decode()
+        try:
+            response = session.patch(upload, data=chunk, headers=tus_headers(headers, **extra), timeout=UPLOAD_TIMEOUT)
+            response.raise_for_status()
+            offset = int(response.headers["Upload-Offset"])
+            failures = 0
+        except requests.RequestException as e:
+            response = getattr(e, 'response', None)
+            failures += 1
+            if (response is not None and response.status_code not in RETRYABLE_STATUS_CODES) or failures >= UPLOAD_RETRIES:
+                raise
+            print(f"⚠️ Chunk at offset {start + offset} failed: {str(e)}; resuming")
+            time.sleep(UPLOAD_BACKOFF_SECONDS * 2 ** (failures - 1) * (1 + random.random()))
+            # Ask the server how much it kept and continue from there
+            def head():
+                head_response = session.head(upload, headers=tus_headers(headers), timeout=UPLOAD_TIMEOUT)
+                head_response.raise_for_status()
+                return int(head_response.headers["Upload-Offset"])
+            offset = with_retries(head, "Resuming upload")
+
+def tus_upload_file(session: requests.Session, config: dict, path: str, content_type: str) -> dict:
+    """Upload a file to a TUS (resumable) endpoint, in parallel parts when the server supports concatenation.
+
+    config: {"endpoint", "headers", "metadata", "chunk_size", "parallel_parts"}. Every chunk carries an
+    Upload-Checksum when the server supports sha1, so corrupted chunks are rejected and resent.
+    """
+    endpoint = config["endpoint"]
+    headers = config.get("headers", {})
+    metadata = {"contentType": content_type, **config.get("metadata", {})}
+    chunk_size = config.get("chunk_size", UPLOAD_CHUNK_SIZE)
+    parallel_parts = config.get("parallel_parts", UPLOAD_PARALLEL_PARTS)
+    file_size = os.path.getsize(path)
+
+    extensions, algorithms = tus_capabilities(session, endpoint, headers)
+    checksum = "checksum" in extensions and "sha1" in algorithms
+
+    # Split into chunk-aligned parts, one per worker
+    chunks = max(1, -(-file_size // chunk_size))
+    part_count = min(parallel_parts, chunks) if "concatenation" in extensions else 1
+    chunks_per_part = -(-chunks // part_count)
+    ranges = [
+        (start, min(chunks_per_part * chunk_size, file_size - start))
+        for start in range(0, file_size, chunks_per_part * chunk_size)
+    ] or [(0, 0)]
+
+    if len(ranges) == 1:
+        upload = tus_create(session, endpoint, headers, length=file_size, metadata=metadata)
+        tus_upload_range(session, upload, headers, path, 0, file_size, chunk_size, checksum)
+    else:
+        parts = [tus_create(session, endpoint, headers, length=length, concat="partial") for _, length in ranges]
+        with ThreadPoolExecutor(max_workers=len(parts)) as pool:
+            list(pool.map(
+                lambda part: tus_upload_range(session, part[0], headers, path, part[1][0], part[1][1], chunk_size, checksum),
+                zip(parts, ranges),
+            ))
+        upload = tus_create(session, endpoint, headers, metadata=metadata, concat="final;" + " ".join(parts))
+
+    return {"method": "tus", "location": upload, "parts": len(ranges), "checksummed_chunks": checksum}
+
+OUTPUT_CONTENT_TYPES = {
+    "video": 'video/mp4',
+    "image": 'image/png',
+}
+
+def upload_file(path: str, content_type: str, upload_url: str = None, resumable: dict = None) -> dict:
+    """Upload a render output with pooled connections and retries.
+
+    Uses the resumable (TUS) endpoint when a resumable config is given, otherwise a single PUT to upload_url.
+    """
+    start = time.time()
+    file_size = os.path.getsize(path)
+    with create_upload_session() as session:
+        if resumable:
+            result = tus_upload_file(session, resumable, path, content_type)
+        else:
+            put_file(session, upload_url, path, content_type)
+            result = {"method": "put", "location": upload_url.split("?")[0]}
+    result.update(
+        bytes=file_size,
+        sha256=file_sha256(path),
+        seconds=round(time.time() - start, 2),
+    )
+    return result
+
+ARTIFACT_CONTENT_TYPES = {
+    ".mp4": 'video/mp4',
+    ".png": 'image/png',
+    ".webp": 'image/webp',
+    ".jpg": 'image/jpeg',
+    ".vtt": 'text/vtt',
+    ".m3u8": 'application/vnd.apple.mpegurl',
+    ".ts": 'video/mp2t',
+    ".log": 'text/plain; charset=utf-8',
+}
+
+def artifact_resumable_config(resumable: dict, artifact_name: str):
+    """Resumable config for an artifact stored next to the master: videos/abc.mp4 -> videos/abc/<artifact_name>."""
+    object_name = (resumable or {}).get("metadata", {}).get("objectName")
+    if not object_name:
+        return None
+    stem = os.path.splitext(object_name)[0]
+    return {**resumable, "metadata": {**resumable["metadata"], "objectName": f"{stem}/{artifact_name}"}}
+
+def upload_artifact(name: str, path: str, artifact_upload_urls: dict = None, resumable: dict = None, overwrite: bool = False):
+    """Upload one extra output to artifact_upload_urls[name], else next to the master's resumable object.
+
+    overwrite asks the storage to replace an existing object (for files re-published while a render runs).
+    Returns the upload result, or None when the artifact has no target.
+    """
+    content_type = ARTIFACT_CONTENT_TYPES.get(os.path.splitext(path)[1], 'application/octet-stream')
+    if name in (artifact_upload_urls or {}):
+        return upload_file(path, content_type, upload_url=artifact_upload_urls[name])
+    config = artifact_resumable_config(resumable, name)
+    if config is None:
+        return None
+    if overwrite:
+        config["headers"] = {**config.get("headers", {}), "x-upsert": "true"}
+    return upload_file(path, content_type, resumable=config)
+
+def upload_artifacts(artifacts: dict, artifact_upload_urls: dict = None, resumable: dict = None) -> dict:
+    """Upload extra outputs (renditions, playlists, ...) in parallel, keyed by artifact name.
+
+    Artifacts without a target are skipped and stay in the workspace.
+    """
+    with ThreadPoolExecutor(max_workers=UPLOAD_PARALLEL_PARTS) as pool:
+        return dict(pool.map(
+            lambda item: (item[0], upload_artifact(item[0], item[1], artifact_upload_urls, resumable)),
+            artifacts.items(),
+        ))
+
+# Rendition ladder: height is the short edge, so "720p" means 1280x720 landscape or 720x1280 portrait
+RENDITION_LADDER = {
+    "1080p": {"height": 1080, "video_kbps": 5000, "audio_kbps": 128},
+    "720p": {"height": 720, "video_kbps": 2800, "audio_kbps": 128},
+    "480p": {"height": 480, "video_kbps": 1400, "audio_kbps": 96},
+    "360p": {"height": 360, "video_kbps": 800, "audio_kbps": 64},
+}
+HLS_SEGMENT_SECONDS = 4
+RENDITIONS_DIR = "renditions"
+HLS_DIR = "hls"
+
+def resolve_renditions(renditions: list, width: int, height: int) -> list[dict]:
+    """Turn ladder names or custom {"name", "height", "video_kbps"} entries into concrete renditions.
+
+    Renditions larger than the master are dropped rather than upscaled.
+    """
+    master_short_edge = min(width, height)
+    resolved = []
+    for entry in renditions or []:
+        if isinstance(entry, str):
+            if entry not in RENDITION_LADDER:
+                print(f"⚠️ Unknown rendition '{entry}', skipping")
+                continue
+            entry = {"name": entry, **RENDITION_LADDER[entry]}
+        short_edge = int(entry["height"])
+        if short_edge > master_short_edge:
+            print(f"⚠️ Rendition '{entry['name']}' is larger than the {width}x{height} master, skipping")
+            continue
+        # Keep the master's aspect ratio with even dimensions for H.264
+        long_edge = round(max(width, height) * short_edge / master_short_edge / 2) * 2
+        short_edge -= short_edge % 2
+        resolved.append({
+            "name": entry["name"],
+            "width": long_edge if width >= height else short_edge,
+            "height": short_edge if width >= height else long_edge,
+            "video_kbps": int(entry.get("video_kbps", 2000)),
+            "audio_kbps": int(entry.get("audio_kbps", 128)),
+        })
+    return resolved
+
+def build_faststart_command(input_path: str, output_path: str) -> list[str]:
+    """Remux without re-encoding so the moov atom comes first and playback can start before the download ends."""
+    return ["ffmpeg", "-y", "-v", "error", "-i", input_path, "-c", "copy", "-movflags", "+faststart", output_path]
+
+def build_rendition_command(input_path: str, output_path: str, rendition: dict, threads: int) -> list[str]:
+    """Encode one constrained-bitrate H.264/AAC rendition with keyframes on HLS segment boundaries."""
+    video_kbps = rendition["video_kbps"]
+    return [
+        "ffmpeg", "-y", "-v", "error", "-i", input_path,
+        "-vf", f"scale={rendition['width']}:{rendition['height']}",
+        "-c:v", "libx264", "-preset", "veryfast", "-profile:v", "high", "-pix_fmt", "yuv420p",
+        "-b:v", f"{video_kbps}k", "-maxrate", f"{int(video_kbps * 1.1)}k", "-bufsize", f"{video_kbps * 2}k",
+        "-force_key_frames", f"expr:gte(t,n_forced*{HLS_SEGMENT_SECONDS})",
+        "-threads", str(threads),
+        "-c:a", "aac", "-b:a", f"{rendition['audio_kbps']}k",
+        "-movflags", "+faststart",
+        output_path,
+    ]
+
+def build_hls_command(input_path: str, playlist_path: str) -> list[str]:
+    """Segment an encoded rendition into HLS without re-encoding (keyframes are already on segment boundaries)."""
+    segment_pattern = os.path.join(os.path.dirname(playlist_path), "segment_%03d.ts")
+    return [
+        "ffmpeg", "-y", "-v", "error", "-i", input_path,
+        "-c", "copy", "-f", "hls",
+        "-hls_time", str(HLS_SEGMENT_SECONDS), "-hls_playlist_type", "vod",
+        "-hls_segment_filename", segment_pattern,
+        playlist_path,
+    ]
+
+def run_ffmpeg(ffmpeg_cmd: list[str], timeout: int = 600):
+    result = subprocess.run(ffmpeg_cmd, capture_output=True, text=True, timeout=timeout)
+    if result.returncode != 0:
+        raise Exception(f"ffmpeg failed: {result.stderr.strip()}")
+
+def write_hls_master_playlist(path: str, renditions: list[dict]):
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3"]
+    for rendition in sorted(renditions, key=lambda r: r["video_kbps"], reverse=True):
+        bandwidth = (rendition["video_kbps"] + rendition["audio_kbps"]) * 1000
+        lines.append(f"#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},RESOLUTION={rendition['width']}x{rendition['height']}")
+        lines.append(f"{rendition['name']}/index.m3u8")
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+def encode_renditions(master_path: str, output_dir: str, renditions: list[dict], hls: bool = False) -> dict:
+    """Encode all renditions of the master in parallel, splitting the container's cores between them.
+
+    Returns {"renditions": [...], "artifacts": {artifact name: path}, "seconds"} where artifact names are
+    relative to output_dir (renditions/720p.mp4, hls/master.m3u8, hls/720p/segment_000.ts, ...).
+    """
+    start = time.time()
+    threads = max(1, (os.cpu_count() or 1) // max(1, len(renditions)))
+    os.makedirs(os.path.join(output_dir, RENDITIONS_DIR), exist_ok=True)
+
+    def encode(rendition):
+        mp4_path = os.path.join(output_dir, RENDITIONS_DIR, f"{rendition['name']}.mp4")
+        run_ffmpeg(build_rendition_command(master_path, mp4_path, rendition, threads))
+        if hls:
+            playlist_path = os.path.join(output_dir, HLS_DIR, rendition["name"], "index.m3u8")
+            os.makedirs(os.path.dirname(playlist_path), exist_ok=True)
+            run_ffmpeg(build_hls_command(mp4_path, playlist_path))
+        return {**rendition, "path": mp4_path, "bytes": os.path.getsize(mp4_path)}
+
+    with ThreadPoolExecutor(max_workers=max(1, len(renditions))) as pool:
+        encoded = list(pool.map(encode, renditions))
+
+    artifacts = {f"{RENDITIONS_DIR}/{rendition['name']}.mp4": rendition["path"] for rendition in encoded}
+    if hls and encoded:
+        write_hls_master_playlist(os.path.join(output_dir, HLS_DIR, "master.m3u8"), encoded)
+        hls_root = os.path.join(output_dir, HLS_DIR)
+        for dirpath, _, filenames in os.walk(hls_root):
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                artifacts[os.path.relpath(path, output_dir).replace(os.sep, "/")] = path
+
+    return {"renditions": encoded, "artifacts": artifacts, "seconds": round(time.time() - start, 2)}
+
+# Library previews cut from every finished video that has an artifact upload target: a poster frame, evenly
+# spaced thumbnails and a sprite sheet of the thumbnails indexed by a WebVTT file (for hover scrubbing), stored
+# under previews/ next to the video
+PREVIEWS_DIR = "previews"
+PREVIEW_THUMBNAIL_COUNT = 20
+PREVIEW_THUMBNAIL_WIDTH = 160
+PREVIEW_SPRITE_COLUMNS = 5
+# Poster frame position as a fraction of the duration
+PREVIEW_POSTER_POSITION = 0.5
+
+def probe_duration(video_path: str) -> float:
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", video_path],
+        capture_output=True, text=True, timeout=60
+    )
+    if result.returncode != 0:
+        raise Exception(f"ffprobe failed: {result.stderr.strip()}")
+    return float(result.stdout.strip())
+
+def preview_layout(duration: float, width: int, height: int) -> dict:
+    """Thumbnail interval and size and sprite grid for a video."""
+    thumbnail_height = int(round(PREVIEW_THUMBNAIL_WIDTH * height / width / 2)) * 2
+    return {
+        "interval": duration / PREVIEW_THUMBNAIL_COUNT,
+        "thumbnail_width": PREVIEW_THUMBNAIL_WIDTH,
+        "thumbnail_height": thumbnail_height,
+        "columns": PREVIEW_SPRITE_COLUMNS,
+        "rows": -(-PREVIEW_THUMBNAIL_COUNT // PREVIEW_SPRITE_COLUMNS),
+    }
+
+def build_preview_command(input_path: str, output_dir: str, duration: float, layout: dict) -> list[str]:
+    """Decode the video once and write the poster, the thumbnails and the sprite sheet from split streams.
+
+    Thumbnails are the first frames at the middle of each of PREVIEW_THUMBNAIL_COUNT equal intervals.
+    """
+    interval = layout["interval"]
+    filters = ";".join([
+        "[0:v]split=2[poster_in][thumbnails_in]",
+        f"[poster_in]trim=start={duration * PREVIEW_POSTER_POSITION:.3f},setpts=PTS-STARTPTS[poster]",
+        f"[thumbnails_in]select='gte(t,(selected_n+0.5)*{interval:.4f})',"
+        f"scale={layout['thumbnail_width']}:{layout['thumbnail_height']},split=2[thumbnails][sprite_in]",
+        f"[sprite_in]tile={layout['columns']}x{layout['rows']}[sprite]",
+    ])
+    preview_dir = os.path.join(output_dir, PREVIEWS_DIR)
+    return [
+        "ffmpeg", "-y", "-v", "error", "-i", input_path, "-filter_complex", filters,
+        "-map", "[poster]", "-frames:v", "1", "-q:v", "3", "-update", "1", os.path.join(preview_dir, "poster.jpg"),
+        "-map", "[thumbnails]", "-frames:v", str(PREVIEW_THUMBNAIL_COUNT), "-q:v", "5", os.path.join(preview_dir, "thumb_%03d.jpg"),
+        "-map", "[sprite]", "-frames:v", "1", "-c:v", "libwebp", "-quality", "80", "-update", "1", os.path.join(preview_dir, "sprite.webp"),
+    ]
+
+def format_vtt_timestamp(seconds: float) -> str:
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{int(hours):02d}:{int(minutes):02d}:{seconds:06.3f}"
+
+def write_sprite_vtt(path: str, thumbnails: int, duration: float, layout: dict):
+    """WebVTT index mapping each thumbnail's interval to its tile in sprite.webp (media fragment xywh)."""
+    lines = ["WEBVTT", ""]
+    for index in range(thumbnails):
+        start = index * layout["interval"]
+        end = min(duration, start + layout["interval"])
+        x = (index % layout["columns"]) * layout["thumbnail_width"]
+        y = (index // layout["columns"]) * layout["thumbnail_height"]
+        lines += [
+            f"{format_vtt_timestamp(start)} --> {format_vtt_timestamp(end)}",
+            f"sprite.webp#xywh={x},{y},{layout['thumbnail_width']},{layout['thumbnail_height']}",
+            "",
+        ]
+    with open(path, "w") as f:
+        f.write("\n".join(lines))
+
+def extract_previews(video_path: str, output_dir: str, width: int, height: int) -> dict:
+    """Cut the library previews from a finished video in one ffmpeg pass.
+
+    Returns {"poster", "sprite", "vtt", "thumbnails", "layout", "artifacts": {artifact name: path}, "seconds"}
+    with artifact names relative to output_dir (previews/poster.jpg, previews/thumb_001.jpg, ...).
+    """
+    start = time.time()
+    preview_dir = os.path.join(output_dir, PREVIEWS_DIR)
+    os.makedirs(preview_dir, exist_ok=True)
+    duration = probe_duration(video_path)
+    layout = preview_layout(duration, width, height)
+    run_ffmpeg(build_preview_command(video_path, output_dir, duration, layout))
+
+    thumbnails = sorted(name for name in os.listdir(preview_dir) if name.startswith("thumb_"))
+    write_sprite_vtt(os.path.join(preview_dir, "sprite.vtt"), len(thumbnails), duration, layout)
+    names = ["poster.jpg", *thumbnails, "sprite.webp", "sprite.vtt"]
+    return {
+        "poster": f"{PREVIEWS_DIR}/poster.jpg",
+        "sprite": f"{PREVIEWS_DIR}/sprite.webp",
+        "vtt": f"{PREVIEWS_DIR}/sprite.vtt",
+        "thumbnails": [f"{PREVIEWS_DIR}/{name}" for name in thumbnails],
+        "layout": {key: round(value, 4) if isinstance(value, float) else value for key, value in layout.items()},
+        "artifacts": {f"{PREVIEWS_DIR}/{name}": os.path.join(preview_dir, name) for name in names},
+        "seconds": round(time.time() - start, 2),
+    }
+
+PROGRESSIVE_DIR = "live"
+# Live segments are at most PROGRESSIVE_SEGMENT_SECONDS long (longer animations are cut into several),
+# so the playlist can declare a fixed target duration, with headroom for frame rounding, from the start
+PROGRESSIVE_SEGMENT_SECONDS = HLS_SEGMENT_SECONDS
+PROGRESSIVE_TARGET_DURATION = PROGRESSIVE_SEGMENT_SECONDS + 2
+
+def segment_cuts(duration: float) -> list[tuple[float, float]]:
+    """Split an animation into equal (offset, length) pieces of at most PROGRESSIVE_SEGMENT_SECONDS."""
+    count = max(1, -(-duration // PROGRESSIVE_SEGMENT_SECONDS))
+    length = duration / count
+    return [(part * length, length) for part in range(int(count))]
+
+def build_segment_command(movie_path: str, audio_path: str, output_path: str, start: float, duration: float, offset: float = None) -> list[str]:
+    """Remux a partial movie into an MPEG-TS segment placed at start on the video's timeline.
+
+    offset cuts the segment out of a longer animation at that many seconds in; the video is then
+    re-encoded, since a stream copy can only be cut on keyframes.
+    Every segment gets an audio track (silence when the animation has none) so the stream layout never changes.
+    """
+    seek = ["-ss", f"{offset:.4f}"] if offset is not None else []
+    audio_input = [*seek, "-i", audio_path] if audio_path else ["-f", "lavfi", "-i", "anullsrc=r=48000:cl=stereo"]
+    video_codec = (
+        ["-c:v", "libx264", "-preset", "veryfast", "-crf", "18", "-pix_fmt", "yuv420p"] if offset is not None
+        else ["-c:v", "copy", "-bsf:v", "h264_mp4toannexb"]
+    )
+    return [
+        "ffmpeg", "-y", "-v", "error", *seek, "-i", movie_path, *audio_input,
+        "-map", "0:v:0", "-map", "1:a:0",
+        *video_codec,
+        # Pad audio to the animation's exact length (-shortest never ends against a stream-copied video)
+        "-c:a", "aac", "-ar", "48000", "-ac", "2", "-af", "apad", "-t", f"{duration:.4f}",
+        "-output_ts_offset", f"{start:.4f}",
+        "-f", "mpegts", output_path,
+    ]
+
+class ProgressiveSegmenter:
+    """Publish a render as a growing HLS event playlist, with segments cut from each finished animation.
+
+    Segments are remuxed and uploaded in order on one worker thread so the render never waits on them.
+    """
+
+    def __init__(self, output_dir: str, prefix: str, artifact_upload_urls: dict = None, resumable: dict = None, on_update=None):
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.artifact_upload_urls = artifact_upload_urls
+        self.resumable = resumable
+        self.on_update = on_update
+        self.segments = []
+        self.playlist_upload = None
+        self.started_at = time.time()
+        self.first_segment_seconds = None
+        self.errors = []
+        os.makedirs(os.path.join(output_dir, PROGRESSIVE_DIR), exist_ok=True)
+        self.worker = ThreadPoolExecutor(max_workers=1)
+
+    @property
+    def playlist_name(self) -> str:
+        return f"{PROGRESSIVE_DIR}/index.m3u8"
+
+    def add(self, index: int, start: float, duration: float, movie_path: str, audio_path: str = None):
+        """run_manim on_segment callback."""
+        if duration > 0:
+            self.worker.submit(self.publish_segment, index, start, duration, movie_path, audio_path)
+
+    def publish_segment(self, index: int, start: float, duration: float, movie_path: str, audio_path: str):
+        try:
+            cuts = segment_cuts(duration)
+            for part, (offset, length) in enumerate(cuts):
+                name = f"{PROGRESSIVE_DIR}/{self.prefix}_{index:05d}_{part:02d}.ts"
+                segment_path = os.path.join(self.output_dir, name)
+                run_ffmpeg(build_segment_command(
+                    movie_path, audio_path, segment_path, start + offset, length, offset if len(cuts) > 1 else None
+                ))
+                upload_artifact(name, segment_path, self.artifact_upload_urls, self.resumable)
+                self.segments.append({"name": name, "start": start + offset, "duration": length})
+                if self.first_segment_seconds is None:
+                    self.first_segment_seconds = round(time.time() - self.started_at, 2)
+                self.publish_playlist(ended=False)
+        except Exception as e:
+            # Progressive delivery is best effort; the final video is unaffected
+            print(f"⚠️ Progressive segment {index} failed: {str(e)}")
+            self.errors.append(str(e))
+
+    def publish_playlist(self, ended: bool):
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            "#EXT-X-PLAYLIST-TYPE:EVENT",
+            # Fixed for the whole stream: the spec forbids changing it once players have loaded the playlist
+            f"#EXT-X-TARGETDURATION:{PROGRESSIVE_TARGET_DURATION}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+        ]
+        for segment in self.segments:
+            lines.append(f"#EXTINF:{segment['duration']:.3f},")
+            lines.append(os.path.basename(segment["name"]))
+        if ended:
+            lines.append("#EXT-X-ENDLIST")
+        playlist_path = os.path.join(self.output_dir, self.playlist_name)
+        with open(playlist_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        self.playlist_upload = upload_artifact(
+            self.playlist_name, playlist_path, self.artifact_upload_urls, self.resumable, overwrite=True
+        ) or self.playlist_upload
+        if self.on_update:
+            self.on_update(self.summary())
+
+    def finish(self, ended: bool = True) -> dict:
+        """Wait for queued segments and publish the final playlist (with ENDLIST if the render completed)."""
+        self.worker.shutdown(wait=True)
+        if self.segments:
+            try:
+                self.publish_playlist(ended=ended)
+            except Exception as e:
+                print(f"⚠️ Publishing final playlist failed: {str(e)}")
+                self.errors.append(str(e))
+        return self.summary()
+
+    def summary(self) -> dict:
+        return {
+            "playlist": self.playlist_name,
+            "playlist_location": (self.playlist_upload or {}).get("location"),
+            "segments": len(self.segments),
+            "seconds_to_first_segment": self.first_segment_seconds,
+            "errors": self.errors,
+        }
+
+# Static render cost model, in seconds of container time. Calibrated on cairo renders of typical explainers.
+ESTIMATE_STARTUP_SECONDS = 8.0
+ESTIMATE_FRAME_SECONDS_PER_MEGAPIXEL = 0.05
+ESTIMATE_TEX_SECONDS = 0.8
+ESTIMATE_TTS_SECONDS = 1.5
+ESTIMATE_OBJECT_FRAME_SECONDS = 0.0004
+DEFAULT_PLAY_SECONDS = 1.0
+DEFAULT_WAIT_SECONDS = 1.0
+DEFAULT_LOOP_ITERATIONS = 5
+NARRATION_WORDS_PER_SECOND = 2.5
+TEX_MOBJECTS = {'MathTex', 'Tex', 'SingleStringMathTex', 'MathTable', 'Matrix', 'DecimalMatrix', 'IntegerMatrix'}
+
+# Container tiers, smallest first. A job goes to the first tier whose estimate ceiling covers it.
+RENDER_TIERS = {
+    'small': {
+        'cpu': 2.0,
+        'memory': 4096,
+        'timeout': 600,
+        # Well above the estimate ceiling, since loops over data the estimate can't size are guessed
+        'render_timeout': 360,
+        'concurrent_inputs': 2,
+        'max_estimated_seconds': 90,
+        'max_loop_mobjects': 200,
+    },
+    'medium': {
+        'cpu': 4.0,
+        'memory': 8192,
+        'timeout': 1800,
+        'render_timeout': 1200,
+        'concurrent_inputs': 2,
+        'max_estimated_seconds': 600,
+        'max_loop_mobjects': 1000,
+    },
+    'large': {
+        'cpu': 8.0,
+        'memory': 16384,
+        'timeout': 3600,
+        'render_timeout': 1500,
+        'concurrent_inputs': 1,  # One render per container
+        'max_estimated_seconds': None,
+        'max_loop_mobjects': None,
+    },
+}
+DEFAULT_RENDER_TIER = 'medium'
+
+def next_render_tier(tier: str):
+    """The next bigger tier, where a render that timed out or ran out of memory is retried; None for the largest."""
+    tiers = list(RENDER_TIERS)
+    index = tiers.index(tier)
+    return tiers[index + 1] if index + 1 < len(tiers) else None
+
+def render_memory_budget(tier: str) -> int:
+    """Memory in MB the renders running on a tier's container may use together (if its cgroup can't be read)."""
+    return int(RENDER_TIERS[tier]['memory'] * GOVERNOR_MEMORY_SHARE)
+
+def static_length(node, sizes: dict):
+    """Length of an iterable known from the code: a literal (or a repeated one), a name bound to one (sizes),
+    range() over numbers or len() of those, or enumerate/zip/sorted/... of them. None if it can't be known."""
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        return len(node.elts)
+    if isinstance(node, ast.Dict):
+        return len(node.keys)
+    if isinstance(node, ast.Name):
+        return sizes.get(node.id)
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Mult):
+        # [0] * 30
+        length, times = static_length(node.left, sizes), static_int(node.right, sizes)
+        return None if length is None or times is None else length * times
+    if not isinstance(node, ast.Call) or not node.args:
+        return None
+    name = call_name(node)
+    if name == 'range':
+        bounds = [static_int(arg, sizes) for arg in node.args]
+        if None in bounds:
+            return None
+        try:
+            return len(range(*bounds))
+        except (TypeError, ValueError):
+            return None
+    if name in ('enumerate', 'reversed', 'sorted', 'list', 'tuple'):
+        return static_length(node.args[0], sizes)
+    if name == 'zip':
+        lengths = [static_length(arg, sizes) for arg in node.args]
+        return None if None in lengths else min(lengths)
+    return None
+
+def static_int(node, sizes: dict):
+    """Integer value of a range() bound: a number or len() of an iterable of known length."""
+    if is_number(node):
+        return int(node.value)
+    if isinstance(node, ast.Call) and call_name(node) == 'len' and len(node.args) == 1:
+        return static_length(node.args[0], sizes)
+    return None
+
+def loop_iterations(node, sizes: dict = None) -> int:
+    """Statically estimate how many times a loop body runs; sizes maps names to the lengths of the literals they hold."""
+    if isinstance(node, (ast.For, ast.comprehension)):
+        length = static_length(node.iter, sizes or {})
+        if length is not None:
+            return length
+    return DEFAULT_LOOP_ITERATIONS
+
+class RenderCostVisitor(ast.NodeVisitor):
+    """Walk scene code accumulating the features the cost model uses, weighting loop bodies by their iterations."""
+
+    def __init__(self, max_wait: float = None):
+        self.max_wait = max_wait
+        self.multiplier = 1
+        self.loop_depth = 0
+        self.play_depth = 0
+        # Names bound to literal lists, tuples, sets and dicts (e.g. chart data), by length
+        self.sizes = {}
+        self.features = {
+            "play_calls": 0,
+            "video_seconds": 0.0,
+            "tex_mobjects": 0,
+            "loop_mobjects": 0,
+            "voiceover_blocks": 0,
+        }
+
+    def visit_loop(self, node, iterations: int):
+        saved = self.multiplier
+        self.multiplier = min(saved * max(iterations, 0), 100_000)
+        self.loop_depth += 1
+        for statement in node.body:
+            self.visit(statement)
+        self.loop_depth -= 1
+        self.multiplier = saved
+        for statement in node.orelse:
+            self.visit(statement)
+
+    def visit_Assign(self, node):
+        length = static_length(node.value, self.sizes)
+        for target in node.targets:
+            if isinstance(target, ast.Name):
+                if length is None:
+                    self.sizes.pop(target.id, None)
+                else:
+                    self.sizes[target.id] = length
+        self.generic_visit(node)
+
+    def visit_For(self, node):
+        self.visit(node.iter)
+        self.visit_loop(node, loop_iterations(node, self.sizes))
+
+    def visit_While(self, node):
+        self.visit(node.test)
+        self.visit_loop(node, DEFAULT_LOOP_ITERATIONS)
+
+    def visit_comprehension_expr(self, node):
+        iterations = 1
+        for generator in node.generators:
+            self.visit(generator.iter)
+            iterations *= loop_iterations(generator, self.sizes)
+        saved = self.multiplier
+        self.multiplier = min(saved * max(iterations, 0), 100_000)
+        self.loop_depth += 1
+        for child in (getattr(node, 'key', None), getattr(node, 'value', None), getattr(node, 'elt', None)):
+            if child is not None:
+                self.visit(child)
+        self.loop_depth -= 1
+        self.multiplier = saved
+
+    visit_ListComp = visit_SetComp = visit_GeneratorExp = visit_DictComp = visit_comprehension_expr
+
+    def visit_With(self, node):
+        voiceover = next((item.context_expr for item in node.items if is_self_call(item.context_expr, 'voiceover')), None)
+        if voiceover is None:
+            return self.generic_visit(node)
+
+        self.features["voiceover_blocks"] += self.multiplier
+        text_node = next((k.value for k in voiceover.keywords if k.arg == 'text'), voiceover.args[0] if voiceover.args else None)
+        words = len(text_node.value.split()) if isinstance(text_node, ast.Constant) and isinstance(text_node.value, str) else 0
+
+        # The block lasts as long as the longer of its animations and its narration
+        before = self.features["video_seconds"]
+        self.generic_visit(node)
+        animated = (self.features["video_seconds"] - before) / max(self.multiplier, 1)
+        narration = words / NARRATION_WORDS_PER_SECOND
+        if narration > animated:
+            self.features["video_seconds"] += (narration - animated) * self.multiplier
+
+    def visit_Call(self, node):
+        if is_self_call(node, 'play'):
+            run_time = next((k.value.value for k in node.keywords if k.arg == 'run_time' and is_number(k.value)), DEFAULT_PLAY_SECONDS)
+            self.features["play_calls"] += self.multiplier
+            self.features["video_seconds"] += run_time * self.multiplier
+            # Calls inside play() are mostly animations, not mobjects that stay on screen
+            self.play_depth += 1
+            self.generic_visit(node)
+            self.play_depth -= 1
+            return
+        elif is_self_call(node, 'wait'):
+            duration = node.args[0].value if node.args and is_number(node.args[0]) else DEFAULT_WAIT_SECONDS
+            if self.max_wait is not None:
+                duration = min(duration, self.max_wait)
+            self.features["video_seconds"] += duration * self.multiplier
+        else:
+            name = call_name(node)
+            if name in TEX_MOBJECTS:
+                self.features["tex_mobjects"] += self.multiplier
+            elif self.loop_depth and not self.play_depth and name and name[:1].isupper():
+                self.features["loop_mobjects"] += self.multiplier
+        self.generic_visit(node)
+
+def estimate_render_cost(code: str, width: int, height: int, profile: dict, tree: ast.Module = None) -> dict:
+    """Statically score scene code and pick a container tier.
+
+    Returns {"tier", "estimated_seconds", "features"}; estimated_seconds doubles as the ETA shown to users.
+    """
+    tree = tree or parse_scene(code)
+    visitor = RenderCostVisitor(max_wait=profile.get('max_wait'))
+    if tree is not None:
+        visitor.visit(tree)
+    features = visitor.features
+
+    frames = features["video_seconds"] * profile['fps']
+    megapixels = width * height / 1_000_000
+    estimated_seconds = (
+        ESTIMATE_STARTUP_SECONDS
+        + frames * megapixels * ESTIMATE_FRAME_SECONDS_PER_MEGAPIXEL
+        + features["tex_mobjects"] * ESTIMATE_TEX_SECONDS
+        + features["voiceover_blocks"] * ESTIMATE_TTS_SECONDS / VOICEOVER_PREFETCH_WORKERS
+        + features["loop_mobjects"] * frames * ESTIMATE_OBJECT_FRAME_SECONDS
+    )
+
+    tier = 'large'
+    for name, limits in RENDER_TIERS.items():
+        if (limits['max_estimated_seconds'] is None or estimated_seconds <= limits['max_estimated_seconds']) and \
+                (limits['max_loop_mobjects'] is None or features["loop_mobjects"] <= limits['max_loop_mobjects']):
+            tier = name
+            break
+
+    features.update(
+        video_seconds=round(features["video_seconds"], 2),
+        frames=int(frames),
+        width=width,
+        height=height,
+        fps=profile['fps'],
+        parsed=tree is not None,
+    )
+    return {"tier": tier, "estimated_seconds": round(estimated_seconds, 1), "features": features}
+
+def route_render(request_body: dict) -> dict:
+    """Estimate a request's cost and choose its tier; an explicit request_body["tier"] wins."""
+    profile = get_render_profile(request_body.get("render_profile", DEFAULT_RENDER_PROFILE))
+    width, height = compute_render_dimensions(
+        request_body.get("resolution", "720p"), request_body.get("aspect_ratio", "16:9"), profile['max_height']
+    )
+    estimate = estimate_render_cost(sanitize_unicode(request_body.get("code", "")), width, height, profile)
+    # Unparseable code still goes through the pipeline (and fails fast there) on the default tier
+    if not estimate["features"]["parsed"]:
+        estimate["tier"] = DEFAULT_RENDER_TIER
+    if request_body.get("tier") in RENDER_TIERS:
+        estimate["tier"] = request_body["tier"]
+    return estimate
+
+# One-frame scene exercising the slow first-use paths: LaTeX (MathTex), Pango fonts (Text) and Manim's imports
+WARM_UP_SCENE = """from manim import *
+
+class WarmUpScene(Scene):
+    def construct(self):
+        self.add(MathTex(r"e^{i\\pi} + 1 = 0"), Text("Warm up").to_edge(DOWN))
+"""
+
+def warm_up_render() -> dict:
+    """Render the warm-up scene at preflight size so LaTeX, font and bytecode caches are primed.
+
+    Runs at image build time (caches are baked into the image) and again in the container startup hook.
+    """
+    start = time.time()
+    workspace = create_render_workspace(f"warmup-{uuid.uuid4().hex[:8]}")
+    try:
+        with open(os.path.join(workspace, "warmup_scene.py"), "w", encoding='utf-8') as f:
+            f.write(WARM_UP_SCENE)
+        result = subprocess.run(
+            build_preflight_command("warmup_scene.py", "WarmUpScene"),
+            capture_output=True, text=True, timeout=PREFLIGHT_TIMEOUT, cwd=workspace
+        )
+        success = result.returncode == 0
+        if not success:
+            print(f"⚠️ Warm-up render failed: {result.stderr[-2000:]}")
+    except subprocess.TimeoutExpired:
+        success = False
+        print("⚠️ Warm-up render timed out")
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+    seconds = round(time.time() - start, 2)
+    print(f"🔥 Warm-up render {'completed' if success else 'failed'} in {seconds}s")
+    return {"success": success, "seconds": seconds}
+
 # Define container image with all dependencies pre-installed
 image = (
     modal.Image.debian_slim(python_version="3.11")
@@ -315,26 +2546,210 @@ image = (
         "requests",
         "fastapi[standard]"
     )
+    # Build LaTeX, font and bytecode caches into the image so no container starts from scratch
+    .run_function(warm_up_render)
 )
 
-@app.function(
-    image=image,
-    timeout=1800,  # 30 minutes
-    cpu=4.0,
-    memory=8192,
+# Lightweight image for the job API endpoints
+api_image = modal.Image.debian_slim(python_version="3.11").pip_install(
+    "requests",
+    "fastapi[standard]"
 )
-@modal.fastapi_endpoint(method="POST")
-def render_manim(request_body: dict) -> dict:
-    """Render Manim animation and optionally upload to Supabase."""
+
+# Render job records keyed by job id: status, live progress and final result
+render_jobs = modal.Dict.from_name("manim-render-jobs", create_if_missing=True)
+
+# Render assets shared between containers, e.g. a batch's compiled TeX and voiceovers
+render_cache = modal.Volume.from_name("manim-render-cache", create_if_missing=True)
+
+def reload_render_cache():
+    """Pick up other containers' writes to the render cache Volume; a local cache directory is always current."""
+    if not modal.is_local():
+        render_cache.reload()
+
+def commit_render_cache():
+    """Make this container's writes to the render cache Volume visible to other containers."""
+    if not modal.is_local():
+        render_cache.commit()
+
+# Identical renders: finished results by render key, and the job currently rendering each key
+render_results = modal.Dict.from_name("manim-render-results", create_if_missing=True)
+render_inflight = modal.Dict.from_name("manim-render-inflight", create_if_missing=True)
+# Webhooks of requests coalesced onto an in-flight job, one key per registration ("<job id>:<registration id>")
+# so concurrent registrations never overwrite each other
+render_webhooks = modal.Dict.from_name("manim-render-webhooks", create_if_missing=True)
+
+# Which render of a hedged pair claimed the upload, by job id
+render_hedges = modal.Dict.from_name("manim-render-hedges", create_if_missing=True)
+
+# Scheduler: submit/finish events in, lane state (owned by schedule_renders) out
+scheduler_events = modal.Queue.from_name("manim-render-scheduler-events", create_if_missing=True)
+scheduler_state = modal.Dict.from_name("manim-render-scheduler", create_if_missing=True)
+
+# Bump to invalidate every cached result (e.g. after a renderer change that alters output)
+RENDER_CACHE_VERSION = 1
+# Request fields that change the rendered output, with their defaults; webhooks and tier don't
+RENDER_KEY_DEFAULTS = {
+    "scene_name": "GeneratedScene",
+    "resolution": "720p",
+    "aspect_ratio": "16:9",
+    "duration": 8,
+    "style": "auto",
+    "render_profile": DEFAULT_RENDER_PROFILE,
+    "renditions": None,
+    "hls": False,
+    "faststart": True,
+    "still": None,
+    "image_format": "png",
+    "previews": True,
+    # A result is only reused by requests that stored (or skipped) render state the same way
+    "keep_render_state": False,
+}
+# Where the output goes: a result uploaded to one caller's signed URLs never reaches another caller's,
+# so only requests with the same targets (retries) or none share a result
+RENDER_KEY_UPLOAD_FIELDS = ("upload_url", "upload_resumable", "artifact_upload_urls", "log_upload_url")
+
+def render_cache_key(request_body: dict) -> str:
+    """Hash of the tenant, the scene code, every parameter that affects the output and the upload targets.
+
+    Results (and their upload locations) are only shared within a tenant.
+    """
+    payload = {
+        "version": RENDER_CACHE_VERSION,
+        "tenant": str(request_body.get("tenant_id") or DEFAULT_TENANT),
+        "code": sanitize_unicode(request_body.get("code", "")),
+        **{field: request_body.get(field, default) for field, default in RENDER_KEY_DEFAULTS.items()},
+        "upload": {field: request_body.get(field) for field in RENDER_KEY_UPLOAD_FIELDS},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+def run_render_pipeline(request_body: dict, on_progress=None, job_id: str = None, render_timeout: int = 1200,
+                        scene_variant: str = "original", claim_output=None, cancel_event=None, memory_limit_mb: int = None,
+                        render_id: str = None, container_memory_mb: int = None) -> dict:
+    """Render Manim animation and optionally upload to Supabase.
+
+    on_progress, if given, is called with partial progress updates (phase, animation, frames).
+    Each call renders in its own workspace, so several can run in one container at once.
+    render_timeout bounds each Manim run and comes from the container tier; a render that outgrows the
+    tier fails with "capacity_exceeded" ("timeout" or "memory", without trying the fallback scene) so
+    the caller can move it to a bigger one.
+    scene_variant picks what is rendered: "original" (falling back to the fallback scene on failure),
+    "original_only" or "fallback". Hedged renders use the last two with claim_output, called before
+    uploading (a False return means the other render won), and cancel_event, which stops Manim.
+    Each render runs under a ResourceGovernor, with memory_limit_mb as its own limit or
+    container_memory_mb as the budget it shares with the container's other renders; a render that
+    runs out of memory is retried at lower settings (MEMORY_DEGRADE_STEPS) and the response lists
+    what was degraded.
+    render_id (default: job_id) names the state stored with "keep_render_state"; a later request
+    with it as "previous_render_id" re-renders only the animations its code changes.
+    """
+    
+    def report_progress(**updates):
+        if on_progress:
+            on_progress(updates)
+    
+    def start_segmenter(prefix: str):
+        if not progressive:
+            return None
+        return ProgressiveSegmenter(
+            os.path.join(workspace, RENDER_OUTPUT_DIR), prefix, artifact_upload_urls, upload_resumable,
+            on_update=lambda summary: report_progress(live=summary)
+        )
+    
+    def finish_segmenter(segmenter, completed: bool):
+        return segmenter.finish(ended=completed) if segmenter else None
+    
+    def render_scene(scene_file: str, class_name: str, phase: str, total_animations: int):
+        """Render a scene file, stepping resolution and frame rate down each time it runs out of memory."""
+        nonlocal profile, width, height, progressive_summary
+        stem = Path(scene_file).stem
+        result = None
+        for attempt, step in enumerate([None] + MEMORY_DEGRADE_STEPS):
+            if step is not None:
+                degraded_profile, degraded_width, degraded_height = degrade_render_settings(profile, resolution, aspect_ratio, step)
+                if (degraded_width, degraded_height, degraded_profile['fps']) == (width, height, profile['fps']):
+                    continue
+                degradations.append({
+                    "scene": stem,
+                    "reason": MEMORY_FAILURE_REASONS[resource_usage[-1]['memory_exceeded']],
+                    "peak_rss_mb": resource_usage[-1]['peak_rss_mb'],
+                    "resolution": f"{width}x{height} -> {degraded_width}x{degraded_height}",
+                    "fps": f"{profile['fps']} -> {degraded_profile['fps']}",
+                })
+                print(f"🧯 Out of memory; retrying at {degraded_width}x{degraded_height}, {degraded_profile['fps']} fps")
+                profile, width, height = degraded_profile, degraded_width, degraded_height
+            
+            manim_cmd = profile_manim_command(
+                build_manim_command(scene_file, class_name, profile, width, height, style, still=still, caching=caching),
+                workspace,
+                f"{stem}_profile.json"
+            )
+            
+            print(f"🔧 Running Manim command: {' '.join(manim_cmd)}")
+            
+            report_progress(phase=phase)
+            governor = ResourceGovernor(memory_limit_mb, container_memory_mb)
+            result = None
+            # A retry republishes the live playlist from its own segments
+            segmenter = start_segmenter(stem if attempt == 0 else f"{stem}_retry{attempt}")
+            try:
+                result = run_manim(
+                    manim_cmd,
+                    on_progress=lambda progress: report_progress(phase=phase, **progress),
+                    total_animations=total_animations,
+                    timeout=render_timeout,
+                    cwd=workspace,
+                    on_segment=segmenter.add if segmenter else None,
+                    log_path=log_path,
+                    cancel_event=cancel_event,
+                    governor=governor
+                )
+            except subprocess.TimeoutExpired:
+                raise RenderCapacityExceeded(f"Render timed out after {render_timeout}s", "timeout")
+            finally:
+                progressive_summary = finish_segmenter(segmenter, result is not None and result.returncode == 0)
+                resource_usage.append({"scene": stem, "resolution": f"{width}x{height}", "fps": profile['fps'], **governor.summary()})
+            
+            if result.returncode == 0 or not ran_out_of_memory(result, governor):
+                return result
+        raise RenderCapacityExceeded(
+            f"Render ran out of memory (limit {memory_limit_mb or container_memory_mb} MB) at every degrade step", "memory"
+        )
+    
+    def publish_log():
+        """Summarize the job log and upload it if a log_upload_url was given (on success and failure alike)."""
+        if not os.path.exists(log_path):
+            return None
+        summary = {"path": log_path, "bytes": os.path.getsize(log_path), "upload": None}
+        if log_upload_url:
+            try:
+                summary["upload"] = upload_file(log_path, ARTIFACT_CONTENT_TYPES[".log"], upload_url=log_upload_url)
+            except Exception as e:
+                print(f"⚠️ Log upload failed: {str(e)}")
+                summary["upload_error"] = str(e)
+        return summary
     
     # Extract parameters from request body
     code = request_body.get("code", "")
     scene_name = request_body.get("scene_name", "GeneratedScene")
     upload_url = request_body.get("upload_url")
+    upload_resumable = request_body.get("upload_resumable")
     resolution = request_body.get("resolution", "720p")
     aspect_ratio = request_body.get("aspect_ratio", "16:9")
     duration = request_body.get("duration", 8)
     style = request_body.get("style", "auto")
+    renditions = request_body.get("renditions")
+    hls = request_body.get("hls", False)
+    artifact_upload_urls = request_body.get("artifact_upload_urls")
+    log_upload_url = request_body.get("log_upload_url")
+    # Segments can only be delivered progressively if there is somewhere to publish them
+    progressive = request_body.get("progressive", False) and bool(upload_resumable or artifact_upload_urls)
+    # None: render scenes that never animate as a still frame, everything else as video
+    still = request_body.get("still")
+    image_format = request_body.get("image_format", "png")
+    previous_render_id = request_body.get("previous_render_id")
+    keep_render_state = request_body.get("keep_render_state", False)
+    profile = get_render_profile(request_body.get("render_profile", DEFAULT_RENDER_PROFILE))
     
     if not code:
         return {
@@ -342,136 +2757,160 @@ def render_manim(request_body: dict) -> dict:
             "error": "No code provided in request body"
         }
     
-    # Map resolution to Manim quality flag
-    quality_map = {
-        '480p': '-ql',  # Low quality
-        '720p': '-qh',  # High quality
-        '1080p': '-qk', # 4K quality
-    }
-    quality_flag = quality_map.get(resolution, '-qh')
-    
-    # Calculate resolution dimensions from aspect ratio and resolution
-    height = int(resolution.replace('p', ''))
-    if aspect_ratio == '16:9':
-        width = int(height * 16 / 9)
-    elif aspect_ratio == '9:16':
-        width = int(height * 9 / 16)
-    elif aspect_ratio == '1:1':
-        width = height
-    else:
-        # Default to 16:9
-        width = int(height * 16 / 9)
+    if image_format not in STILL_IMAGE_FORMATS:
+        return {
+            "success": False,
+            "error": f"Unsupported image_format '{image_format}', expected one of {', '.join(STILL_IMAGE_FORMATS)}"
+        }
     
+    # Calculate resolution dimensions from aspect ratio, resolution and profile height cap
+    width, height = compute_render_dimensions(resolution, aspect_ratio, profile['max_height'])
     resolution_str = f"{width}x{height}"
     
-    print(f"🎬 Rendering with: {quality_flag} (resolution: {resolution_str}, duration: {duration}s, style: {style})")
+    print(f"🎬 Rendering with profile '{profile['name']}' (resolution: {resolution_str}, fps: {profile['fps']}, duration: {duration}s, style: {style})")
     
     result = None
+    fallback_changes = []
+    fallback_preflight = None
+    progressive_summary = None
+    resource_usage = []
+    degradations = []
+    run_preflights = request_body.get("preflight", True)
+    
+    job_id = job_id or uuid.uuid4().hex
+    render_id = render_id or job_id
+    incremental = None
+    render_state = None
+    workspace = create_render_workspace(job_id)
+    log_path = os.path.join(workspace, RENDER_LOG_FILE)
+    # Long-lived containers take many inputs, so workspaces are removed unless asked for (and then expire)
+    keep_workspace = request_body.get("keep_workspace", False)
     
     try:
         # Sanitize Unicode before writing
         code = sanitize_unicode(code)
         
         # Write scene.py
-        with open("scene.py", "w", encoding='utf-8') as f:
-            f.write(code)
+        with open(os.path.join(workspace, "scene.py"), "w", encoding='utf-8') as f:
+            f.write(apply_render_profile_to_code(code, profile))
         
-        print(f"📝 Written scene.py with {len(code)} characters")
+        print(f"📝 Written scene.py with {len(code)} characters to {workspace}")
+        
+        # Parse once: scene detection, validators, prefetch and the fallback rewrite share this tree
+        tree = parse_scene(code)
         
         # Validate that the scene name exists in the code
-        if f"class {scene_name}" not in code:
+        if tree is not None and find_scene_class(tree, scene_name) != scene_name:
             print(f"⚠️ Warning: Scene name '{scene_name}' not found in code")
             # Try to extract the actual scene name from the code
-            import re
-            scene_match = re.search(r'class\s+(\w+)\s*\(\s*(?:Voiceover)?Scene\s*\)', code)
-            if scene_match:
-                detected_name = scene_match.group(1)
+            detected_name = find_scene_class(tree)
+            if detected_name:
                 print(f"   Detected scene name: '{detected_name}'")
                 scene_name = detected_name
             else:
                 print(f"   Could not detect scene name, using: '{scene_name}'")
         
+        # Title cards and diagrams skip frame generation and encoding: Manim draws just the last frame
+        if still is None:
+            still = is_still_scene(tree)
+        if still:
+            print(f"🖼️ Still scene: rendering the last frame as {image_format.upper()}")
+            # A preflight would draw the same frame again, and there are no segments to stream
+            run_preflights = False
+            progressive = False
+        
         # Validate chart completeness
-        chart_warnings = validate_chart_completeness(code)
+        chart_warnings = validate_chart_completeness(code, tree)
         if chart_warnings:
             print("⚠️ Chart validation warnings:")
             for warning in chart_warnings:
                 print(f"   - {warning}")
         
         # Validate text/LaTeX usage
-        text_warnings = validate_text_latex_usage(code)
+        text_warnings = validate_text_latex_usage(code, tree)
         if text_warnings:
             print("⚠️ Text/LaTeX validation warnings:")
             for warning in text_warnings:
                 print(f"   - {warning}")
         
+        # Batch targets start from the TeX and voiceovers the batch already built
+        shared_assets_dir = request_body.get("shared_assets_dir")
+        if shared_assets_dir:
+            try:
+                reload_render_cache()
+            except Exception as e:
+                print(f"⚠️ Could not reload the render cache Volume: {str(e)}")
+            shared_files = copy_shared_assets(shared_assets_dir, os.path.join(workspace, "media"))
+            print(f"📦 Copied {shared_files} shared TeX/voiceover files from {shared_assets_dir}")
+        
+        # Incremental render: start from the previous render's TeX, voiceovers and partial movies
+        if previous_render_id and not still:
+            try:
+                reload_render_cache()
+            except Exception as e:
+                print(f"⚠️ Could not reload the render cache Volume: {str(e)}")
+            previous_state = restore_render_state(workspace, previous_render_id)
+            incremental = {"previous_render_id": previous_render_id, "found": previous_state is not None}
+            if previous_state:
+                print(f"♻️ Restored {previous_state['files']} files from render {previous_render_id}")
+                if (previous_state.get("width"), previous_state.get("height"), previous_state.get("fps")) != (width, height, profile['fps']):
+                    print("⚠️ Previous render used other dimensions or frame rate; its animations can't be reused")
+                # Reused animations write no partial movie, so there would be gaps in a live stream
+                progressive = False
+            else:
+                print(f"⚠️ No stored state for render {previous_render_id}; rendering from scratch")
+        # Play call hashing only pays off when this render restores or stores state, and live
+        # segments need every animation rendered afresh
+        caching = not still and (bool(incremental and incremental["found"]) or (keep_render_state and not progressive))
+        
+        # Synthesize all narration up front so the scene only reads cached audio; the fallback scene has none
+        voiceover_prefetch = {"clips": 0, "failed": 0, "seconds": 0.0}
+        if scene_variant != "fallback":
+            voiceover_prefetch = prefetch_voiceovers(code, Path(workspace) / "media" / "voiceovers", tree)
+        
+        # Preflight decides up front whether the original or the fallback code gets the real render
+        preflight = None
+        if run_preflights and scene_variant != "fallback":
+            report_progress(phase="preflight")
+            preflight = run_preflight(workspace, "scene.py", scene_name, log_path)
+        
         print(f"🎬 Rendering scene: {scene_name}")
         
         # Try rendering with voiceover
-        try:
-            # Build Manim command with dynamic parameters
-            manim_cmd = [
-                "manim", 
-                "--disable_caching", 
-                "scene.py", 
-                scene_name, 
-                quality_flag,  # Dynamic quality flag
-                "--format=mp4",
-                f"--resolution={resolution_str}"  # Dynamic resolution
-            ]
-            
-            # Add style-based background color if specified
-            if style in ['dark', 'cinematic']:
-                manim_cmd.extend(["--background_color", "BLACK"])
-            elif style == 'clean':
-                manim_cmd.extend(["--background_color", "WHITE"])
-            
-            print(f"🔧 Running Manim command: {' '.join(manim_cmd)}")
+        try:
+            if scene_variant == "fallback":
+                raise HedgedFallback("hedged render of the fallback scene")
+            if preflight and not preflight["success"]:
+                raise Exception(preflight["error"])
             
-            result = subprocess.run(
-                manim_cmd,
-                capture_output=True,
-                text=True,
-                timeout=1200  # 20 minutes
-            )
+            # Build the Manim command from the render profile and run it under the resource governor
+            result = render_scene("scene.py", scene_name, "rendering", estimate_animation_count(code, tree))
             
             if result.returncode != 0:
                 raise Exception(f"Manim render failed: {result.stderr}")
             
             print("✅ Render completed successfully")
+            timing_profile = load_timing_profile(os.path.join(workspace, "scene_profile.json"))
+            output_name = "scene"
             
+        except (RenderCancelled, RenderCapacityExceeded):
+            # The fallback scene would hit the same limit; a bigger tier may not
+            raise
         except Exception as e:
             error_msg = str(e)
-            print(f"⚠️ Original render failed: {error_msg}")
-            
-            # Smart fallback decision based on error type
-            should_use_fallback = False
-            fallback_reason = ""
-            
-            # Check if this is a voiceover-specific error
-            voiceover_errors = [
-                "voiceover", "speech", "tts", "openai", "audio", 
-                "manim_voiceover", "set_speech_service", "voiceover("
-            ]
-            
-            if any(keyword in error_msg.lower() for keyword in voiceover_errors):
-                should_use_fallback = True
-                fallback_reason = "voiceover service error"
-            elif "syntax" in error_msg.lower() or "indentation" in error_msg.lower():
-                should_use_fallback = False
-                fallback_reason = "syntax error - let AI fix the code"
-            elif "import" in error_msg.lower() or "module" in error_msg.lower():
-                should_use_fallback = False
-                fallback_reason = "import error - let AI fix the code"
-            elif "name" in error_msg.lower() and "not defined" in error_msg.lower():
-                should_use_fallback = False
-                fallback_reason = "undefined name error - let AI fix the code"
+            if isinstance(e, HedgedFallback):
+                should_use_fallback, fallback_reason = True, error_msg
             else:
-                # For other errors, try fallback as a last resort
-                should_use_fallback = True
-                fallback_reason = "unknown error - attempting fallback"
-            
-            print(f"🔍 Error analysis: {fallback_reason}")
+                print(f"⚠️ Original render failed: {error_msg}")
+                
+                # Smart fallback decision based on error type
+                should_use_fallback, fallback_reason = classify_render_error(error_msg)
+                
+                print(f"🔍 Error analysis: {fallback_reason}")
+                
+                if scene_variant == "original_only":
+                    # The hedged fallback render is already running elsewhere
+                    raise Exception(f"Original render failed: {error_msg}")
             
             if not should_use_fallback:
                 print("❌ Not using fallback - error should be fixed by AI retry")
@@ -479,572 +2918,159 @@ def render_manim(request_body: dict) -> dict:
             
             print(f"🔄 Using fallback: {fallback_reason}")
             
-            # Create fallback code by removing voiceover components line by line
-            # First sanitize the original code
-            code = sanitize_unicode(code)
-            
-            lines = code.split('\n')
-            cleaned_lines = []
-            skip_until_dedent = False
-            skip_until_closing_paren = False
-            paren_depth = 0
-            base_indent = None
-            skip_string_literal = False
-
-            for i, line in enumerate(lines):
-                # Sanitize each line
-                line = sanitize_unicode(line)
-                
-                # Skip voiceover imports
-                if 'from manim_voiceover' in line or 'import OpenAIService' in line:
-                    print(f"⚠️ Removing voiceover import at line {i+1}")
-                    continue
-
-                # Replace VoiceoverScene with Scene
-                if 'VoiceoverScene' in line:
-                    line = line.replace('VoiceoverScene', 'Scene')
-
-                # Skip OpenAIService instantiation (direct calls)
-                if 'OpenAIService(' in line:
-                    print(f"⚠️ Skipping OpenAIService call at line {i+1}")
-                    skip_until_closing_paren = True
-                    paren_depth = line.count('(') - line.count(')')
-                    # If the line closes all parens, we're done
-                    if paren_depth <= 0:
-                        skip_until_closing_paren = False
-                    continue
-
-                # If we're skipping a multi-line OpenAIService or set_speech_service block
-                if skip_until_closing_paren:
-                    paren_depth += line.count('(') - line.count(')')
-                    if paren_depth <= 0:
-                        skip_until_closing_paren = False
-                        print(f"⚠️ Ending multi-line voiceover service block at line {i+1}")
-                    continue
-
-                # Skip voiceover service setup
-                if 'self.set_speech_service(' in line:
-                    print(f"⚠️ Skipping set_speech_service at line {i+1}")
-                    skip_until_closing_paren = True
-                    paren_depth = line.count('(') - line.count(')')
-                    if paren_depth <= 0:
-                        skip_until_closing_paren = False
-                    continue
-
-                # Check if this line starts a voiceover block
-                if 'with self.voiceover(' in line:
-                    skip_until_dedent = True
-                    base_indent = len(line) - len(line.lstrip())
-                    print(f"⚠️ Skipping voiceover block starting at line {i+1}")
-                    continue
-
-                # If we're in a voiceover block, check for dedent
-                if skip_until_dedent:
-                    current_indent = len(line) - len(line.lstrip())
-                    # Check if we've reached the end of the voiceover block
-                    if line.strip() == '' or current_indent <= base_indent:
-                        skip_until_dedent = False
-                        print(f"⚠️ Ending voiceover block at line {i+1}")
-                        # Only add the line if it's not empty and not just a closing parenthesis
-                        if line.strip() != '' and line.strip() != ')':
-                            cleaned_lines.append(line)
-                    # Skip all lines inside the voiceover block
-                    continue
-
-                # Handle multi-line string literals that might be broken
-                if skip_string_literal:
-                    if line.strip().endswith('"') or line.strip().endswith("'"):
-                        skip_string_literal = False
-                        print(f"⚠️ Ending multi-line string literal at line {i+1}")
-                    continue
-
-                # Skip orphaned string literals (lines that are just strings without assignment)
-                if (line.strip().startswith('"') and line.strip().endswith('"') and 
-                    '=' not in line and 'self.' not in line and 'print(' not in line and
-                    'Text(' not in line and 'Tex(' not in line and 'MathTex(' not in line):
-                    print(f"⚠️ Skipping orphaned string literal at line {i+1}: {line.strip()[:50]}...")
-                    continue
-
-                # Check for multi-line string literals that don't end on the same line
-                if (line.strip().startswith('"') and not line.strip().endswith('"') and 
-                    '=' not in line and 'self.' not in line and 'print(' not in line):
-                    skip_string_literal = True
-                    print(f"⚠️ Starting multi-line string literal at line {i+1}")
-                    continue
-
-                # Replace tracker.duration with fixed run_time
-                if 'run_time=tracker.duration' in line:
-                    line = line.replace('run_time=tracker.duration', 'run_time=1')
-
-                # Fix LaTeX double braces issue
-                if 'MathTex' in line and '{{' in line:
-                    line = line.replace('{{', '{ {').replace('}}', '} }')
-
-                # Fix config["style"] issue - Manim 0.18.1 doesn't have style attribute
-                if 'config["style"]' in line:
-                    line = line.replace('config["style"]', '"dark"')  # Default to dark style
-                
-                # Fix any other config style references
-                if 'config.style' in line:
-                    line = line.replace('config.style', '"dark"')
-                
-                # Fix undefined classes - replace with appropriate Manim alternatives
-                undefined_classes = {
-                    'PieChart': 'Circle',  # Replace PieChart with Circle
-                    'BarChart': 'Rectangle',  # Replace BarChart with Rectangle
-                    'LineChart': 'Line',  # Replace LineChart with Line
-                    'Histogram': 'Rectangle',  # Replace Histogram with Rectangle
-                    'ScatterPlot': 'Dot',  # Replace ScatterPlot with Dot
-                    'AreaChart': 'Polygon',  # Replace AreaChart with Polygon
-                    'BubbleChart': 'Circle',  # Replace BubbleChart with Circle
-                    'RadarChart': 'Polygon',  # Replace RadarChart with Polygon
-                    'Heatmap': 'Rectangle',  # Replace Heatmap with Rectangle
-                    'Treemap': 'Rectangle',  # Replace Treemap with Rectangle
-                }
-                
-                for undefined_class, replacement in undefined_classes.items():
-                    if undefined_class in line:
-                        line = line.replace(undefined_class, replacement)
-                        print(f"⚠️ Replaced undefined class {undefined_class} with {replacement}")
-                
-                # Fix LaTeX syntax issues
-                if 'MathTex(' in line and '\\frac' in line and 'r"' not in line:
-                    # Add raw string prefix for LaTeX
-                    line = line.replace('MathTex("', 'MathTex(r"')
-                    print("⚠️ Added raw string prefix for LaTeX")
-                
-                # Fix LaTeX dollar sign issues
-                if 'MathTex(' in line and '$' in line and 'r"' not in line:
-                    line = line.replace('MathTex("', 'MathTex(r"')
-                    print("⚠️ Added raw string for LaTeX with dollar signs")
-                
-                # Fix LaTeX brace issues
-                if 'MathTex(' in line and ('{' in line or '}' in line) and 'r"' not in line:
-                    line = line.replace('MathTex("', 'MathTex(r"')
-                    print("⚠️ Added raw string for LaTeX with braces")
-                
-                # Fix common Manim API issues
-                if 'ax.get_graph(' in line and 'color=' in line:
-                    # Remove color parameter from get_graph as it's not supported
-                    line = line.replace('ax.get_graph(', 'ax.plot(')
-                    print("⚠️ Fixed ax.get_graph() API usage")
-                
-                # Fix other common API issues
-                if 'get_graph(' in line and 'color=' in line:
-                    line = line.replace('get_graph(', 'plot(')
-                    print("⚠️ Fixed get_graph() API usage")
-                
-                # Fix Dot() radius parameter conflicts
-                if 'Dot(' in line and 'radius=' in line and '**' in line:
-                    # This is a complex case - try to fix radius conflicts
-                    if 'vertex_dot_style' in line or '**' in line:
-                        print("⚠️ Detected potential Dot() radius conflict - may need manual review")
-                
-                # Fix plot_line_graph parameter issues
-                if 'plot_line_graph(' in line and 'add_vertex_dots=True' in line:
-                    # Remove add_vertex_dots to avoid radius conflicts
-                    line = line.replace('add_vertex_dots=True', 'add_vertex_dots=False')
-                    print("⚠️ Fixed plot_line_graph vertex dots conflict")
-                
-                # Fix vertex_dot_style radius conflicts
-                if 'vertex_dot_style' in line and 'radius' in line:
-                    # Remove radius from vertex_dot_style to avoid conflicts
-                    line = line.replace('vertex_dot_style={"radius":', 'vertex_dot_style={')
-                    line = line.replace('vertex_dot_style={"radius": ', 'vertex_dot_style={')
-                    print("⚠️ Fixed vertex_dot_style radius conflict")
-                
-                # Fix camera.frame API issues (Manim 0.18.1 doesn't have camera.frame)
-                if 'self.camera.frame' in line:
-                    # Replace camera.frame animations with simpler alternatives
-                    if 'animate.scale(' in line:
-                        # Replace scale animation with a simple wait
-                        line = '        self.wait(0.5)  # Replaced camera.frame.animate.scale()'
-                        print("⚠️ Fixed camera.frame.animate.scale() - replaced with wait")
-                    elif 'animate.shift(' in line:
-                        # Replace shift animation with a simple wait
-                        line = '        self.wait(0.5)  # Replaced camera.frame.animate.shift()'
-                        print("⚠️ Fixed camera.frame.animate.shift() - replaced with wait")
-                    elif 'animate' in line:
-                        # Replace any other camera.frame animation
-                        line = '        self.wait(0.5)  # Replaced camera.frame animation'
-                        print("⚠️ Fixed camera.frame animation - replaced with wait")
-                    else:
-                        # Just remove the line if it's not an animation
-                        line = '        # Removed camera.frame reference'
-                        print("⚠️ Removed camera.frame reference")
-                
-                # Fix VGroup type issues - replace VGroup with Group for mixed object types
-                if 'VGroup(' in line and ('Text(' in line or 'MathTex(' in line or 'DecimalNumber(' in line):
-                    # Replace VGroup with Group when mixing VMobjects with Mobjects
-                    line = line.replace('VGroup(', 'Group(')
-                    print("⚠️ Fixed VGroup type issue - replaced with Group for mixed objects")
-                
-                # Fix VGroup assignments that might cause type issues
-                if '= VGroup(' in line and ('Text(' in line or 'MathTex(' in line or 'DecimalNumber(' in line):
-                    line = line.replace('= VGroup(', '= Group(')
-                    print("⚠️ Fixed VGroup assignment - replaced with Group for mixed objects")
-
-                # ANIMATION QUALITY FIXES
-                
-                # Fix 1: Ensure minimum wait times
-                if 'self.wait(' in line:
-                    # Extract wait time and enforce minimum
-                    import re
-                    match = re.search(r'self\.wait\(([0-9.]+)\)', line)
-                    if match:
-                        wait_time = float(match.group(1))
-                        if wait_time < 1.0:
-                            line = line.replace(f'self.wait({wait_time})', 'self.wait(2.0)')
-                            print(f"⚠️ Fixed wait time: {wait_time}s → 2.0s")
-
-                # Fix 2: Add wait after play if missing
-                if 'self.play(' in line and i < len(lines) - 1:
-                    next_line = lines[i + 1] if i + 1 < len(lines) else ''
-                    if 'self.wait(' not in next_line and 'self.play(' in next_line:
-                        # Insert wait after this play
-                        indent = len(line) - len(line.lstrip())
-                        cleaned_lines.append(line)
-                        cleaned_lines.append(' ' * indent + 'self.wait(2.0)  # Added for proper pacing')
-                        print("⚠️ Added missing wait after play")
-                        continue
-
-                # Fix 3: Detect overlapping content (simple heuristic)
-                if 'self.play(' in line and ('Create(' in line or 'Write(' in line or 'FadeIn(' in line):
-                    # Check if previous content was cleared
-                    recent_lines = cleaned_lines[-5:] if len(cleaned_lines) >= 5 else cleaned_lines
-                    has_fadeout = any('FadeOut(' in l for l in recent_lines)
-                    has_clear = any('self.clear()' in l for l in recent_lines)
-                    
-                    if not has_fadeout and not has_clear and len(cleaned_lines) > 10:
-                        # Likely overlapping - add warning comment
-                        indent = len(line) - len(line.lstrip())
-                        cleaned_lines.append(' ' * indent + '# WARNING: Previous content may overlap - consider FadeOut')
-                        print("⚠️ Detected potential overlapping content")
-
-                # Fix 4: Enforce UTF-8 for Text objects
-                if 'Text(' in line or 'Tex(' in line:
-                    # Ensure proper encoding
-                    if '©' in line or 'é' in line or 'è' in line or 'à' in line:
-                        # Already has UTF-8 characters - ensure r-string or proper escaping
-                        if 'Text("' in line and 'r"' not in line:
-                            line = line.replace('Text("', 'Text(r"')
-                            print("⚠️ Added r-string for UTF-8 text")
-
-                # Fix 5: Ensure MathTex for equations (Enhanced)
-                if 'Text(' in line:
-                    # Check for common mathematical symbols/patterns
-                    math_patterns = ['x^2', 'y^2', 'z^2', '=', '\\frac', '\\sqrt', 
-                                   '^2', '^3', '_1', '_2', '\\pm', '\\times', 
-                                   '\\div', '\\leq', '\\geq', '\\neq']
-                    if any(pattern in line for pattern in math_patterns):
-                        # This looks like math - suggest MathTex
-                        cleaned_lines.append('        # WARNING: Consider using MathTex() instead of Text() for equations')
-                        print("⚠️ Detected equation in Text - should use MathTex")
-                
-                # Fix 5b: Ensure raw strings for LaTeX
-                if ('MathTex(' in line or 'Tex(' in line) and 'r"' not in line and 'r\'' not in line:
-                    # Check if it contains LaTeX commands
-                    if '\\' in line and ('MathTex("' in line or 'Tex("' in line):
-                        # Add warning about missing raw string
-                        cleaned_lines.append('        # WARNING: Use raw strings r"..." for LaTeX to avoid backslash issues')
-                        print("⚠️ LaTeX without raw string detected")
-                
-                # Fix 5c: Check for proper MathTex usage with double braces
-                if 'MathTex(' in line and '{{' not in line and 'set_color_by_tex' in code:
-                    # If using color operations, suggest double braces for isolation
-                    cleaned_lines.append('        # TIP: Use {{ }} to isolate parts for coloring: MathTex(r"{{ a^2 }} + {{ b^2 }}")')
-                    print("⚠️ MathTex might benefit from {{ }} for part isolation")
-
-                # Fix 6: Add proper run_time to animations
-                if 'self.play(' in line and 'run_time' not in line:
-                    # Add default run_time
-                    line = line.rstrip()
-                    if line.endswith(')'):
-                        line = line[:-1] + ', run_time=1.5)'
-                    print("⚠️ Added default run_time to animation")
-                
-                # Fix 7: Ensure proper object management for scene cleanup
-                if 'self.add(' in line and 'self.play(' in line:
-                    # Check if objects are properly stored in variables for cleanup
-                    if '=' not in line and 'self.add(' in line:
-                        # Object created inline - suggest storing in variable
-                        cleaned_lines.append('        # WARNING: Store objects in variables for proper cleanup')
-                        print("⚠️ Suggest storing objects in variables for cleanup")
-                
-                # Fix 8: Detect potential static/moving object issues
-                if 'add_updater(' in line:
-                    # Objects with updaters should be properly managed
-                    cleaned_lines.append('        # NOTE: Object with updater - ensure proper cleanup')
-                    print("⚠️ Object with updater detected - ensure proper cleanup")
-                
-                # Fix 9: Memory optimization - limit object creation
-                if 'for i in range(' in line and 'range(100' in line:
-                    # Large loops can cause memory issues
-                    line = line.replace('range(100', 'range(10')  # Limit to 10 objects
-                    print("⚠️ Limited large loop to prevent memory issues")
-                
-                # Fix 10: Timeout prevention - limit animation duration
-                if 'run_time=' in line:
-                    # Extract and limit run_time
-                    import re
-                    match = re.search(r'run_time=([0-9.]+)', line)
-                    if match:
-                        run_time = float(match.group(1))
-                        if run_time > 5.0:  # Limit to 5 seconds max
-                            line = line.replace(f'run_time={run_time}', 'run_time=5.0')
-                            print(f"⚠️ Limited run_time from {run_time}s to 5.0s")
-                
-                # Fix 11: Prevent complex nested operations
-                if 'VGroup(' in line and 'VGroup(' in line:
-                    # Nested VGroups can cause issues
-                    line = line.replace('VGroup(VGroup(', 'VGroup(')
-                    print("⚠️ Simplified nested VGroup structure")
-                
-                # Fix 12: Memory-efficient object creation
-                if 'Circle(radius=0.1)' in line and 'for' in line:
-                    # Small circles in loops can cause memory issues
-                    line = line.replace('Circle(radius=0.1)', 'Circle(radius=0.3)')
-                    print("⚠️ Increased circle radius to reduce memory usage")
-
-                cleaned_lines.append(line)
-            
-            fallback_code = '\n'.join(cleaned_lines)
-            
-            # Extract the actual class name from the fallback code
-            fallback_class_name = scene_name  # Default to original name
-            for line in cleaned_lines:
-                if 'class ' in line and 'Scene' in line:
-                    # Extract class name from "class ClassName(Scene):"
-                    match = re.search(r'class\s+(\w+)\s*\(', line)
-                    if match:
-                        fallback_class_name = match.group(1)
-                        break
-            
-            # CRITICAL: Do NOT modify indentation unless absolutely necessary
-            # The fallback cleanup above should preserve original indentation
-            # Only apply fixes if compilation fails
-            
-            # First, try to compile without any modifications
-            try:
-                compile(fallback_code, "<test>", "exec")
-                print("✅ Fallback code is syntactically valid without fixes")
-            except SyntaxError as initial_error:
-                print(f"⚠️ Initial syntax error: {initial_error}")
-                print("🔧 Attempting syntax fixes...")
-                
-                # Only now try to fix syntax errors
-                fallback_code = fix_syntax_errors(fallback_code)
-                
-                # Try compilation again
-                try:
-                    compile(fallback_code, "<test>", "exec")
-                    print("✅ Fallback code fixed by fix_syntax_errors")
-                except SyntaxError as second_error:
-                    print(f"⚠️ Still has syntax error: {second_error}")
-                    print("🔧 Attempting indentation fix...")
-                    # Only as last resort, try indentation fix
-                    fallback_code = fix_indentation(fallback_code)
-            
-            # Enhanced validation before writing fallback code
-            validation_attempts = 0
-            max_validation_attempts = 3
-            
-            while validation_attempts < max_validation_attempts:
-                try:
-                    compile(fallback_code, "fallback_scene.py", "exec")
-                    print("✅ Fallback code syntax is valid")
-                    break
-                except SyntaxError as e:
-                    validation_attempts += 1
-                    print(f"❌ Fallback code syntax error (attempt {validation_attempts}/{max_validation_attempts}): {e}")
-                    print(f"   Line {e.lineno}: {e.text}")
-                    print(f"   Error type: {type(e).__name__}")
-                    
-                    if validation_attempts < max_validation_attempts:
-                        if "unexpected indent" in str(e).lower():
-                            print("🔧 Indentation error detected - applying aggressive indentation fix")
-                            # For indentation errors, try a more aggressive approach
-                            fallback_code = aggressive_syntax_cleanup(fallback_code)
-                            # Re-apply indentation fix
-                            fallback_code = fix_indentation(fallback_code)
-                        else:
-                            print("🔧 General syntax error - applying aggressive cleanup")
-                            fallback_code = aggressive_syntax_cleanup(fallback_code)
-                    else:
-                        print("❌ Failed to fix syntax after maximum attempts - will attempt render anyway")
-                        # Log the problematic code for debugging
-                        print("🔍 Problematic code preview:")
-                        lines = fallback_code.split('\n')
-                        start_line = max(0, e.lineno - 3)
-                        end_line = min(len(lines), e.lineno + 2)
-                        for i in range(start_line, end_line):
-                            marker = ">>> " if i == e.lineno - 1 else "    "
-                            print(f"{marker}{i+1:3d}: {lines[i]}")
-                        break
-            
-            with open("fallback_scene.py", "w", encoding='utf-8') as f:
-                f.write(fallback_code)
+            if tree is None:
+                raise Exception(f"Original render failed: {error_msg}")
             
-            # Use same dynamic parameters for fallback render
-            fallback_cmd = [
-                "manim", 
-                "--disable_caching", 
-                "fallback_scene.py", 
-                fallback_class_name, 
-                quality_flag,  # Dynamic quality flag
-                "--format=mp4",
-                f"--resolution={resolution_str}"  # Dynamic resolution
-            ]
+            # Rewrite the parsed scene with the fallback rules; unparsing always yields valid Python
+            fallback_tree, fallback_changes = rewrite_scene(tree)
+            fallback_code = ast.unparse(fallback_tree)
+            fallback_class_name = find_scene_class(fallback_tree, scene_name) or scene_name
+            print(f"🔧 Fallback rewrite applied {len(fallback_changes)} changes")
             
-            # Add style-based background color if specified
-            if style in ['dark', 'cinematic']:
-                fallback_cmd.extend(["--background_color", "BLACK"])
-            elif style == 'clean':
-                fallback_cmd.extend(["--background_color", "WHITE"])
+            with open(os.path.join(workspace, "fallback_scene.py"), "w", encoding='utf-8') as f:
+                f.write(apply_render_profile_to_code(fallback_code, profile))
             
-            print(f"🔧 Running fallback Manim command: {' '.join(fallback_cmd)}")
+            if run_preflights:
+                report_progress(phase="fallback_preflight")
+                fallback_preflight = run_preflight(workspace, "fallback_scene.py", fallback_class_name, log_path)
+                if not fallback_preflight["success"]:
+                    raise Exception(f"Fallback render failed: {fallback_preflight['error']}")
             
-            result = subprocess.run(
-                fallback_cmd,
-                capture_output=True,
-                text=True,
-                timeout=1200
+            # Use the same render profile (and any memory downscale) for the fallback render;
+            # it republishes the live playlist from its own segments
+            result = render_scene(
+                "fallback_scene.py", fallback_class_name, "fallback_rendering",
+                estimate_animation_count(fallback_code, fallback_tree)
             )
             
             if result.returncode != 0:
                 raise Exception(f"Fallback render failed: {result.stderr}")
             
             print("✅ Fallback render completed successfully")
+            timing_profile = load_timing_profile(os.path.join(workspace, "fallback_scene_profile.json"))
+            output_name = "fallback_scene"
 
-        # Find output file - try multiple possible locations for both MP4 and PNG
-        possible_video_paths = [
-            f"media/videos/scene/1080p60/{scene_name}.mp4",
-            f"media/videos/scene/720p30/{scene_name}.mp4",
-            f"media/videos/scene/2160p60/{scene_name}.mp4",
-            f"media/videos/scene/1440p60/{scene_name}.mp4",
-            f"media/videos/fallback_scene/1080p60/{scene_name}.mp4",
-            f"media/videos/fallback_scene/720p30/{scene_name}.mp4",
-            f"media/videos/fallback_scene/2160p60/{scene_name}.mp4",
-        ]
-
-        possible_image_paths = [
-            f"media/images/scene/{scene_name}_ManimCE_v0.18.1.png",
-            f"media/images/fallback_scene/{scene_name}_ManimCE_v0.18.1.png",
-        ]
-
-        # If we used fallback, also try with the detected fallback class name
-        if 'fallback_class_name' in locals() and fallback_class_name != scene_name:
-            possible_video_paths.extend([
-                f"media/videos/fallback_scene/1080p60/{fallback_class_name}.mp4",
-                f"media/videos/fallback_scene/720p30/{fallback_class_name}.mp4",
-                f"media/videos/fallback_scene/2160p60/{fallback_class_name}.mp4",
-            ])
-            possible_image_paths.extend([
-                f"media/images/fallback_scene/{fallback_class_name}_ManimCE_v0.18.1.png",
-            ])
-
-        # Search for any MP4 and PNG files in the media directory
-        import glob
-        all_mp4_files = glob.glob("media/videos/**/*.mp4", recursive=True)
-        all_png_files = glob.glob("media/images/**/*.png", recursive=True)
+        # Outputs have deterministic paths inside the job workspace
+        video_path = workspace_output_path(workspace, output_name, "mp4")
+        image_path = workspace_output_path(workspace, output_name, "png")
+        if os.path.exists(video_path):
+            output_path, output_type = video_path, "video"
+        elif os.path.exists(image_path):
+            output_path, output_type = image_path, "image"
+        else:
+            raise Exception(f"Output file not found. Expected {video_path} or {image_path}")
+        print(f"📁 Found {output_type} output at: {output_path}")
         
-        print(f"🔍 Found {len(all_mp4_files)} MP4 files in media directory:")
-        for mp4_file in all_mp4_files:
-            print(f"  - {mp4_file}")
-            
-        print(f"🔍 Found {len(all_png_files)} PNG files in media directory:")
-        for png_file in all_png_files:
-            print(f"  - {png_file}")
-
-        output_path = None
-        output_type = None
+        if output_type == "image":
+            output_path = convert_still_image(output_path, image_format)
         
-        # First try to find MP4 files
-        for path in possible_video_paths:
-            if os.path.exists(path):
-                output_path = path
-                output_type = "video"
-                print(f"📁 Found video output at: {path}")
-                break
-
-        # If no MP4 found, try to find PNG files
-        if output_path is None:
-            for path in possible_image_paths:
-                if os.path.exists(path):
-                    output_path = path
-                    output_type = "image"
-                    print(f"📁 Found image output at: {path}")
-                    break
-
-        # If still not found, try to find any file that might be our output
-        if output_path is None:
-            # Look for MP4 files that contain our scene name
-            for mp4_file in all_mp4_files:
-                if scene_name in mp4_file or (fallback_class_name in mp4_file if 'fallback_class_name' in locals() else False):
-                    output_path = mp4_file
-                    output_type = "video"
-                    print(f"📁 Found video by name match: {mp4_file}")
-                    break
-            
-            # If still no match, use the first MP4 file in the main output directory (exclude partial_movie_files)
-            if output_path is None:
-                main_mp4_files = [f for f in all_mp4_files if 'partial_movie_files' not in f]
-                if main_mp4_files:
-                    output_path = main_mp4_files[0]
-                    output_type = "video"
-                    print(f"📁 Using first available MP4 file: {output_path}")
-            
-            # Look for PNG files that contain our scene name
-            if output_path is None:
-                for png_file in all_png_files:
-                    if scene_name in png_file or (fallback_class_name in png_file if 'fallback_class_name' in locals() else False):
-                        output_path = png_file
-                        output_type = "image"
-                        print(f"📁 Found image by name match: {png_file}")
-                        break
-            
-            # If still no match, use the first PNG file
-            if output_path is None and all_png_files:
-                output_path = all_png_files[0]
-                output_type = "image"
-                print(f"📁 Using first available PNG file: {output_path}")
-
-        if output_path is None:
-            raise Exception(f"Output file not found. Tried video paths: {possible_video_paths}. Tried image paths: {possible_image_paths}. Available MP4 files: {all_mp4_files}. Available PNG files: {all_png_files}")
+        faststart_start = time.time()
+        if output_type == "video" and request_body.get("faststart", True):
+            faststart_path = workspace_output_path(workspace, f"{output_name}_faststart", "mp4")
+            run_ffmpeg(build_faststart_command(output_path, faststart_path))
+            os.replace(faststart_path, output_path)
+        faststart_seconds = round(time.time() - faststart_start, 4)
+        
+        # Encode the rendition ladder (and HLS) from the master in one parallel pass
+        rendition_output = {"renditions": [], "artifacts": {}, "seconds": 0.0}
+        if output_type == "video" and renditions:
+            report_progress(phase="encoding_renditions")
+            rendition_output = encode_renditions(
+                output_path,
+                os.path.join(workspace, RENDER_OUTPUT_DIR),
+                resolve_renditions(renditions, width, height),
+                hls=hls
+            )
+            print(f"🎞️ Encoded {len(rendition_output['renditions'])} renditions in {rendition_output['seconds']}s")
+        
+        # Library previews are best effort: a failed extraction doesn't fail the render
+        preview_output = {"artifacts": {}, "seconds": 0.0}
+        previews = None
+        preview_target = upload_resumable or any(name.startswith(f"{PREVIEWS_DIR}/") for name in artifact_upload_urls or {})
+        if output_type == "video" and request_body.get("previews", True) and not preview_target:
+            previews = {"skipped": "no artifact upload target"}
+        elif output_type == "video" and request_body.get("previews", True):
+            report_progress(phase="extracting_previews")
+            try:
+                preview_output = extract_previews(output_path, os.path.join(workspace, RENDER_OUTPUT_DIR), width, height)
+                previews = {key: preview_output[key] for key in ("poster", "thumbnails", "sprite", "vtt", "layout")}
+                print(f"🖼️ Extracted poster, {len(previews['thumbnails'])} thumbnails and sprite sheet in {preview_output['seconds']}s")
+            except Exception as e:
+                print(f"⚠️ Preview extraction failed: {e}")
+        artifacts = {**rendition_output["artifacts"], **preview_output["artifacts"]}
+        
+        # Of two hedged renders, only the first to get here uploads
+        if claim_output and not claim_output():
+            print("🏁 The other hedged render finished first; skipping upload")
+            return {"success": False, "superseded": True, "error": "Superseded by the other hedged render"}
         
-        # Upload to Supabase if URL provided
-        if upload_url:
+        # Upload to Supabase if a signed URL or a resumable upload config was provided
+        upload_start = time.time()
+        upload = None
+        if upload_url or upload_resumable:
             print(f"☁️ Uploading to Supabase...")
-            with open(output_path, "rb") as f:
-                # Get file size for Content-Length header
-                f.seek(0, 2)  # Seek to end
-                file_size = f.tell()
-                f.seek(0)  # Seek back to beginning
-                
-                # Set appropriate content type based on output type
-                if output_type == "video":
-                    content_type = 'video/mp4'
-                elif output_type == "image":
-                    content_type = 'image/png'
-                else:
-                    content_type = 'application/octet-stream'
-                
-                # Upload with proper headers
-                headers = {
-                    'Content-Type': content_type,
-                    'Content-Length': str(file_size)
-                }
-                
-                response = requests.put(upload_url, data=f, headers=headers)
-                response.raise_for_status()
-            print(f"✅ Upload completed successfully ({output_type})")
+            report_progress(phase="uploading")
+            content_type = ARTIFACT_CONTENT_TYPES.get(Path(output_path).suffix) or OUTPUT_CONTENT_TYPES.get(output_type, 'application/octet-stream')
+            upload = upload_file(output_path, content_type, upload_url=upload_url, resumable=upload_resumable)
+            print(f"✅ Upload completed successfully ({output_type}, {upload['method']}, {upload['bytes']} bytes in {upload['seconds']}s)")
+        
+        artifact_uploads = {}
+        if artifacts and (artifact_upload_urls or upload_resumable):
+            artifact_uploads = upload_artifacts(artifacts, artifact_upload_urls, upload_resumable)
+            print(f"✅ Uploaded {sum(1 for u in artifact_uploads.values() if u)} of {len(artifact_uploads)} artifacts")
+        
+        timing_profile["totals"]["upload"] = round(time.time() - upload_start, 4)
+        timing_profile["totals"]["renditions"] = rendition_output["seconds"]
+        timing_profile["totals"]["previews"] = preview_output["seconds"]
+        timing_profile["totals"]["faststart"] = faststart_seconds
+        timing_profile["totals"]["tts_prefetch"] = voiceover_prefetch["seconds"]
+        # preflight_latex and preflight_tts are the parts of the preflight that the render itself then skipped
+        for total, field in (("preflight", "seconds"), ("preflight_latex", "latex"), ("preflight_tts", "tts")):
+            timing_profile["totals"][total] = (preflight or {}).get(field, 0.0) + (fallback_preflight or {}).get(field, 0.0)
+        
+        # Keep what a later edit of this scene can reuse; losing it only costs the next render time
+        if caching and keep_render_state and output_type == "video":
+            try:
+                render_state = save_render_state(workspace, render_id, {
+                    "scene_name": scene_name, "width": width, "height": height, "fps": profile['fps'],
+                })
+                commit_render_cache()
+                timing_profile["totals"]["render_state"] = render_state["seconds"]
+                print(f"♻️ Stored {render_state['files']} files for incremental renders of {render_id}")
+            except Exception as e:
+                print(f"⚠️ Could not store render state: {str(e)}")
+        
+        if incremental and incremental["found"]:
+            incremental["reused"] = [animation["index"] for animation in timing_profile["animations"] if animation.get("cached")]
+            incremental["rendered"] = [animation["index"] for animation in timing_profile["animations"] if not animation.get("cached")]
+            print(f"♻️ Reused {len(incremental['reused'])} animations, rendered {len(incremental['rendered'])}")
         
         return {
             "success": True,
             "logs": result.stdout,
             "stderr": result.stderr,
+            "log": publish_log(),
             "output_path": output_path,
-            "output_type": output_type
+            "output_type": output_type,
+            "still": bool(still),
+            "upload": upload,
+            "progressive": progressive_summary,
+            "renditions": [
+                {key: rendition[key] for key in ("name", "width", "height", "video_kbps", "audio_kbps", "path", "bytes")}
+                for rendition in rendition_output["renditions"]
+            ],
+            "artifacts": {
+                name: {"path": path, "upload": artifact_uploads.get(name)}
+                for name, path in artifacts.items()
+            },
+            "previews": previews,
+            "incremental": incremental,
+            "render_state": render_state,
+            "fallback_changes": fallback_changes,
+            "resources": resource_usage,
+            "degraded": degradations,
+            "voiceover_prefetch": voiceover_prefetch,
+            "timing_profile": timing_profile
         }
         
     except Exception as e:
@@ -1053,7 +3079,838 @@ def render_manim(request_body: dict) -> dict:
         return {
             "success": False,
             "error": error_msg,
+            "capacity_exceeded": e.reason if isinstance(e, RenderCapacityExceeded) else None,
             "logs": getattr(result, 'stdout', ''),
-            "stderr": getattr(result, 'stderr', error_msg)
+            "stderr": getattr(result, 'stderr', error_msg),
+            "log": publish_log(),
+            "resources": resource_usage,
+            "degraded": degradations
+        }
+    
+    finally:
+        if not keep_workspace:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+def build_shared_assets(request_body: dict, assets_dir: str) -> dict:
+    """Synthesize a scene's voiceovers and compile its TeX once, into assets_dir, for a batch of targets.
+
+    The preflight skips animations but still constructs every MathTex and enters every voiceover block,
+    so it compiles all TeX and fills in any narration the static prefetch could not see.
+    """
+    start = time.time()
+    workspace = create_render_workspace(f"assets-{uuid.uuid4().hex[:8]}")
+    try:
+        code = sanitize_unicode(request_body.get("code", ""))
+        with open(os.path.join(workspace, "scene.py"), "w", encoding='utf-8') as f:
+            f.write(code)
+        tree = parse_scene(code)
+        scene_name = request_body.get("scene_name", "GeneratedScene")
+        if tree is not None:
+            scene_name = find_scene_class(tree, scene_name) or scene_name
+
+        voiceover_prefetch = prefetch_voiceovers(code, Path(workspace) / "media" / "voiceovers", tree)
+        preflight = run_preflight(workspace, "scene.py", scene_name)
+        shared_files = copy_shared_assets(os.path.join(workspace, "media"), assets_dir)
+        print(f"📦 Published {shared_files} shared TeX/voiceover files to {assets_dir}")
+        return {
+            "files": shared_files,
+            "voiceover_prefetch": voiceover_prefetch,
+            "preflight": preflight,
+            "seconds": round(time.time() - start, 2),
+        }
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+# Renders use isolated workspaces, so one container can take several inputs at once
+RENDER_CONCURRENT_INPUTS = 2
+# The routing endpoint only waits on tier functions, so it can hold many requests
+ROUTER_CONCURRENT_INPUTS = 50
+
+# Minimum seconds between progress writes to the job record
+JOB_PROGRESS_INTERVAL = 1.0
+
+def notify_webhook(webhook_url: str, payload: dict, attempts: int = 3):
+    """POST a job record to the client's completion webhook, retrying with backoff."""
+    for attempt in range(1, attempts + 1):
+        try:
+            response = requests.post(webhook_url, json=payload, timeout=10)
+            response.raise_for_status()
+            print(f"📣 Webhook delivered: {webhook_url}")
+            return
+        except Exception as e:
+            print(f"⚠️ Webhook attempt {attempt}/{attempts} failed: {str(e)}")
+            if attempt < attempts:
+                time.sleep(2 ** attempt)
+
+def claim_hedge_output(hedge_id: str, variant: str) -> bool:
+    """Claim the upload for one render of a hedged pair; True if this variant got there first."""
+    return render_hedges.put(hedge_id, variant, skip_if_exists=True) or render_hedges.get(hedge_id) == variant
+
+def run_hedged_pipeline(request_body: dict, tier: str, on_progress=None, job_id: str = None, render_timeout: int = 1200) -> dict:
+    """Render a scene, hedging risky ones with a parallel fallback render on a second container.
+
+    In hedged mode ("hedge": true), with risk signals (see hedge_risk_signals) and an upload target,
+    the fallback scene renders on a hedge container while the original renders here. The first
+    successful render uploads and the other is cancelled. Otherwise this is run_render_pipeline with its sequential fallback.
+    """
+    job_id = job_id or uuid.uuid4().hex
+    has_upload_target = request_body.get("upload_url") or request_body.get("upload_resumable")
+    signals = []
+    if request_body.get("hedge", False) and has_upload_target:
+        signals = hedge_risk_signals(sanitize_unicode(request_body.get("code", "")))
+    if not signals:
+        return run_render_pipeline(
+            request_body, on_progress=on_progress, job_id=job_id, render_timeout=render_timeout,
+            container_memory_mb=render_memory_budget(tier)
+        )
+
+    print(f"🪁 Hedging with a parallel fallback render ({'; '.join(signals)})")
+    # Live segments and the job log belong to the render running here
+    hedge_body = {key: value for key, value in request_body.items() if key not in ("progressive", "log_upload_url")}
+    hedge_call = hedge_renderer(tier).render_fallback.spawn(hedge_body, job_id)
+    cancel_event = threading.Event()
+    hedge_outcome = {}
+
+    def watch_hedge():
+        try:
+            hedge_outcome["result"] = hedge_call.get(timeout=RENDER_TIERS[tier]['timeout'])
+        except Exception as e:
+            hedge_outcome["result"] = {"success": False, "error": f"Fallback render did not finish: {str(e)}"}
+        if hedge_outcome["result"].get("success"):
+            cancel_event.set()
+
+    watcher = threading.Thread(target=watch_hedge, daemon=True)
+    watcher.start()
+    try:
+        original = run_render_pipeline(
+            request_body, on_progress=on_progress, job_id=job_id, render_timeout=render_timeout,
+            scene_variant="original_only", claim_output=lambda: claim_hedge_output(job_id, "original"),
+            cancel_event=cancel_event, container_memory_mb=render_memory_budget(tier)
+        )
+        if original.get("success"):
+            hedge_call.cancel()
+        elif not cancel_event.is_set() and not classify_render_error(original.get("error", ""))[0]:
+            # Errors the fallback can't fix (syntax, imports, names) fail the hedge too
+            hedge_call.cancel()
+        watcher.join()
+    finally:
+        render_hedges.pop(job_id, None)
+
+    fallback = hedge_outcome["result"]
+    winner = "original" if original.get("success") else "fallback" if fallback.get("success") else None
+    result = fallback if winner == "fallback" else original
+    result["hedge"] = {
+        "signals": signals,
+        "winner": winner,
+        "original_error": None if original.get("success") else original.get("error"),
+        "fallback_error": None if fallback.get("success") else fallback.get("error"),
+    }
+    print(f"🏁 Hedged render finished: {winner or 'both renders failed'}")
+    return result
+
+def run_render_job(job_id: str, request_body: dict, render_timeout: int, container: dict = None, tier: str = DEFAULT_RENDER_TIER) -> dict:
+    """Run a submitted render, keeping its job record up to date."""
+    job = render_jobs[job_id]
+    job.update(status="running", started_at=time.time())
+    render_jobs[job_id] = job
+    last_write = 0.0
+    # stdout and stderr are parsed on separate threads
+    lock = threading.Lock()
+
+    def on_progress(updates):
+        nonlocal last_write
+        with lock:
+            job["progress"].update(updates)
+            # Phase changes are always written, frame updates are throttled
+            now = time.time()
+            if "animation" not in updates or now - last_write >= JOB_PROGRESS_INTERVAL:
+                last_write = now
+                render_jobs[job_id] = job
+
+    try:
+        result = run_hedged_pipeline(request_body, tier, on_progress=on_progress, job_id=job_id, render_timeout=render_timeout)
+    except Exception as e:
+        result = {"success": False, "error": str(e)}
+    if container:
+        result["container"] = container
+
+    # Outgrew the estimated tier: queue again for the next one (a tier pinned in the request stays)
+    bigger_tier = next_render_tier(tier) if result.get("capacity_exceeded") and not request_body.get("tier") else None
+    if bigger_tier and job.get("lane"):
+        print(f"⤴️ {result['error']}; rerouting job {job_id} from the {tier} to the {bigger_tier} tier")
+        job.update(
+            status="queued",
+            started_at=None,
+            progress={"phase": "rerouted"},
+            estimate={**job["estimate"], "tier": bigger_tier},
+            reroutes=job.get("reroutes", []) + [{"tier": tier, "error": result["error"]}],
+        )
+        render_jobs[job_id] = job
+        scheduler_events.put({"type": "finished", "job_id": job_id})
+        submit_to_scheduler(job)
+        return result
+
+    job.update(
+        status="succeeded" if result.get("success") else "failed",
+        finished_at=time.time(),
+        result=result,
+    )
+    job["progress"]["phase"] = "done"
+    render_jobs[job_id] = job
+
+    if job.get("lane"):
+        scheduler_events.put({"type": "finished", "job_id": job_id})
+        schedule_renders.spawn()
+
+    webhook_urls = [job["webhook_url"]] if job.get("webhook_url") else []
+    if job.get("cache_key"):
+        webhook_urls += finish_inflight_render(job["cache_key"], job_id, result)
+    # The stored request can carry API keys; webhooks only get the job's outcome
+    payload = {key: value for key, value in job.items() if key != "request_body"}
+    for webhook_url in dict.fromkeys(webhook_urls):
+        notify_webhook(webhook_url, payload)
+    return result
+
+def finish_inflight_render(cache_key: str, job_id: str, result: dict) -> list[str]:
+    """Index a finished render's result and release its in-flight claim; returns coalesced requests' webhooks.
+
+    Only uploaded results are indexed, since a workspace-only output is gone once the job ends.
+    The result is stored before the claim is released so an identical request always finds one of them.
+    """
+    if result.get("success") and result.get("upload"):
+        render_results[cache_key] = {
+            **{key: value for key, value in result.items() if key not in ("logs", "stderr")},
+            "job_id": job_id,
+            "cached_at": time.time(),
+        }
+    entry = render_inflight.get(cache_key)
+    if entry and entry["job_id"] == job_id:
+        render_inflight.pop(cache_key, None)
+    # Registrations are few and short-lived (removed here), so scanning the keys stays cheap
+    prefix = f"{job_id}:"
+    return [
+        webhook_url for webhook_url in (
+            render_webhooks.pop(key, None) for key in list(render_webhooks.keys()) if key.startswith(prefix)
+        ) if webhook_url
+    ]
+
+def container_boot_id():
+    """The kernel's boot id, new in every container (including one restored from a snapshot), or None."""
+    try:
+        with open("/proc/sys/kernel/random/boot_id") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+@app.cls(
+    image=image,
+    timeout=RENDER_TIERS[DEFAULT_RENDER_TIER]['timeout'],
+    cpu=RENDER_TIERS[DEFAULT_RENDER_TIER]['cpu'],
+    memory=RENDER_TIERS[DEFAULT_RENDER_TIER]['memory'],
+    enable_memory_snapshot=True,
+    volumes={RENDER_CACHE_MOUNT: render_cache},
+)
+@modal.concurrent(max_inputs=RENDER_CONCURRENT_INPUTS)
+class ManimRenderer:
+    """Render container. Tiers are this class with the tier's resources applied (see tier_renderer)."""
+
+    tier: str = modal.parameter(default=DEFAULT_RENDER_TIER)
+
+    @modal.enter(snap=True)
+    def preload(self):
+        """Prime what renders reuse; everything this leaves in memory and on the filesystem is in the snapshot.
+
+        Manim itself runs in subprocesses, so only the libraries used in this process are imported:
+        the voiceover prefetch's OpenAI service and PIL for still images. The warm-up render leaves the
+        caches those subprocesses read (fontconfig, TeX fonts and formats, bytecode) on disk.
+        """
+        start = time.time()
+        from manim_voiceover.services.openai import OpenAIService  # noqa: F401
+        from PIL import Image  # noqa: F401
+        self.import_seconds = round(time.time() - start, 2)
+        self.warm_up = warm_up_render()
+        self.snapshot_boot_id = container_boot_id()
+
+    @modal.enter(snap=False)
+    def restore(self):
+        # Runs in every container after preload; a container restored from the snapshot has a new kernel boot id
+        boot_id = container_boot_id()
+        self.from_snapshot = None if boot_id is None else boot_id != self.snapshot_boot_id
+        self.inputs_served = 0
+        print(f"🚀 Container ready ({'restored from snapshot' if self.from_snapshot else 'cold boot'}, "
+              f"imports {self.import_seconds}s, warm-up {self.warm_up['seconds']}s)")
+
+    def container_stats(self, dispatched_at: float = None) -> dict:
+        """Start latency for this input: container boot or restore on a cold start, near zero on a warm one."""
+        self.inputs_served += 1
+        return {
+            "tier": self.tier,
+            "warm": self.inputs_served > 1,
+            "from_snapshot": self.from_snapshot,
+            "start_latency_seconds": round(time.time() - dispatched_at, 2) if dispatched_at else None,
+            "import_seconds": self.import_seconds,
+            "warm_up": self.warm_up,
+        }
+
+    @modal.method()
+    def render(self, request_body: dict, job_id: str = None, dispatched_at: float = None) -> dict:
+        """Render inside this tier's container: tracked as a job when job_id is given, otherwise synchronously."""
+        container = self.container_stats(dispatched_at)
+        render_timeout = RENDER_TIERS[self.tier]['render_timeout']
+        print(f"🏷️ Running on the {self.tier} tier ({'warm' if container['warm'] else 'cold'} container)")
+        if job_id:
+            return run_render_job(job_id, request_body, render_timeout, container, self.tier)
+        result = run_hedged_pipeline(request_body, self.tier, render_timeout=render_timeout)
+        bigger_tier = next_render_tier(self.tier) if result.get("capacity_exceeded") and not request_body.get("tier") else None
+        if bigger_tier:
+            print(f"⤴️ {result['error']}; retrying on the {bigger_tier} tier")
+            return tier_renderer(bigger_tier).render.remote(request_body, dispatched_at=time.time())
+        return {**result, "container": container}
+
+    @modal.method()
+    def render_fallback(self, request_body: dict, hedge_id: str) -> dict:
+        """Hedge for a risky render: render only the fallback scene, uploading if it finishes first."""
+        container = self.container_stats()
+        return {
+            **run_render_pipeline(
+                request_body, job_id=f"{hedge_id}-fallback", render_timeout=RENDER_TIERS[self.tier]['render_timeout'],
+                scene_variant="fallback", claim_output=lambda: claim_hedge_output(hedge_id, "fallback"),
+                container_memory_mb=render_memory_budget(self.tier), render_id=hedge_id
+            ),
+            "container": container,
+        }
+
+    @modal.method()
+    def prepare_shared_assets(self, request_body: dict, assets_dir: str) -> dict:
+        """Build a batch's resolution-independent assets once and publish them to the shared Volume."""
+        summary = build_shared_assets(request_body, assets_dir)
+        render_cache.commit()
+        return summary
+
+def tier_renderer(tier: str, max_inputs: int = None):
+    """ManimRenderer instance with the tier's cpu, memory, timeout and concurrency."""
+    limits = RENDER_TIERS[tier]
+    renderer_cls = ManimRenderer.with_options(
+        cpu=limits['cpu'],
+        memory=limits['memory'],
+        timeout=limits['timeout'],
+    ).with_concurrency(max_inputs=max_inputs or limits['concurrent_inputs'])
+    return renderer_cls(tier=tier)
+
+def hedge_renderer(tier: str):
+    """Single-input variant of a tier, so a hedged fallback never shares the original render's container."""
+    return tier_renderer(tier, max_inputs=1)
+
+# Priority lanes, served in priority order (lower first). A lane's limit shrinks by the number of jobs
+# waiting in more urgent lanes (down to min_running), and young preemptible renders can be cancelled
+# and requeued when a more urgent lane is blocked on the global limit.
+RENDER_LANES = {
+    'preview': {
+        'priority': 0,
+        'max_running': 16,
+        'min_running': 16,
+        'max_running_per_tenant': 4,
+        'preemptible': False,
+    },
+    'final': {
+        'priority': 1,
+        'max_running': 12,
+        'min_running': 2,
+        'max_running_per_tenant': 3,
+        'preemptible': True,
+    },
+}
+SCHEDULER_MAX_RUNNING = 20
+# Only renders younger than this are preempted; restarting them wastes little work
+PREEMPT_MAX_RUNNING_SECONDS = 120
+MAX_PREEMPTIONS_PER_JOB = 1
+# Running jobs past their tier timeout plus this grace are considered lost
+SCHEDULER_LOST_JOB_GRACE = 300
+RECENT_WAITS_KEPT = 50
+DEFAULT_TENANT = "anonymous"
+
+def choose_lane(request_body: dict) -> str:
+    """Explicit request_body["lane"], else draft-profile renders are previews and everything else is final."""
+    if request_body.get("lane") in RENDER_LANES:
+        return request_body["lane"]
+    return 'preview' if request_body.get("render_profile") == 'draft' else 'final'
+
+def submit_to_scheduler(job: dict):
+    scheduler_events.put({
+        "type": "submit",
+        "job_id": job["job_id"],
+        "lane": job["lane"],
+        "tenant": job["tenant"],
+        "tier": job["estimate"]["tier"],
+        "submitted_at": job["submitted_at"],
+    })
+    schedule_renders.spawn()
+
+def new_scheduler_state() -> dict:
+    return {
+        "lanes": {name: {"waiting": {}, "tenant_order": [], "running": {}, "recent_waits": []} for name in RENDER_LANES},
+        "updated_at": None,
+    }
+
+def lanes_by_priority() -> list[str]:
+    return sorted(RENDER_LANES, key=lambda name: RENDER_LANES[name]['priority'])
+
+def waiting_count(lane: dict) -> int:
+    return sum(len(queue) for queue in lane["waiting"].values())
+
+def scheduler_enqueue(state: dict, entry: dict, front: bool = False):
+    """Queue a job in its lane under its tenant; front is used to requeue preempted jobs."""
+    lane = state["lanes"][entry["lane"]]
+    queue = lane["waiting"].setdefault(entry["tenant"], [])
+    if any(queued["job_id"] == entry["job_id"] for queued in queue):
+        return
+    queue.insert(0, entry) if front else queue.append(entry)
+    if entry["tenant"] not in lane["tenant_order"]:
+        lane["tenant_order"].append(entry["tenant"])
+
+def scheduler_release(state: dict, job_id: str) -> bool:
+    for lane in state["lanes"].values():
+        if lane["running"].pop(job_id, None) is not None:
+            return True
+    return False
+
+def lane_limit(state: dict, lane_name: str) -> int:
+    """Running limit for a lane, reduced while more urgent lanes have jobs waiting."""
+    limits = RENDER_LANES[lane_name]
+    more_urgent_waiting = sum(
+        waiting_count(state["lanes"][name])
+        for name in RENDER_LANES if RENDER_LANES[name]['priority'] < limits['priority']
+    )
+    return max(limits['min_running'], limits['max_running'] - more_urgent_waiting)
+
+def next_fair_entry(lane: dict, max_running_per_tenant: int):
+    """Round-robin across tenants with waiting jobs, skipping tenants at their running cap (DEFAULT_TENANT has none)."""
+    running_by_tenant = {}
+    for running in lane["running"].values():
+        running_by_tenant[running["tenant"]] = running_by_tenant.get(running["tenant"], 0) + 1
+    lane["tenant_order"] = [tenant for tenant in lane["tenant_order"] if lane["waiting"].get(tenant)]
+    for _ in range(len(lane["tenant_order"])):
+        tenant = lane["tenant_order"].pop(0)
+        lane["tenant_order"].append(tenant)
+        # Requests without a tenant_id all share DEFAULT_TENANT; capping it would cap all unattributed traffic
+        if tenant == DEFAULT_TENANT or running_by_tenant.get(tenant, 0) < max_running_per_tenant:
+            entry = lane["waiting"][tenant].pop(0)
+            if not lane["waiting"][tenant]:
+                del lane["waiting"][tenant]
+            return entry
+    return None
+
+def preemption_victim(state: dict, lane_name: str, now: float):
+    """Youngest running job in a less urgent, preemptible lane that is still cheap to restart."""
+    candidates = [
+        (running["dispatched_at"], job_id, name)
+        for name in RENDER_LANES
+        if RENDER_LANES[name]['preemptible'] and RENDER_LANES[name]['priority'] > RENDER_LANES[lane_name]['priority']
+        for job_id, running in state["lanes"][name]["running"].items()
+        if now - running["dispatched_at"] < PREEMPT_MAX_RUNNING_SECONDS
+        and running.get("preemptions", 0) < MAX_PREEMPTIONS_PER_JOB
+    ]
+    if not candidates:
+        return None
+    _, job_id, name = max(candidates)
+    return job_id, name
+
+def scheduler_plan(state: dict, now: float) -> tuple[list, list]:
+    """Decide which queued jobs to dispatch and which running jobs to preempt, updating state.
+
+    Returns (dispatches, preemptions): running entries to start, and running entries to cancel and requeue.
+    """
+    dispatches, preemptions = [], []
+    total_running = sum(len(lane["running"]) for lane in state["lanes"].values())
+    for lane_name in lanes_by_priority():
+        lane = state["lanes"][lane_name]
+        limits = RENDER_LANES[lane_name]
+        while waiting_count(lane) and len(lane["running"]) < lane_limit(state, lane_name):
+            if total_running >= SCHEDULER_MAX_RUNNING:
+                victim = preemption_victim(state, lane_name, now)
+                if victim is None:
+                    break
+                job_id, victim_lane = victim
+                running = state["lanes"][victim_lane]["running"].pop(job_id)
+                preemptions.append({**running, "job_id": job_id})
+                scheduler_enqueue(state, {
+                    "job_id": job_id,
+                    "lane": victim_lane,
+                    "tenant": running["tenant"],
+                    "tier": running["tier"],
+                    "submitted_at": running["submitted_at"],
+                    "preemptions": running.get("preemptions", 0) + 1,
+                }, front=True)
+                total_running -= 1
+                continue
+
+            entry = next_fair_entry(lane, limits['max_running_per_tenant'])
+            if entry is None:
+                break
+            running = {
+                "tenant": entry["tenant"],
+                "tier": entry["tier"],
+                "submitted_at": entry["submitted_at"],
+                "dispatched_at": now,
+                "preemptions": entry.get("preemptions", 0),
+                "call_id": None,
+            }
+            lane["running"][entry["job_id"]] = running
+            lane["recent_waits"] = (lane["recent_waits"] + [round(now - entry["submitted_at"], 2)])[-RECENT_WAITS_KEPT:]
+            dispatches.append({**running, "job_id": entry["job_id"], "lane": lane_name})
+            total_running += 1
+    return dispatches, preemptions
+
+def lane_stats(state: dict, lane_name: str, now: float) -> dict:
+    """Queue depth, running count, limit and wait times for one lane."""
+    lane = state["lanes"][lane_name]
+    tenants = {}
+    for tenant, queue in lane["waiting"].items():
+        tenants.setdefault(tenant, {"queued": 0, "running": 0})["queued"] = len(queue)
+    for running in lane["running"].values():
+        tenants.setdefault(running["tenant"], {"queued": 0, "running": 0})["running"] += 1
+    queued_since = [entry["submitted_at"] for queue in lane["waiting"].values() for entry in queue]
+    recent_waits = lane["recent_waits"]
+    return {
+        "queued": len(queued_since),
+        "running": len(lane["running"]),
+        "limit": lane_limit(state, lane_name),
+        "oldest_wait_seconds": round(now - min(queued_since), 2) if queued_since else 0.0,
+        "recent_wait_seconds_avg": round(sum(recent_waits) / len(recent_waits), 2) if recent_waits else 0.0,
+        "recent_wait_seconds_max": max(recent_waits, default=0.0),
+        "tenants": tenants,
+    }
+
+# Seconds between job record polls while waiting on a render
+JOB_POLL_INTERVAL = 2.0
+
+def start_render_job(request_body: dict, estimate: dict) -> dict:
+    """Start a render job, join the identical one already in flight, or return the cached result.
+
+    Identical means the same render_cache_key, which includes the upload targets: a request with fresh
+    signed URLs renders and uploads to them, while a retry of the same request reuses the first result.
+    Send "use_cache": false to always render afresh.
+    New jobs go to the scheduler, which dispatches them by lane. Returns {"job_id", "cache_key", "coalesced", "cached_result"}.
+    """
+    use_cache = request_body.get("use_cache", True)
+    cache_key = render_cache_key(request_body)
+    outcome = {"job_id": None, "cache_key": cache_key, "coalesced": False, "cached_result": None}
+
+    if use_cache:
+        cached = render_results.get(cache_key)
+        if cached is not None:
+            print(f"♻️ Render {cache_key[:12]} already finished in job {cached['job_id']}")
+            outcome.update(job_id=cached["job_id"], cached_result=cached)
+            return outcome
+
+    job_id = uuid.uuid4().hex
+    if use_cache:
+        # Atomic claim: only one request per render key starts a job
+        claim = {"job_id": job_id}
+        if not render_inflight.put(cache_key, claim, skip_if_exists=True):
+            entry = render_inflight.get(cache_key)
+            existing_job = render_jobs.get(entry["job_id"]) if entry else None
+            if existing_job and existing_job["status"] in ("queued", "running"):
+                if request_body.get("webhook_url"):
+                    registration = f"{entry['job_id']}:{uuid.uuid4().hex}"
+                    render_webhooks[registration] = request_body["webhook_url"]
+                    # The job may have finished (and collected its webhooks) in between; then deliver it here
+                    finished_job = render_jobs.get(entry["job_id"])
+                    if finished_job["status"] not in ("queued", "running") and render_webhooks.pop(registration, None):
+                        notify_webhook(request_body["webhook_url"], {key: value for key, value in finished_job.items() if key != "request_body"})
+                print(f"🔗 Coalesced onto in-flight job {entry['job_id']}")
+                outcome.update(job_id=entry["job_id"], coalesced=True)
+                return outcome
+            # The claim belongs to a job that ended without releasing it
+            render_inflight[cache_key] = claim
+
+    render_jobs[job_id] = {
+        "job_id": job_id,
+        "status": "queued",
+        "submitted_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+        "progress": {"phase": "queued"},
+        "webhook_url": request_body.get("webhook_url"),
+        "estimate": estimate,
+        "cache_key": cache_key if use_cache else None,
+        "lane": choose_lane(request_body),
+        "tenant": str(request_body.get("tenant_id") or DEFAULT_TENANT),
+        "request_body": request_body,
+        "result": None,
+    }
+    submit_to_scheduler(render_jobs[job_id])
+    outcome["job_id"] = job_id
+    print(f"📨 Queued render job {job_id} (estimated {estimate['estimated_seconds']}s on the {estimate['tier']} tier)")
+    return outcome
+
+def wait_for_job(job_id: str, timeout: float = RENDER_TIERS['large']['timeout']) -> dict:
+    """Block until a job finishes and return its result."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = render_jobs.get(job_id)
+        if job is None:
+            return {"success": False, "error": f"Job {job_id} disappeared"}
+        if job["status"] in ("succeeded", "failed"):
+            return job["result"]
+        time.sleep(JOB_POLL_INTERVAL)
+    return {"success": False, "error": f"Timed out waiting for job {job_id}"}
+
+@app.function(image=api_image, timeout=RENDER_TIERS['large']['timeout'])
+@modal.concurrent(max_inputs=ROUTER_CONCURRENT_INPUTS)
+@modal.fastapi_endpoint(method="POST")
+def render_manim(request_body: dict) -> dict:
+    """Render Manim animation and optionally upload to Supabase.
+
+    The scene is routed to a container tier by its estimated cost; the estimate is returned with the result.
+    """
+    if not request_body.get("code"):
+        return {
+            "success": False,
+            "error": "No code provided in request body"
+        }
+
+    estimate = route_render(request_body)
+    print(f"🧮 Estimated {estimate['estimated_seconds']}s, routing to the {estimate['tier']} tier")
+    job = start_render_job(request_body, estimate)
+    if job["cached_result"] is not None:
+        return {**job["cached_result"], "cached": True, "estimate": estimate}
+
+    result = wait_for_job(job["job_id"])
+    return {**result, "job_id": job["job_id"], "cached": False, "coalesced": job["coalesced"], "estimate": estimate}
+
+# Per-target fields a batch target may set; everything else comes from the batch body
+BATCH_TARGET_FIELDS = (
+    "resolution", "aspect_ratio", "style", "upload_url", "upload_resumable",
+    "artifact_upload_urls", "log_upload_url", "renditions", "hls", "tier", "image_format",
+)
+
+@app.function(image=api_image, timeout=RENDER_TIERS['large']['timeout'])
+@modal.concurrent(max_inputs=ROUTER_CONCURRENT_INPUTS)
+@modal.fastapi_endpoint(method="POST")
+def render_batch(request_body: dict) -> dict:
+    """Render one scene for several targets, e.g. 16:9, 9:16 and 1:1 social cuts.
+
+    Body: the render_manim fields plus "targets", a list of {"resolution", "aspect_ratio", "style", upload fields}.
+    TeX and voiceovers are built once and shared through the Volume; targets then go to the scheduler as
+    separate render jobs, which run in parallel containers.
+    Returns one result per target, in order.
+    """
+    targets = request_body.get("targets") or []
+    if not request_body.get("code") or not targets:
+        return {
+            "success": False,
+            "error": "A batch needs code and at least one target"
+        }
+
+    batch_id = uuid.uuid4().hex
+    assets_path = f"{BATCH_ASSETS_DIR}/{batch_id}"
+    assets_dir = f"{RENDER_CACHE_MOUNT}/{assets_path}"
+    shared = {key: value for key, value in request_body.items() if key not in ("targets", *BATCH_TARGET_FIELDS)}
+
+    try:
+        print(f"📦 Building shared assets for batch {batch_id} ({len(targets)} targets)")
+        try:
+            shared_assets = tier_renderer(DEFAULT_RENDER_TIER).prepare_shared_assets.remote(shared, assets_dir)
+        except Exception as e:
+            # Targets can still render on their own, just without the shared head start
+            print(f"⚠️ Shared assets failed, rendering targets independently: {str(e)}")
+            shared_assets = {"error": str(e)}
+
+        calls = []
+        for target in targets:
+            target_body = {
+                **shared,
+                **{key: value for key, value in target.items() if key in BATCH_TARGET_FIELDS},
+            }
+            if "error" not in shared_assets:
+                target_body["shared_assets_dir"] = assets_dir
+                # A successful batch preflight already vetted the code for every target
+                target_body["preflight"] = request_body.get("preflight", True) and not shared_assets["preflight"]["success"]
+            estimate = route_render(target_body)
+            # Targets are ordinary render jobs, so the scheduler's lane and tenant limits cover them too
+            calls.append((target, estimate, start_render_job(target_body, estimate)))
+        print(f"🚀 Queued {len(calls)} targets")
+
+        results = []
+        for target, estimate, job in calls:
+            if job["cached_result"] is not None:
+                result = {**job["cached_result"], "cached": True}
+            else:
+                result = {**wait_for_job(job["job_id"]), "cached": False, "coalesced": job["coalesced"]}
+            results.append({"target": target, **result, "job_id": job["job_id"], "estimate": estimate})
+    finally:
+        try:
+            render_cache.remove_file(assets_path, recursive=True)
+        except Exception as e:
+            print(f"⚠️ Could not remove batch assets {assets_path}: {str(e)}")
+
+    return {
+        "success": all(result.get("success") for result in results),
+        "batch_id": batch_id,
+        "shared_assets": shared_assets,
+        "results": results,
+    }
+
+def reconcile_running(state: dict, now: float):
+    """Release running slots whose jobs finished without an event or were lost with their container."""
+    for lane in state["lanes"].values():
+        for job_id, running in list(lane["running"].items()):
+            job = render_jobs.get(job_id)
+            if job is None or job["status"] in ("succeeded", "failed"):
+                lane["running"].pop(job_id)
+            elif now > running["dispatched_at"] + RENDER_TIERS[running["tier"]]['timeout'] + SCHEDULER_LOST_JOB_GRACE:
+                lane["running"].pop(job_id)
+                job.update(status="failed", finished_at=now, result={"success": False, "error": "Render container was lost"})
+                render_jobs[job_id] = job
+
+@app.function(image=api_image, max_containers=1, scaledown_window=300, schedule=modal.Period(minutes=1))
+def schedule_renders():
+    """Scheduler tick: apply queued submit/finish events, then dispatch and preempt by lane.
+
+    Spawned on every event; the one-minute schedule only reconciles lost jobs. A single container runs
+    one tick at a time, so it is the only writer of the scheduler state.
+    """
+    state = scheduler_state.get("state") or new_scheduler_state()
+    now = time.time()
+
+    while True:
+        events = scheduler_events.get_many(100, block=False)
+        if not events:
+            break
+        for event in events:
+            if event["type"] == "submit":
+                scheduler_enqueue(state, event)
+            elif event["type"] == "finished":
+                scheduler_release(state, event["job_id"])
+
+    reconcile_running(state, now)
+    dispatches, preemptions = scheduler_plan(state, now)
+
+    for preempted in preemptions:
+        print(f"⏸️ Preempting {preempted['job_id']} for more urgent work")
+        if preempted.get("call_id"):
+            try:
+                modal.FunctionCall.from_id(preempted["call_id"]).cancel()
+            except Exception as e:
+                print(f"⚠️ Could not cancel {preempted['job_id']}: {str(e)}")
+        job = render_jobs.get(preempted["job_id"])
+        if job:
+            job.update(status="queued", started_at=None, progress={"phase": "preempted"})
+            render_jobs[preempted["job_id"]] = job
+
+    for dispatch in dispatches:
+        job = render_jobs.get(dispatch["job_id"])
+        if job is None or job["status"] != "queued":
+            scheduler_release(state, dispatch["job_id"])
+            continue
+        job.update(dispatched_at=now, wait_seconds=round(now - dispatch["submitted_at"], 2))
+        render_jobs[dispatch["job_id"]] = job
+        call = tier_renderer(dispatch["tier"]).render.spawn(job["request_body"], job_id=dispatch["job_id"], dispatched_at=now)
+        state["lanes"][dispatch["lane"]]["running"][dispatch["job_id"]]["call_id"] = call.object_id
+        print(f"🚦 Dispatched {dispatch['job_id']} ({dispatch['lane']} lane, tenant {dispatch['tenant']}, waited {job['wait_seconds']}s)")
+
+    state["updated_at"] = now
+    scheduler_state["state"] = state
+
+@app.function(image=api_image, volumes={RENDER_CACHE_MOUNT: render_cache}, schedule=modal.Period(hours=1))
+def expire_render_states():
+    """Remove stored render states past RENDER_STATE_TTL_HOURS from the render cache Volume."""
+    render_cache.reload()
+    removed = prune_render_states(RENDER_CACHE_MOUNT)
+    render_cache.commit()
+    print(f"🧹 Removed {removed} expired render states")
+
+@app.function(image=api_image)
+@modal.fastapi_endpoint(method="GET")
+def scheduler_stats() -> dict:
+    """Per-lane queue depth, running jobs, current limit and wait times."""
+    state = scheduler_state.get("state") or new_scheduler_state()
+    now = time.time()
+    return {
+        "success": True,
+        "updated_at": state["updated_at"],
+        "max_running": SCHEDULER_MAX_RUNNING,
+        "lanes": {name: lane_stats(state, name, now) for name in lanes_by_priority()},
+    }
+
+@app.function(image=api_image)
+@modal.fastapi_endpoint(method="POST")
+def submit_render(request_body: dict) -> dict:
+    """Submit a render job and return its id immediately.
+
+    Accepts the same body as render_manim plus an optional webhook_url that is
+    POSTed the final job record when the render finishes. Identical submissions
+    share one job, and an identical finished render is returned as cached.
+    """
+    if not request_body.get("code"):
+        return {
+            "success": False,
+            "error": "No code provided in request body"
+        }
+
+    estimate = route_render(request_body)
+    job = start_render_job(request_body, estimate)
+    if job["cached_result"] is not None:
+        return {
+            "success": True,
+            "job_id": job["job_id"],
+            "status": "succeeded",
+            "cached": True,
+            "result": job["cached_result"],
+            "estimate": estimate
+        }
+
+    return {
+        "success": True,
+        "job_id": job["job_id"],
+        "status": "queued",
+        "cached": False,
+        "coalesced": job["coalesced"],
+        "estimate": estimate
+    }
+
+@app.function(image=api_image)
+@modal.fastapi_endpoint(method="GET")
+def render_status(job_id: str) -> dict:
+    """Report a render job's status and live progress."""
+    job = render_jobs.get(job_id)
+    if job is None:
+        return {
+            "success": False,
+            "error": f"Unknown job id: {job_id}"
+        }
+
+    return {
+        "success": True,
+        "job_id": job_id,
+        "status": job["status"],
+        "progress": job["progress"],
+        "estimate": job.get("estimate"),
+        "lane": job.get("lane"),
+        "wait_seconds": job.get("wait_seconds"),
+        "submitted_at": job["submitted_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+    }
+
+@app.function(image=api_image)
+@modal.fastapi_endpoint(method="GET")
+def render_result(job_id: str) -> dict:
+    """Return a finished render job's result."""
+    job = render_jobs.get(job_id)
+    if job is None:
+        return {
+            "success": False,
+            "error": f"Unknown job id: {job_id}"
+        }
+
+    if job["status"] not in ("succeeded", "failed"):
+        return {
+            "success": False,
+            "job_id": job_id,
+            "status": job["status"],
+            "error": "Render has not finished yet"
         }
 
+    return {"job_id": job_id, "status": job["status"], **job["result"]}
@@ -0,0 +1,222 @@
+"""
+Execution backends for the render pipelines.
+
+ModalBackend calls the deployed Modal functions. LocalBackend runs the same pipelines on a process
+pool on one machine, with the same request and response contracts, for on-prem burst capacity and CI.
+The render cache that a Volume backs on Modal (including the stored state of each render, for
+incremental re-renders) is a plain directory (RENDER_CACHE_DIR) locally.
+
+Serve the local backend over HTTP, with the same POST bodies as the Modal endpoints:
+    python modal_functions/render_backends.py --port 8000 [--workers 8] [--cache-dir /var/cache/manim]
+
+    POST /render_manim     -> render_manim
+    POST /generate_chart   -> generate_chart
+    GET  /health           -> worker and in-flight counts
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_LOCAL_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "manim-render")
+
+class RenderBackend:
+    """Where render_manim and generate_chart run. Both take and return the endpoints' JSON bodies."""
+
+    name = "backend"
+
+    def render_manim(self, request_body: dict) -> dict:
+        raise NotImplementedError
+
+    def generate_chart(self, request_body: dict) -> dict:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class ModalBackend(RenderBackend):
+    """The deployed Modal apps."""
+
+    name = "modal"
+
+    def __init__(self, manim_app: str = "manim-explainer", chart_app: str = "chart-generator"):
+        import modal
+        self.render_function = modal.Function.from_name(manim_app, "render_manim")
+        self.chart_function = modal.Function.from_name(chart_app, "generate_chart")
+
+    def render_manim(self, request_body: dict) -> dict:
+        return self.render_function.remote(request_body)
+
+    def generate_chart(self, request_body: dict) -> dict:
+        return self.chart_function.remote(request_body)
+
+# Worker process setup and entry points; module-level so the process pool can pickle them
+
+def init_worker(cache_dir: str, warm_up: bool):
+    """Point the render cache at the local directory and, like a container's startup hook, prime Manim."""
+    os.environ["RENDER_CACHE_DIR"] = cache_dir
+    if warm_up:
+        from manim_render import warm_up_render
+        summary = warm_up_render()
+        print(f"🚀 Worker {os.getpid()} ready (warm-up {summary['seconds']}s)")
+
+def local_render_manim(request_body: dict, job_id: str, memory_limit_mb: int) -> dict:
+    """render_manim's routing and pipeline in a worker: the tier sets the timeout, the machine share the memory limit.
+
+    A render that times out is retried with the next tier's timeout, as on Modal; memory doesn't grow with the tier here.
+    """
+    from manim_render import RENDER_TIERS, next_render_tier, route_render, run_render_pipeline
+    estimate = route_render(request_body)
+    print(f"🧮 Estimated {estimate['estimated_seconds']}s ({estimate['tier']} tier limits)")
+    tier = estimate['tier']
+    while True:
+        result = run_render_pipeline(
+            request_body,
+            job_id=job_id,
+            render_timeout=RENDER_TIERS[tier]['render_timeout'],
+            memory_limit_mb=memory_limit_mb,
+        )
+        bigger_tier = next_render_tier(tier) if result.get("capacity_exceeded") == "timeout" and not request_body.get("tier") else None
+        if bigger_tier is None:
+            break
+        print(f"⤴️ {result['error']}; retrying with the {bigger_tier} tier timeout")
+        tier = bigger_tier
+    return {**result, "job_id": job_id, "cached": False, "estimate": {**estimate, "tier": tier}}
+
+def local_generate_chart(request_body: dict, data_root: str = None) -> dict:
+    """generate_chart in a worker, with the chart's data file in its own directory under data_root."""
+    from chart_render import run_chart_pipeline
+    data_dir = tempfile.mkdtemp(prefix="chart-data-", dir=data_root)
+    try:
+        return run_chart_pipeline(request_body, data_dir=data_dir)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+def machine_memory_mb() -> int:
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024)
+
+class LocalBackend(RenderBackend):
+    """Process pool on this machine, one render or chart per worker at a time.
+
+    Identical renders in flight are coalesced onto one worker, as on Modal. Each render's memory limit
+    is the worker's share of the machine's memory. Each chart saves its data file in a fresh directory
+    under chart_data_dir (default: the system temp directory), and its code's /mnt/data paths point there.
+    """
+
+    name = "local"
+
+    def __init__(self, workers: int = None, cache_dir: str = DEFAULT_LOCAL_CACHE_DIR, chart_data_dir: str = None, warm_up: bool = True):
+        from manim_render import GOVERNOR_MEMORY_SHARE, prune_render_states
+        self.workers = workers or os.cpu_count()
+        self.cache_dir = cache_dir
+        self.chart_data_dir = chart_data_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+        if chart_data_dir:
+            os.makedirs(chart_data_dir, exist_ok=True)
+        # There is no scheduled cleanup locally, so drop expired incremental render states on start
+        removed = prune_render_states(cache_dir)
+        if removed:
+            print(f"🧹 Removed {removed} expired render states from {cache_dir}")
+        self.memory_limit_mb = int(machine_memory_mb() * GOVERNOR_MEMORY_SHARE / self.workers)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker, initargs=(cache_dir, warm_up))
+        # Reentrant: a future that is already done runs its release callback inside render_manim's lock
+        self.lock = threading.RLock()
+        self.inflight = {}  # render_cache_key -> (job_id, future)
+
+    def render_manim(self, request_body: dict) -> dict:
+        from manim_render import render_cache_key
+        if not request_body.get("code"):
+            return {"success": False, "error": "No code provided in request body"}
+
+        cache_key = render_cache_key(request_body)
+        use_cache = request_body.get("use_cache", True)
+        with self.lock:
+            coalesced = use_cache and cache_key in self.inflight
+            if coalesced:
+                job_id, future = self.inflight[cache_key]
+            else:
+                job_id = uuid.uuid4().hex
+                future = self.pool.submit(local_render_manim, request_body, job_id, self.memory_limit_mb)
+                if use_cache:
+                    self.inflight[cache_key] = (job_id, future)
+                    future.add_done_callback(lambda _: self.release(cache_key, job_id))
+        return {**future.result(), "coalesced": coalesced}
+
+    def release(self, cache_key: str, job_id: str):
+        with self.lock:
+            if self.inflight.get(cache_key, (None,))[0] == job_id:
+                del self.inflight[cache_key]
+
+    def generate_chart(self, request_body: dict) -> dict:
+        return self.pool.submit(local_generate_chart, request_body, self.chart_data_dir).result()
+
+    def stats(self) -> dict:
+        with self.lock:
+            inflight = len(self.inflight)
+        return {"backend": self.name, "workers": self.workers, "memory_limit_mb": self.memory_limit_mb, "renders_in_flight": inflight}
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+def make_handler(backend: RenderBackend):
+    routes = {"/render_manim": backend.render_manim, "/generate_chart": backend.generate_chart}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def reply(self, status: int, payload: dict):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip("/") != "/health":
+                return self.reply(404, {"error": "Not found"})
+            self.reply(200, backend.stats() if hasattr(backend, "stats") else {"backend": backend.name})
+
+        def do_POST(self):
+            handler = routes.get(self.path.split("?")[0].rstrip("/"))
+            if handler is None:
+                return self.reply(404, {"error": "Not found"})
+            try:
+                request_body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            except ValueError:
+                return self.reply(400, {"error": "Request body must be JSON"})
+            start = time.time()
+            try:
+                result = handler(request_body)
+            except Exception as e:
+                result = {"success": False, "error": f"Backend failure: {str(e)}"}
+            print(f"📨 {self.path} finished in {time.time() - start:.1f}s (success: {result.get('success')})")
+            self.reply(200, result)
+
+    return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--cache-dir", default=DEFAULT_LOCAL_CACHE_DIR)
+    parser.add_argument("--no-warm-up", action="store_true", help="skip priming LaTeX, fonts and imports in each worker")
+    args = parser.parse_args()
+
+    backend = LocalBackend(workers=args.workers, cache_dir=args.cache_dir, warm_up=not args.no_warm_up)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(backend))
+    print(f"Local render backend on http://{args.host}:{args.port} ({backend.workers} workers, cache in {args.cache_dir})")
+    try:
+        server.serve_forever()
+    finally:
+        backend.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import ast
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from manim_render import StripVoiceoverRule, rewrite_scene  # noqa: E402
+
+VOICEOVER_SCENE = '''
+from manim import *
+from manim_voiceover import VoiceoverScene
+from manim_voiceover.services.openai import OpenAIService
+
+class GeneratedScene(VoiceoverScene):
+    def construct(self):
+        self.set_speech_service(OpenAIService(voice="alloy"))
+        circle = Circle()
+        with self.voiceover(text="Here is a <bookmark mark='A'/>circle.") as tracker:
+            self.play(Create(circle), run_time=tracker.duration)
+            self.wait_until_bookmark("A")
+            self.play(circle.animate.shift(LEFT))
+            self.wait(tracker.get_remaining_duration())
+        with self.voiceover(text="And some notes.") as t, open("notes.txt") as notes:
+            self.play(Write(Text(notes.read())), run_time=t.duration)
+            print(t)
+'''
+
+def strip_voiceover(code: str) -> str:
+    tree, _ = rewrite_scene(ast.parse(code), rules=[StripVoiceoverRule])
+    return ast.unparse(tree)
+
+def test_strip_voiceover_leaves_no_voiceover_api():
+    rewritten = strip_voiceover(VOICEOVER_SCENE)
+    for name in ("voiceover", "wait_until_bookmark", "tracker", "speech_service"):
+        assert name not in rewritten
+    assert "as t," not in rewritten and "t.duration" not in rewritten
+    assert "class GeneratedScene(Scene)" in rewritten
+
+def test_strip_voiceover_replaces_bookmark_waits_with_timed_waits():
+    rewritten = strip_voiceover(VOICEOVER_SCENE)
+    assert rewritten.count("self.wait(1)") == 2
+
+def test_strip_voiceover_keeps_other_context_managers():
+    rewritten = strip_voiceover(VOICEOVER_SCENE)
+    assert "with open('notes.txt') as notes:" in rewritten
+    assert "self.play(Write(Text(notes.read())), run_time=1)" in rewritten
+
+def test_strip_voiceover_keeps_names_rebound_inside_or_outside_the_block():
+    code = '''
+class GeneratedScene(VoiceoverScene):
+    def construct(self):
+        axes = Axes()
+        with self.voiceover(text="A parabola.") as t:
+            self.play(Create(axes.plot(lambda t: t**2)), run_time=t.duration)
+            dots = [Dot(axes.c2p(t, 0)) for t in range(3)]
+        curve = ParametricFunction(lambda t: axes.c2p(t, t**2), t_range=[0, 1])
+        for t in range(3):
+            self.add(Dot(axes.c2p(t, 0)))
+'''
+    rewritten = strip_voiceover(code)
+    assert "lambda t: t ** 2" in rewritten
+    assert "run_time=1" in rewritten
+    assert "[Dot(axes.c2p(t, 0)) for t in range(3)]" in rewritten
+    assert "lambda t: axes.c2p(t, t ** 2)" in rewritten
+    assert "self.add(Dot(axes.c2p(t, 0)))" in rewritten